@@ -0,0 +1,42 @@
+"""add vehicle expiry indexes and compliance snapshot
+
+Revision ID: 3f9c1d7a2b64
+Revises: 6ba28baaa02f
+Create Date: 2026-10-19 09:12:04.518233
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f9c1d7a2b64'
+down_revision: Union[str, None] = '6ba28baaa02f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(op.f('ix_vehiculos_soat_vencimiento'), 'vehiculos', ['soat_vencimiento'], unique=False)
+    op.create_index(op.f('ix_vehiculos_tecnomecanica_vencimiento'), 'vehiculos', ['tecnomecanica_vencimiento'], unique=False)
+    op.create_index(op.f('ix_vehiculos_kit_vencimiento'), 'vehiculos', ['kit_vencimiento'], unique=False)
+    op.create_table('cumplimiento_flota',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('fecha', sa.Date(), nullable=False),
+    sa.Column('datos', sa.JSON(), nullable=False),
+    sa.Column('generado_en', sa.DateTime(timezone=True), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_cumplimiento_flota_id'), 'cumplimiento_flota', ['id'], unique=False)
+    op.create_index(op.f('ix_cumplimiento_flota_fecha'), 'cumplimiento_flota', ['fecha'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_cumplimiento_flota_fecha'), table_name='cumplimiento_flota')
+    op.drop_index(op.f('ix_cumplimiento_flota_id'), table_name='cumplimiento_flota')
+    op.drop_table('cumplimiento_flota')
+    op.drop_index(op.f('ix_vehiculos_kit_vencimiento'), table_name='vehiculos')
+    op.drop_index(op.f('ix_vehiculos_tecnomecanica_vencimiento'), table_name='vehiculos')
+    op.drop_index(op.f('ix_vehiculos_soat_vencimiento'), table_name='vehiculos')
@@ -0,0 +1,26 @@
+"""add journey left origin flag
+
+Revision ID: 4a8d1f6c2e93
+Revises: 9c4f2b7e1d06
+Create Date: 2026-10-19 23:40:17.092315
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4a8d1f6c2e93'
+down_revision: Union[str, None] = '9c4f2b7e1d06'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('trayectos', sa.Column('salio_origen', sa.Boolean(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('trayectos', 'salio_origen')
@@ -0,0 +1,28 @@
+"""add journey scheduled times
+
+Revision ID: 8b2e4f6a1c93
+Revises: 3f9c1d7a2b64
+Create Date: 2026-10-19 10:41:52.203117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8b2e4f6a1c93'
+down_revision: Union[str, None] = '3f9c1d7a2b64'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('trayectos', sa.Column('inicio_programado', sa.DateTime(timezone=True), nullable=True))
+    op.add_column('trayectos', sa.Column('fin_programado', sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('trayectos', 'fin_programado')
+    op.drop_column('trayectos', 'inicio_programado')
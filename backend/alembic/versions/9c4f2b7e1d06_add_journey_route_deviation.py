@@ -0,0 +1,26 @@
+"""add journey route deviation
+
+Revision ID: 9c4f2b7e1d06
+Revises: b5e1d8a3c720
+Create Date: 2026-10-19 21:12:08.551734
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9c4f2b7e1d06'
+down_revision: Union[str, None] = 'b5e1d8a3c720'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('trayectos', sa.Column('desviado_desde', sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('trayectos', 'desviado_desde')
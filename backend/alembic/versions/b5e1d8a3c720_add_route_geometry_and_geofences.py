@@ -0,0 +1,36 @@
+"""add route geometry and geofences
+
+Revision ID: b5e1d8a3c720
+Revises: f2a7c4e91b35
+Create Date: 2026-10-19 18:05:41.203918
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b5e1d8a3c720'
+down_revision: Union[str, None] = 'f2a7c4e91b35'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('rutas', sa.Column('geometria', sa.JSON(), nullable=True))
+    op.add_column('rutas', sa.Column('origen_lat', sa.Float(), nullable=True))
+    op.add_column('rutas', sa.Column('origen_lng', sa.Float(), nullable=True))
+    op.add_column('rutas', sa.Column('destino_lat', sa.Float(), nullable=True))
+    op.add_column('rutas', sa.Column('destino_lng', sa.Float(), nullable=True))
+    op.add_column('rutas', sa.Column('radio_geocerca', sa.Float(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('rutas', 'radio_geocerca')
+    op.drop_column('rutas', 'destino_lng')
+    op.drop_column('rutas', 'destino_lat')
+    op.drop_column('rutas', 'origen_lng')
+    op.drop_column('rutas', 'origen_lat')
+    op.drop_column('rutas', 'geometria')
@@ -0,0 +1,28 @@
+"""add journey schedule conflict indexes
+
+Revision ID: c47d0e9b5a18
+Revises: 8b2e4f6a1c93
+Create Date: 2026-10-19 11:20:37.884012
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c47d0e9b5a18'
+down_revision: Union[str, None] = '8b2e4f6a1c93'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_trayectos_conductor_inicio_programado', 'trayectos', ['conductor_id', 'inicio_programado'], unique=False)
+    op.create_index('ix_trayectos_vehiculo_inicio_programado', 'trayectos', ['vehiculo_id', 'inicio_programado'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_trayectos_vehiculo_inicio_programado', table_name='trayectos')
+    op.drop_index('ix_trayectos_conductor_inicio_programado', table_name='trayectos')
@@ -0,0 +1,45 @@
+"""add cargas masivas table
+
+Revision ID: d93a6c2f8e41
+Revises: c47d0e9b5a18
+Create Date: 2026-10-19 12:05:13.640298
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd93a6c2f8e41'
+down_revision: Union[str, None] = 'c47d0e9b5a18'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('cargas_masivas',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('entidad', sa.String(), nullable=False),
+    sa.Column('archivo', sa.String(), nullable=True),
+    sa.Column('politica', sa.String(), nullable=True),
+    sa.Column('estado', sa.String(), nullable=False),
+    sa.Column('filas_procesadas', sa.Integer(), nullable=False),
+    sa.Column('creados', sa.Integer(), nullable=False),
+    sa.Column('actualizados', sa.Integer(), nullable=False),
+    sa.Column('omitidos', sa.Integer(), nullable=False),
+    sa.Column('errores', sa.Integer(), nullable=False),
+    sa.Column('porcentaje', sa.Float(), nullable=True),
+    sa.Column('errores_detalle', sa.JSON(), nullable=True),
+    sa.Column('mensaje', sa.String(), nullable=True),
+    sa.Column('creado_en', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.Column('finalizado_en', sa.DateTime(timezone=True), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_cargas_masivas_id'), 'cargas_masivas', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_cargas_masivas_id'), table_name='cargas_masivas')
+    op.drop_table('cargas_masivas')
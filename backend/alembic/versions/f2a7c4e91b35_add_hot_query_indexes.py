@@ -0,0 +1,28 @@
+"""add hot query indexes
+
+Revision ID: f2a7c4e91b35
+Revises: d93a6c2f8e41
+Create Date: 2026-10-19 15:42:08.517230
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2a7c4e91b35'
+down_revision: Union[str, None] = 'd93a6c2f8e41'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_trayectos_estado_conductor', 'trayectos', ['estado', 'conductor_id'], unique=False)
+    op.create_index(op.f('ix_novedades_fecha_reporte'), 'novedades', ['fecha_reporte'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_novedades_fecha_reporte'), table_name='novedades')
+    op.drop_index('ix_trayectos_estado_conductor', table_name='trayectos')
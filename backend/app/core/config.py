@@ -1,5 +1,6 @@
 from pydantic_settings import BaseSettings
 from functools import lru_cache
+from typing import Optional
 
 class Settings(BaseSettings):
     # Configuración de la base de datos
@@ -14,6 +15,56 @@ class Settings(BaseSettings):
     PROJECT_NAME: str = "Sistema de Transporte"
     VERSION: str = "1.0.0"
     API_V1_STR: str = "/api/v1"
+    # Zona de las horas sin offset (programación y despacho); ver utils/scheduling.py
+    ZONA_HORARIA: str = "America/Bogota"
+
+    # Conteo de consultas por petición (ver utils/query_stats.py)
+    QUERY_STATS_ENABLED: bool = True
+    QUERY_N1_UMBRAL: int = 10  # repeticiones de una misma sentencia que se marcan como N+1
+    QUERY_LENTAS_TOP: int = 3
+
+    # Token opcional para GET /metrics (Bearer); sin definir el endpoint es abierto
+    METRICS_TOKEN: Optional[str] = None
+
+    # Perfilado bajo demanda (ver utils/profiler.py)
+    PERFILES_MAX: int = 20
+    PERFIL_INTERVALO_MS: float = 1.0
+
+    # Archivo mensual de trayectos cerrados (ver utils/archive.py)
+    # Ruta absoluta en almacenamiento persistente (volumen): el archivado borra
+    # las filas de la base. Sin definir no se archiva ni se lee el archivo
+    ARCHIVO_DIR: Optional[str] = None
+    ARCHIVO_RETENCION_DIAS: int = 180
+
+    # Réplicas de solo lectura (ver utils/replicas.py): URLs separadas por coma.
+    # Sin definir, todas las lecturas van a la base principal.
+    DATABASE_REPLICA_URLS: Optional[str] = None
+    # Tras una escritura, las lecturas del mismo cliente van a la principal durante
+    # esta ventana (debe cubrir el retraso de replicación)
+    REPLICA_RETRASO_MAX_SEGUNDOS: float = 5.0
+
+    # Posiciones en vivo compartidas entre workers (ver utils/live_positions.py)
+    POSICIONES_COMPARTIDAS: bool = True
+    POSICIONES_SLOTS: int = 8192
+    POSICIONES_ARCHIVO: Optional[str] = None  # por defecto en /dev/shm, uno por DATABASE_URL
+
+    # Banda muerta de ubicaciones GPS e intervalo de reporte recomendado (ver utils/gps.py)
+    GPS_BANDA_MUERTA_METROS: float = 15.0
+    GPS_BANDA_MUERTA_SEGUNDOS: float = 60.0
+    GPS_DISTANCIA_OBJETIVO_METROS: float = 150.0
+    GPS_INTERVALO_MIN_SEGUNDOS: int = 5
+    GPS_INTERVALO_MAX_SEGUNDOS: int = 30
+
+    # Geocercas de origen/destino de las rutas (ver utils/geofence.py)
+    GEOCERCA_RADIO_METROS: float = 150.0
+    GEOCERCA_VENTANA_MINUTOS: int = 60
+    GEOCERCA_PERMANENCIA_SEGUNDOS: float = 60.0
+    GEOCERCA_INICIO_AUTOMATICO: bool = True
+    GEOCERCA_FIN_AUTOMATICO: bool = False
+
+    # Desvíos del trazado con histéresis (ver utils/route_deviation.py)
+    DESVIO_METROS_SALIDA: float = 150.0
+    DESVIO_METROS_REGRESO: float = 75.0
 
     class Config:
         case_sensitive = True
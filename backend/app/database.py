@@ -1,30 +1,103 @@
+from fastapi import Request
 from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+import itertools
 import os
+import threading
+from typing import List
 
-# Obtener la URL de la base de datos del entorno
-SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./transporte.db")
+# El engine se crea en el primer uso (primera petición o comando de CLI),
+# no al importar el módulo: importar la app no abre conexiones.
+_engine = None
+_replicas = None
+_engine_lock = threading.Lock()
+_turno_replica = itertools.count()
 
-# Si estamos en Railway (PostgreSQL), necesitamos ajustar la URL
-if SQLALCHEMY_DATABASE_URL.startswith("postgres://"):
-    SQLALCHEMY_DATABASE_URL = SQLALCHEMY_DATABASE_URL.replace("postgres://", "postgresql://", 1)
+def get_database_url() -> str:
+    """Obtiene la URL de la base de datos del entorno"""
+    url = os.getenv("DATABASE_URL", "sqlite:///./transporte.db")
+    # Si estamos en Railway (PostgreSQL), necesitamos ajustar la URL
+    if url.startswith("postgres://"):
+        url = url.replace("postgres://", "postgresql://", 1)
+    return url
 
-# Configurar el engine según el tipo de base de datos
-if SQLALCHEMY_DATABASE_URL.startswith("sqlite"):
-    engine = create_engine(
-        SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
-    )
-else:
-    engine = create_engine(SQLALCHEMY_DATABASE_URL)
+def get_replica_urls() -> List[str]:
+    """URLs de las réplicas de solo lectura (DATABASE_REPLICA_URLS, separadas por coma)"""
+    from .core.config import settings
+    urls = [u.strip() for u in (settings.DATABASE_REPLICA_URLS or "").split(",") if u.strip()]
+    return [u.replace("postgres://", "postgresql://", 1) if u.startswith("postgres://") else u for u in urls]
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+def _crear_engine(url: str):
+    # Configurar el engine según el tipo de base de datos
+    if url.startswith("sqlite"):
+        engine = create_engine(url, connect_args={"check_same_thread": False})
+    else:
+        engine = create_engine(url)
+    from .utils.query_stats import instrumentar_engine
+    instrumentar_engine(engine)
+    return engine
+
+def get_engine():
+    """Devuelve el engine, creándolo de forma perezosa en el primer uso"""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                engine = _crear_engine(get_database_url())
+                SessionLocal.configure(bind=engine)
+                _engine = engine
+    return _engine
+
+def get_replica_engines() -> list:
+    """Engines de las réplicas, creados de forma perezosa; lista vacía si no hay"""
+    global _replicas
+    if _replicas is None:
+        with _engine_lock:
+            if _replicas is None:
+                _replicas = [_crear_engine(url) for url in get_replica_urls()]
+    return _replicas
+
+def siguiente_replica():
+    """Réplica para la próxima lectura (round-robin), o None si no hay réplicas"""
+    replicas = get_replica_engines()
+    if not replicas:
+        return None
+    return replicas[next(_turno_replica) % len(replicas)]
+
+SessionLocal = sessionmaker(autocommit=False, autoflush=False)
 
 Base = declarative_base()
 
+def __getattr__(name):
+    # Compatibilidad con `from app.database import engine`
+    if name == "engine":
+        return get_engine()
+    if name == "SQLALCHEMY_DATABASE_URL":
+        return get_database_url()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 def get_db():
+    get_engine()
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close() 
\ No newline at end of file
+        db.close()
+
+def get_db_lectura(request: Request):
+    """
+    Sesión para endpoints de solo lectura (listados, estadísticas, exportes):
+    va a una réplica si hay alguna configurada, salvo que el cliente haya
+    escrito hace poco y deba leer sus propios cambios (ver utils/replicas.py).
+    Las escrituras siguen usando get_db.
+    """
+    from .utils.replicas import leer_de_principal
+
+    get_engine()
+    replica = None if leer_de_principal(request) else siguiente_replica()
+    db = SessionLocal(bind=replica) if replica is not None else SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
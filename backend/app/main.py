@@ -2,9 +2,10 @@ import os
 import logging
 from dotenv import load_dotenv
 
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from starlette.middleware.base import BaseHTTPMiddleware
+from fastapi.responses import PlainTextResponse
+from starlette.datastructures import Headers, MutableHeaders
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
@@ -13,15 +14,31 @@ logger = logging.getLogger(__name__)
 # Cargar variables de entorno
 load_dotenv()
 
-# Middleware personalizado para forzar HTTPS en redirects
-class ForceHttpsRedirectMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request, call_next):
-        response = await call_next(request)
-        if response.status_code in [301, 302, 307, 308]:
-            location = response.headers.get('location', '')
-            if location.startswith('http://'):
-                response.headers['location'] = location.replace('http://', 'https://', 1)
-        return response
+# Middleware ASGI: fuerza HTTPS en los redirects y agrega los encabezados de seguridad
+class EncabezadosSeguridadMiddleware:
+    def __init__(self, app, origins):
+        self.app = app
+        self.origins = set(origins)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        origin = Headers(scope=scope).get("origin")
+
+        async def enviar(mensaje):
+            if mensaje["type"] == "http.response.start":
+                headers = MutableHeaders(scope=mensaje)
+                if mensaje["status"] in (301, 302, 307, 308):
+                    location = headers.get("location", "")
+                    if location.startswith("http://"):
+                        headers["location"] = location.replace("http://", "https://", 1)
+                headers["Strict-Transport-Security"] = "max-age=31536000; includeSubDomains"
+                if origin and origin in self.origins:
+                    headers["Access-Control-Allow-Origin"] = origin
+            await send(mensaje)
+
+        await self.app(scope, receive, enviar)
 
 # Importar modelos primero
 from .models.user import User
@@ -29,9 +46,11 @@ from .models.vehicle import Vehicle
 from .models.route import Route
 from .models.journey import Journey, EstadoTrayecto
 from .models.novedad import Novedad
-
-# Luego importar la base de datos
-from .database import engine, Base
+from .utils.query_stats import ContadorConsultasMiddleware
+from .utils.metrics import MetricasMiddleware, metricas
+from .utils.profiler import PerfiladorMiddleware
+from .utils.replicas import MarcaEscrituraMiddleware, ENCABEZADO_ESCRITURA
+from .core.config import settings
 
 # Finalmente importar los routers
 from .routers import (
@@ -40,7 +59,9 @@ from .routers import (
     vehicles_router, 
     routes_router, 
     journeys_router,
-    novedades_router
+    novedades_router,
+    uploads_router,
+    profiles_router
 )
 
 app = FastAPI(
@@ -52,8 +73,11 @@ app = FastAPI(
     redoc_url="/redoc"
 )
 
-# Agregar el middleware personalizado para forzar HTTPS en redirects
-app.add_middleware(ForceHttpsRedirectMiddleware)
+# Consultas SQL por petición: Server-Timing, log estructurado y detector de N+1
+app.add_middleware(ContadorConsultasMiddleware)
+
+# Marca las escrituras para que el cliente lea lo propio de la principal (réplicas de lectura)
+app.add_middleware(MarcaEscrituraMiddleware)
 
 # Configuración de CORS más permisiva para desarrollo y producción
 origins = os.getenv("CORS_ORIGINS", "https://ludial-transport.vercel.app,http://localhost:3000").split(",")
@@ -64,13 +88,15 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[ENCABEZADO_ESCRITURA],
 )
 
-# Crear las tablas en la base de datos
-Base.metadata.create_all(bind=engine)
+# Las tablas se crean con un paso explícito de despliegue
+# (`python -m app.migrations.create_schema` o `alembic upgrade head`),
+# no al importar la aplicación en cada worker.
 
 # Incluir los routers
-todos_routers = [auth_router, users_router, vehicles_router, routes_router, journeys_router, novedades_router]
+todos_routers = [auth_router, users_router, vehicles_router, routes_router, journeys_router, novedades_router, uploads_router, profiles_router]
 for router in todos_routers:
     app.include_router(router)
 
@@ -81,10 +107,14 @@ def read_root():
         "version": "1.0.0"
     }
 
-@app.middleware("http")
-async def add_security_headers(request: Request, call_next):
-    response = await call_next(request)
-    response.headers["Strict-Transport-Security"] = "max-age=31536000; includeSubDomains"
-    if "origin" in request.headers and request.headers["origin"] in origins:
-        response.headers["Access-Control-Allow-Origin"] = request.headers["origin"]
-    return response
\ No newline at end of file
+@app.get("/metrics", include_in_schema=False)
+def exponer_metricas(request: Request):
+    """Métricas en formato Prometheus; si METRICS_TOKEN está definido se exige como Bearer"""
+    if settings.METRICS_TOKEN and request.headers.get("authorization") != f"Bearer {settings.METRICS_TOKEN}":
+        raise HTTPException(status_code=401, detail="No autorizado")
+    return PlainTextResponse(metricas.exponer(), media_type="text/plain; version=0.0.4")
+
+# Middlewares ASGI puros (el último agregado es el más externo)
+app.add_middleware(PerfiladorMiddleware)
+app.add_middleware(EncabezadosSeguridadMiddleware, origins=origins)
+app.add_middleware(MetricasMiddleware)
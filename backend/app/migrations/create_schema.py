@@ -0,0 +1,33 @@
+import sys
+import logging
+
+# Configurar logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+def create_schema():
+    """Crear las tablas que falten en la base de datos configurada"""
+    # Importar los modelos para registrarlos en Base.metadata
+    from .. import models  # noqa: F401
+    from ..models.journey import Location  # noqa: F401
+    from ..models.vehicle import PicoYPlacaConfig  # noqa: F401
+    from ..database import Base, get_engine
+
+    engine = get_engine()
+    logger.info(f"Creando tablas en {engine.url.render_as_string(hide_password=True)}...")
+    Base.metadata.create_all(bind=engine)
+    logger.info("Tablas creadas exitosamente")
+
+def main():
+    """Paso explícito de despliegue: ejecutar antes de arrancar los workers"""
+    try:
+        create_schema()
+    except Exception as e:
+        logger.error(f"Error creando el esquema: {str(e)}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,39 @@
+"""
+Migración de datos SQLite → PostgreSQL por lotes y reanudable.
+
+Uso:
+    DATABASE_URL=postgresql://... python -m app.migrations.migrate_to_postgres \
+        [--origen sqlite:///./transporte.db] [--lote 5000] [--hilos 4] [--reiniciar]
+
+- Las tablas y columnas salen de los modelos (Base.metadata), así que no se
+  pierden columnas nuevas; las que no existan en el SQLite de origen se omiten.
+- Cada tabla se lee por rangos de id (keyset, sin OFFSET) y se carga con
+  COPY FROM STDIN cuando el destino es PostgreSQL/psycopg2, o con un
+  executemany en cualquier otro motor.
+- Las tablas se agrupan por nivel de llaves foráneas; las de un mismo nivel
+  se copian en paralelo.
+- El avance se guarda en la tabla `migracion_progreso` del destino, en la misma
+  transacción que cada lote: si el proceso se interrumpe, al volver a
+  ejecutarlo continúa desde el último lote confirmado.
+- Al final se ajustan las secuencias de los id en PostgreSQL.
+"""
+import argparse
+import io
+import json
+import logging
 import os
 import sys
-from sqlalchemy import create_engine, text
-from sqlalchemy.orm import sessionmaker
-import logging
-from datetime import datetime
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timezone
+from enum import Enum
+from typing import Dict, List, Optional
+
+from sqlalchemy import (
+    Boolean, Column, DateTime, Integer, MetaData, String, Table, create_engine, delete, insert, inspect,
+    select, text, update
+)
+from sqlalchemy.engine import Engine
 
 # Configurar logging
 logging.basicConfig(
@@ -12,185 +42,218 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-def get_db_engines():
+TAMANO_LOTE = 5000
+HILOS = 4
+
+# Fuera de Base.metadata: solo existe en el destino mientras dura la migración
+progreso = Table(
+    "migracion_progreso", MetaData(),
+    Column("tabla", String, primary_key=True),
+    Column("ultimo_id", Integer, nullable=False, default=0),
+    Column("filas", Integer, nullable=False, default=0),
+    Column("completada", Boolean, nullable=False, default=False),
+    Column("actualizado_en", DateTime(timezone=True)),
+)
+
+def normalizar_url(url: str) -> str:
+    if url.startswith("postgres://"):
+        url = url.replace("postgres://", "postgresql://", 1)
+    return url
+
+def get_db_engines(origen: str, destino: Optional[str], hilos: int = HILOS):
     """Obtener las conexiones a ambas bases de datos"""
-    # SQLite (origen)
-    sqlite_url = "sqlite:///./transporte.db"
-    sqlite_engine = create_engine(sqlite_url, connect_args={"check_same_thread": False})
-    
-    # PostgreSQL (destino)
-    postgres_url = os.getenv("DATABASE_URL")
-    if not postgres_url:
+    destino = destino or os.getenv("DATABASE_URL")
+    if not destino:
         raise ValueError("DATABASE_URL no está configurada")
-    
-    if postgres_url.startswith("postgres://"):
-        postgres_url = postgres_url.replace("postgres://", "postgresql://", 1)
-    
-    postgres_engine = create_engine(postgres_url)
-    
+    sqlite_engine = create_engine(origen, connect_args={"check_same_thread": False})
+    postgres_engine = create_engine(normalizar_url(destino), pool_size=hilos + 1)
     return sqlite_engine, postgres_engine
 
-def create_tables(engine):
-    """Crear las tablas en la base de datos destino"""
-    from ..models.user import User
-    from ..models.driver import Driver
-    from ..models.vehicle import Vehicle
-    from ..models.route import Route
-    from ..models.journey import Journey
+def tablas_modelo() -> List[Table]:
+    """Tablas de la aplicación en orden de dependencias"""
+    from .. import models  # noqa: F401
+    from ..models.journey import Location  # noqa: F401
+    from ..models.vehicle import PicoYPlacaConfig, CumplimientoFlota  # noqa: F401
     from ..database import Base
-    
-    logger.info("Creando tablas en la base de datos destino...")
-    Base.metadata.create_all(bind=engine)
-    logger.info("Tablas creadas exitosamente")
+    return list(Base.metadata.sorted_tables)
 
-def migrate_data(sqlite_engine, postgres_engine):
-    """Migrar los datos de SQLite a PostgreSQL"""
-    # Crear sesiones
-    SQLiteSession = sessionmaker(bind=sqlite_engine)
-    PostgresSession = sessionmaker(bind=postgres_engine)
-    
-    sqlite_session = SQLiteSession()
-    postgres_session = PostgresSession()
-    
+def niveles_por_dependencias(tablas: List[Table]) -> List[List[Table]]:
+    """Agrupa las tablas en niveles: cada tabla solo referencia tablas de niveles anteriores"""
+    nivel: Dict[str, int] = {}
+    for tabla in tablas:  # sorted_tables ya respeta las llaves foráneas
+        padres = {fk.column.table.name for fk in tabla.foreign_keys} - {tabla.name}
+        nivel[tabla.name] = 1 + max((nivel[p] for p in padres), default=-1)
+    niveles: List[List[Table]] = [[] for _ in range(max(nivel.values(), default=-1) + 1)]
+    for tabla in tablas:
+        niveles[nivel[tabla.name]].append(tabla)
+    return niveles
+
+def _copy_disponible(engine: Engine) -> bool:
+    return engine.dialect.name == "postgresql" and engine.dialect.driver == "psycopg2"
+
+def _valor(valor, columna: Column):
+    """Valor leído del SQLite listo para el destino"""
+    if isinstance(valor, datetime) and valor.tzinfo is None and getattr(columna.type, "timezone", False):
+        # SQLite devuelve datetimes sin zona: se guardaron en UTC
+        return valor.replace(tzinfo=timezone.utc)
+    return valor
+
+def _texto_copy(valor) -> str:
+    """Representación de un valor en el formato de texto de COPY"""
+    if valor is None:
+        return "\\N"
+    if isinstance(valor, Enum):
+        # SQLAlchemy guarda los Enum por nombre
+        valor = valor.name
+    elif isinstance(valor, bool):
+        valor = "t" if valor else "f"
+    elif isinstance(valor, (datetime, date)):
+        valor = valor.isoformat()
+    elif isinstance(valor, (dict, list)):
+        valor = json.dumps(valor, ensure_ascii=False)
+    else:
+        valor = str(valor)
+    return (valor.replace("\\", "\\\\").replace("\t", "\\t")
+            .replace("\n", "\\n").replace("\r", "\\r"))
+
+def _copiar_lote(conexion, tabla: Table, columnas: List[Column], filas: List[dict]):
+    buffer = io.StringIO()
+    for fila in filas:
+        buffer.write("\t".join(_texto_copy(fila[c.name]) for c in columnas))
+        buffer.write("\n")
+    buffer.seek(0)
+    nombres = ", ".join(f'"{c.name}"' for c in columnas)
+    cursor = conexion.connection.dbapi_connection.cursor()
     try:
-        # Migrar usuarios
-        logger.info("Migrando usuarios...")
-        usuarios = sqlite_session.execute(text("SELECT * FROM usuarios")).fetchall()
-        for usuario in usuarios:
-            postgres_session.execute(
-                text("""
-                INSERT INTO usuarios (id, username, email, nombre_completo, hashed_password, rol, activo)
-                VALUES (:id, :username, :email, :nombre_completo, :hashed_password, :rol, :activo)
-                ON CONFLICT (id) DO NOTHING
-                """),
-                {
-                    "id": usuario[0],
-                    "username": usuario[1],
-                    "email": usuario[2],
-                    "nombre_completo": usuario[3],
-                    "hashed_password": usuario[4],
-                    "rol": usuario[5],
-                    "activo": bool(usuario[6])
-                }
-            )
-        
-        # Migrar conductores
-        logger.info("Migrando conductores...")
-        conductores = sqlite_session.execute(text("SELECT * FROM conductores")).fetchall()
-        for conductor in conductores:
-            postgres_session.execute(
-                text("""
-                INSERT INTO conductores (id, nombre, licencia, telefono)
-                VALUES (:id, :nombre, :licencia, :telefono)
-                ON CONFLICT (id) DO NOTHING
-                """),
-                {
-                    "id": conductor[0],
-                    "nombre": conductor[1],
-                    "licencia": conductor[2],
-                    "telefono": conductor[3]
-                }
-            )
-        
-        # Migrar vehículos
-        logger.info("Migrando vehículos...")
-        vehiculos = sqlite_session.execute(text("SELECT * FROM vehiculos")).fetchall()
-        for vehiculo in vehiculos:
-            postgres_session.execute(
-                text("""
-                INSERT INTO vehiculos (id, placa, modelo, capacidad)
-                VALUES (:id, :placa, :modelo, :capacidad)
-                ON CONFLICT (id) DO NOTHING
-                """),
-                {
-                    "id": vehiculo[0],
-                    "placa": vehiculo[1],
-                    "modelo": vehiculo[2],
-                    "capacidad": vehiculo[3]
-                }
-            )
-        
-        # Migrar rutas
-        logger.info("Migrando rutas...")
-        rutas = sqlite_session.execute(text("SELECT * FROM rutas")).fetchall()
-        for ruta in rutas:
-            postgres_session.execute(
-                text("""
-                INSERT INTO rutas (id, nombre, origen, destino)
-                VALUES (:id, :nombre, :origen, :destino)
-                ON CONFLICT (id) DO NOTHING
-                """),
-                {
-                    "id": ruta[0],
-                    "nombre": ruta[1],
-                    "origen": ruta[2],
-                    "destino": ruta[3]
-                }
-            )
-        
-        # Migrar trayectos
-        logger.info("Migrando trayectos...")
-        trayectos = sqlite_session.execute(text("SELECT * FROM trayectos")).fetchall()
-        for trayecto in trayectos:
-            postgres_session.execute(
-                text("""
-                INSERT INTO trayectos (
-                    id, ruta_id, conductor_id, vehiculo_id, 
-                    fecha_salida, fecha_llegada, cantidad_pasajeros,
-                    estado, duracion_minutos, duracion_actual
-                )
-                VALUES (
-                    :id, :ruta_id, :conductor_id, :vehiculo_id,
-                    :fecha_salida, :fecha_llegada, :cantidad_pasajeros,
-                    :estado, :duracion_minutos, :duracion_actual
-                )
-                ON CONFLICT (id) DO NOTHING
-                """),
-                {
-                    "id": trayecto[0],
-                    "ruta_id": trayecto[1],
-                    "conductor_id": trayecto[2],
-                    "vehiculo_id": trayecto[3],
-                    "fecha_salida": trayecto[4],
-                    "fecha_llegada": trayecto[5],
-                    "cantidad_pasajeros": trayecto[6],
-                    "estado": trayecto[7],
-                    "duracion_minutos": trayecto[8],
-                    "duracion_actual": trayecto[9]
-                }
-            )
-        
-        # Commit de todos los cambios
-        postgres_session.commit()
-        logger.info("Migración completada exitosamente")
-        
-    except Exception as e:
-        logger.error(f"Error durante la migración: {str(e)}")
-        postgres_session.rollback()
-        raise
+        cursor.copy_expert(f'COPY "{tabla.name}" ({nombres}) FROM STDIN', buffer)
     finally:
-        sqlite_session.close()
-        postgres_session.close()
+        cursor.close()
+
+def migrar_tabla(sqlite_engine: Engine, postgres_engine: Engine, tabla: Table, tamano_lote: int) -> int:
+    """Copia una tabla por lotes desde el último id confirmado; devuelve las filas copiadas"""
+    with postgres_engine.connect() as conexion:
+        estado = conexion.execute(select(progreso).where(progreso.c.tabla == tabla.name)).first()
+    if estado and estado.completada:
+        logger.info(f"{tabla.name}: ya migrada ({estado.filas} filas), se omite")
+        return 0
+
+    existentes = {c["name"] for c in inspect(sqlite_engine).get_columns(tabla.name)}
+    columnas = [c for c in tabla.columns if c.name in existentes]
+    faltantes = [c.name for c in tabla.columns if c.name not in existentes]
+    if faltantes:
+        logger.warning(f"{tabla.name}: columnas ausentes en el origen, quedan con su valor por defecto: {faltantes}")
+    pk = tabla.c.id
+    ultimo_id = estado.ultimo_id if estado else 0
+    filas_total = estado.filas if estado else 0
+    usar_copy = _copy_disponible(postgres_engine)
+    copiadas = 0
+
+    with sqlite_engine.connect() as lectura:
+        while True:
+            inicio = time.perf_counter()
+            filas = [
+                {c.name: _valor(fila[c.name], c) for c in columnas}
+                for fila in lectura.execute(
+                    select(*columnas).where(pk > ultimo_id).order_by(pk).limit(tamano_lote)
+                ).mappings()
+            ]
+            # El lote y su marca de avance se confirman en la misma transacción
+            with postgres_engine.begin() as escritura:
+                if filas:
+                    if usar_copy:
+                        _copiar_lote(escritura, tabla, columnas, filas)
+                    else:
+                        escritura.execute(insert(tabla), filas)
+                    ultimo_id = filas[-1]["id"]
+                    filas_total += len(filas)
+                escritura.execute(update(progreso).where(progreso.c.tabla == tabla.name).values(
+                    ultimo_id=ultimo_id, filas=filas_total, completada=len(filas) < tamano_lote,
+                    actualizado_en=datetime.now(timezone.utc)
+                ))
+            copiadas += len(filas)
+            if filas:
+                logger.info(f"{tabla.name}: {filas_total} filas (hasta id {ultimo_id}, {len(filas) / (time.perf_counter() - inicio):.0f} filas/s)")
+            if len(filas) < tamano_lote:
+                return copiadas
+
+def reiniciar_secuencias(postgres_engine: Engine, tablas: List[Table]):
+    """Ubica cada secuencia de id después del máximo copiado"""
+    if postgres_engine.dialect.name != "postgresql":
+        return
+    with postgres_engine.begin() as conexion:
+        for tabla in tablas:
+            conexion.execute(text(
+                f"SELECT setval(pg_get_serial_sequence('\"{tabla.name}\"', 'id'), "
+                f"COALESCE(MAX(id), 1), MAX(id) IS NOT NULL) FROM \"{tabla.name}\""
+            ))
+    logger.info("Secuencias reiniciadas")
+
+def preparar_destino(sqlite_engine: Engine, postgres_engine: Engine, tablas: List[Table], reiniciar: bool) -> List[Table]:
+    """Crea el esquema y la tabla de progreso; devuelve las tablas presentes en el origen"""
+    from ..database import Base
+
+    logger.info("Creando tablas en la base de datos destino...")
+    Base.metadata.create_all(bind=postgres_engine)
+    progreso.create(bind=postgres_engine, checkfirst=True)
+
+    origen = set(inspect(sqlite_engine).get_table_names())
+    presentes = [t for t in tablas if t.name in origen]
+    for tabla in tablas:
+        if tabla.name not in origen:
+            logger.warning(f"{tabla.name}: no existe en el origen, se omite")
+
+    with postgres_engine.begin() as conexion:
+        if reiniciar:
+            logger.info("Reiniciando: se vacían las tablas destino y el progreso")
+            conexion.execute(delete(progreso))
+            for tabla in reversed(presentes):
+                conexion.execute(delete(tabla))
+        registradas = {fila.tabla for fila in conexion.execute(select(progreso.c.tabla))}
+        for tabla in presentes:
+            if tabla.name in registradas:
+                continue
+            if conexion.execute(select(tabla.c.id).limit(1)).first() is not None:
+                raise RuntimeError(
+                    f"La tabla destino {tabla.name} ya tiene datos que no vienen de esta migración; "
+                    "use --reiniciar para vaciarla"
+                )
+            conexion.execute(insert(progreso).values(tabla=tabla.name, ultimo_id=0, filas=0, completada=False))
+    return presentes
+
+def migrate_data(sqlite_engine: Engine, postgres_engine: Engine, tamano_lote: int = TAMANO_LOTE,
+                 hilos: int = HILOS, reiniciar: bool = False):
+    """Migrar los datos de SQLite a PostgreSQL"""
+    tablas = preparar_destino(sqlite_engine, postgres_engine, tablas_modelo(), reiniciar)
+    inicio = time.perf_counter()
+    total = 0
+    with ThreadPoolExecutor(max_workers=hilos) as ejecutor:
+        for numero, nivel in enumerate(niveles_por_dependencias(tablas)):
+            logger.info(f"Nivel {numero}: {', '.join(t.name for t in nivel)}")
+            # Un nivel completo debe terminar antes de copiar las tablas que lo referencian
+            futuros = [ejecutor.submit(migrar_tabla, sqlite_engine, postgres_engine, t, tamano_lote) for t in nivel]
+            total += sum(f.result() for f in futuros)
+    reiniciar_secuencias(postgres_engine, tablas)
+    logger.info(f"{total} filas copiadas en {time.perf_counter() - inicio:.1f}s")
 
 def main():
     """Función principal de migración"""
+    parser = argparse.ArgumentParser(description="Migra los datos de SQLite a PostgreSQL (reanudable)")
+    parser.add_argument("--origen", default="sqlite:///./transporte.db", help="URL de la base SQLite de origen")
+    parser.add_argument("--destino", default=None, help="URL de destino (por defecto DATABASE_URL)")
+    parser.add_argument("--lote", type=int, default=TAMANO_LOTE, help="Filas por lote")
+    parser.add_argument("--hilos", type=int, default=HILOS, help="Tablas copiadas en paralelo")
+    parser.add_argument("--reiniciar", action="store_true", help="Vaciar el destino y empezar de cero")
+    args = parser.parse_args()
+
     try:
         logger.info("Iniciando proceso de migración...")
-        
-        # Obtener conexiones
-        sqlite_engine, postgres_engine = get_db_engines()
-        
-        # Crear tablas en PostgreSQL
-        create_tables(postgres_engine)
-        
-        # Migrar datos
-        migrate_data(sqlite_engine, postgres_engine)
-        
-        logger.info("¡Migración completada con éxito!")
-        
+        sqlite_engine, postgres_engine = get_db_engines(args.origen, args.destino, args.hilos)
+        migrate_data(sqlite_engine, postgres_engine, args.lote, args.hilos, args.reiniciar)
+        logger.info("¡Migración completada con éxito! Marque el esquema con `alembic stamp head`.")
     except Exception as e:
         logger.error(f"Error en el proceso de migración: {str(e)}")
+        logger.error("Vuelva a ejecutar el comando para continuar desde el último lote confirmado")
         sys.exit(1)
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
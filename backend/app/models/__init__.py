@@ -3,6 +3,7 @@ from .vehicle import Vehicle
 from .route import Route
 from .journey import Journey, EstadoTrayecto
 from .novedad import Novedad
+from .carga import CargaMasiva, EstadoCarga
 
 __all__ = [
     "User",
@@ -11,5 +12,7 @@ __all__ = [
     "Route",
     "Journey",
     "EstadoTrayecto",
-    "Novedad"
+    "Novedad",
+    "CargaMasiva",
+    "EstadoCarga"
 ] 
\ No newline at end of file
@@ -0,0 +1,32 @@
+from sqlalchemy import Column, Integer, String, DateTime, Float, JSON
+from sqlalchemy.sql import func
+from ..database import Base
+from enum import Enum
+
+class EstadoCarga(str, Enum):
+    PENDIENTE = "PENDIENTE"
+    PROCESANDO = "PROCESANDO"
+    COMPLETADA = "COMPLETADA"
+    FALLIDA = "FALLIDA"
+
+class CargaMasiva(Base):
+    __tablename__ = "cargas_masivas"
+
+    id = Column(Integer, primary_key=True, index=True)
+    entidad = Column(String, nullable=False)  # vehiculos, rutas, usuarios, trayectos
+    archivo = Column(String, nullable=True)
+    politica = Column(String, nullable=True)
+    estado = Column(String, nullable=False, default=EstadoCarga.PENDIENTE.value)
+    filas_procesadas = Column(Integer, nullable=False, default=0)
+    creados = Column(Integer, nullable=False, default=0)
+    actualizados = Column(Integer, nullable=False, default=0)
+    omitidos = Column(Integer, nullable=False, default=0)
+    errores = Column(Integer, nullable=False, default=0)
+    porcentaje = Column(Float, nullable=True)
+    errores_detalle = Column(JSON, nullable=True)  # primeras filas con error
+    mensaje = Column(String, nullable=True)
+    creado_en = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    finalizado_en = Column(DateTime(timezone=True), nullable=True)
+
+    def __repr__(self):
+        return f"<CargaMasiva(id={self.id}, entidad={self.entidad}, estado={self.estado})>"
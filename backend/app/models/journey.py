@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Enum as SQLAlchemyEnum, Float
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Enum as SQLAlchemyEnum, Float, Index, Boolean
 from sqlalchemy.orm import relationship
 from ..database import Base
 from enum import Enum
@@ -19,10 +19,16 @@ class Journey(Base):
     vehiculo_id = Column(Integer, ForeignKey("vehiculos.id"))
     fecha_salida = Column(DateTime(timezone=True))
     fecha_llegada = Column(DateTime(timezone=True))
+    inicio_programado = Column(DateTime(timezone=True), nullable=True)
+    fin_programado = Column(DateTime(timezone=True), nullable=True)
     cantidad_pasajeros = Column(Integer)
     estado = Column(SQLAlchemyEnum(EstadoTrayecto), default=EstadoTrayecto.PROGRAMADO)
     duracion_minutos = Column(Integer)
     duracion_actual = Column(Integer)
+    # Ya se vio fuera de la geocerca de origen (ver utils/geofence.py)
+    salio_origen = Column(Boolean, default=False)
+    # Desvío en curso respecto al trazado de la ruta (ver utils/route_deviation.py)
+    desviado_desde = Column(DateTime(timezone=True), nullable=True)
 
     # Relaciones
     ruta = relationship("Route", back_populates="trayectos")
@@ -30,6 +36,14 @@ class Journey(Base):
     vehiculo = relationship("Vehicle", back_populates="trayectos")
     novedades = relationship("Novedad", back_populates="trayecto")
 
+    __table_args__ = (
+        # Búsqueda de cruces de horario por recurso (ver utils/scheduling.py)
+        Index("ix_trayectos_conductor_inicio_programado", "conductor_id", "inicio_programado"),
+        Index("ix_trayectos_vehiculo_inicio_programado", "vehiculo_id", "inicio_programado"),
+        # Trayectos en curso (feed de ubicaciones, despacho) y el activo de un conductor
+        Index("ix_trayectos_estado_conductor", "estado", "conductor_id"),
+    )
+
 class Location(Base):
     __tablename__ = "ubicaciones"
     id = Column(Integer, primary_key=True, index=True)
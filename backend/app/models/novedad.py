@@ -19,7 +19,7 @@ class Novedad(Base):
     conductor_id = Column(Integer, ForeignKey("usuarios.id"), nullable=False)
     tipo = Column(Enum(TipoNovedad), nullable=False)
     notas = Column(Text, nullable=True)
-    fecha_reporte = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    fecha_reporte = Column(DateTime(timezone=True), server_default=func.now(), nullable=False, index=True)
     
     # Relaciones
     trayecto = relationship("Journey", back_populates="novedades")
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, Boolean
+from sqlalchemy import Column, Integer, String, Float, Boolean, JSON
 from sqlalchemy.orm import relationship
 from ..database import Base
 
@@ -13,4 +13,12 @@ class Route(Base):
     tiempo_estimado = Column(Integer, nullable=True)  # en minutos
     activa = Column(Boolean, default=True)
 
-    trayectos = relationship("Journey", back_populates="ruta") 
\ No newline at end of file
+    # Trazado y geocercas (ver utils/geofence.py)
+    geometria = Column(JSON, nullable=True)  # [[lat, lng], ...] del origen al destino
+    origen_lat = Column(Float, nullable=True)
+    origen_lng = Column(Float, nullable=True)
+    destino_lat = Column(Float, nullable=True)
+    destino_lng = Column(Float, nullable=True)
+    radio_geocerca = Column(Float, nullable=True)  # en metros; GEOCERCA_RADIO_METROS si no se define
+
+    trayectos = relationship("Journey", back_populates="ruta") 
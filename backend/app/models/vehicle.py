@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Date, Boolean, JSON
+from sqlalchemy import Column, Integer, String, Date, DateTime, Boolean, JSON
 from sqlalchemy.orm import relationship
 from ..database import Base
 
@@ -9,9 +9,9 @@ class Vehicle(Base):
     placa = Column(String, unique=True, index=True)
     modelo = Column(String)
     capacidad = Column(Integer)
-    soat_vencimiento = Column(Date, nullable=True)
-    tecnomecanica_vencimiento = Column(Date, nullable=True)
-    kit_vencimiento = Column(Date, nullable=True)
+    soat_vencimiento = Column(Date, nullable=True, index=True)
+    tecnomecanica_vencimiento = Column(Date, nullable=True, index=True)
+    kit_vencimiento = Column(Date, nullable=True, index=True)
     pico_placa = Column(String, nullable=True)
     activo = Column(Boolean, default=True)
 
@@ -20,4 +20,11 @@ class Vehicle(Base):
 class PicoYPlacaConfig(Base):
     __tablename__ = "pico_y_placa_config"
     id = Column(Integer, primary_key=True, index=True)
-    config = Column(JSON, nullable=False)  # {"1": ["0", "1"], ...} 
\ No newline at end of file
+    config = Column(JSON, nullable=False)  # {"1": ["0", "1"], ...}
+
+class CumplimientoFlota(Base):
+    __tablename__ = "cumplimiento_flota"
+    id = Column(Integer, primary_key=True, index=True)
+    fecha = Column(Date, unique=True, index=True, nullable=False)
+    datos = Column(JSON, nullable=False)  # conteos por documento: vencidos, por vencer, al día
+    generado_en = Column(DateTime(timezone=True), nullable=False)
@@ -4,6 +4,8 @@ from .journeys import router as journeys_router
 from .users import router as users_router
 from .auth import router as auth_router
 from .novedades import router as novedades_router
+from .uploads import router as uploads_router
+from .profiles import router as profiles_router
 
 __all__ = [
     "vehicles_router", 
@@ -11,5 +13,7 @@ __all__ = [
     "journeys_router",
     "users_router",
     "auth_router",
-    "novedades_router"
+    "novedades_router",
+    "uploads_router",
+    "profiles_router"
 ] 
\ No newline at end of file
@@ -1,18 +1,34 @@
-from fastapi import APIRouter, Depends, HTTPException, Request, Body, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Body, status, BackgroundTasks, File, UploadFile
 from sqlalchemy.orm import Session
-from typing import List, Optional
-from ..database import get_db
+from typing import Dict, List, Optional, Tuple
+from ..database import get_db, get_db_lectura
 from ..models.journey import Journey, EstadoTrayecto, Location
 from ..models.vehicle import Vehicle
 from ..models.route import Route
 from pydantic import BaseModel
-from datetime import datetime, timezone
+from datetime import datetime, timezone, date, time, timedelta
 import logging
 import traceback
-from sqlalchemy import text
 from ..models.user import User
-from fastapi.encoders import jsonable_encoder
 from ..models.novedad import Novedad
+from sqlalchemy import insert
+from .auth import check_role_access
+from ..utils.dispatch import Salida, resolver, preparar_despacho
+from ..utils.pico_y_placa import obtener_regla, verificar_pico_y_placa
+from ..utils.scheduling import (
+    a_utc, a_utc_guardado, normalizar_horario, verificar_disponibilidad, conflictos_lote, intervalo_reserva,
+    DURACION_POR_DEFECTO_MINUTOS
+)
+from ..schemas.importacion import CargaResponse, ResultadoImportacion
+from ..utils.uploads import iniciar_carga
+from ..utils.fast_json import RespuestaJSON
+from ..utils.wire_format import respuesta_feed
+from ..utils.metrics import metricas
+from ..utils.archive import trayectos_archivados, trayecto_archivado, filtro_rango
+from ..utils.live_positions import tabla_posiciones, filas_feed
+from ..utils.gps import Punto, filtrar_banda_muerta, intervalo_recomendado, parsear_timestamp, utc
+from ..utils.geofence import indice_geocercas, evaluar, trayectos_programados_cercanos
+from ..utils.route_deviation import evaluar_desvio
 
 # Configurar logging con más detalle
 logging.basicConfig(
@@ -33,6 +49,8 @@ class JourneyCreate(BaseModel):
     conductor_id: int
     vehiculo_id: int
     ruta_id: int
+    inicio_programado: datetime  # obligatorio: sin horario no se pueden detectar cruces
+    fin_programado: Optional[datetime] = None  # por defecto inicio + tiempo estimado de la ruta
 
 class JourneyUpdate(BaseModel):
     conductor_id: Optional[int] = None
@@ -40,6 +58,8 @@ class JourneyUpdate(BaseModel):
     ruta_id: Optional[int] = None
     fecha_inicio: Optional[datetime] = None
     fecha_fin: Optional[datetime] = None
+    inicio_programado: Optional[datetime] = None
+    fin_programado: Optional[datetime] = None
     estado: Optional[str] = None
 
 class JourneyResponse(BaseModel):
@@ -50,6 +70,8 @@ class JourneyResponse(BaseModel):
     estado: str
     fecha_salida: Optional[datetime] = None
     fecha_llegada: Optional[datetime] = None
+    inicio_programado: Optional[datetime] = None
+    fin_programado: Optional[datetime] = None
     duracion_minutos: Optional[int] = None
     cantidad_pasajeros: Optional[int] = None
     duracion_actual: Optional[int] = None
@@ -65,11 +87,44 @@ class JourneyResponse(BaseModel):
 class FinalizarTrayectoRequest(BaseModel):
     cantidad_pasajeros: int
 
+class SalidaDespacho(BaseModel):
+    ruta_id: int
+    hora_salida: time
+    pasajeros: Optional[int] = None
+
+class DespachoRequest(BaseModel):
+    fecha: date
+    salidas: List[SalidaDespacho]
+    confirmar: bool = True  # False: solo calcular la asignación, sin guardar
+
+class AsignacionDespacho(BaseModel):
+    ruta_id: int
+    hora_salida: time
+    inicio_programado: datetime
+    fin_programado: datetime
+    conductor_id: Optional[int] = None
+    vehiculo_id: Optional[int] = None
+    trayecto_id: Optional[int] = None
+    motivo: Optional[str] = None
+
+class DespachoResponse(BaseModel):
+    fecha: date
+    asignados: List[AsignacionDespacho]
+    sin_asignar: List[AsignacionDespacho]
+
 router = APIRouter(
     prefix="/trayectos",
     tags=["Trayectos"]
 )
 
+def cumplio_tiempo_estimado(fecha_salida, fecha_llegada, tiempo_estimado) -> Optional[bool]:
+    """El trayecto cumplió si su duración real queda dentro del ±10% del tiempo estimado de la ruta"""
+    if not (fecha_salida and fecha_llegada and tiempo_estimado):
+        return None
+    duracion_real = (fecha_llegada - fecha_salida).total_seconds() / 60
+    margen = tiempo_estimado * 0.1  # 10% de margen
+    return (tiempo_estimado - margen) <= duracion_real <= (tiempo_estimado + margen)
+
 def prepare_journey_response(trayecto: Journey, db: Session) -> dict:
     """Prepara la respuesta del trayecto con información relacionada."""
     try:
@@ -85,11 +140,9 @@ def prepare_journey_response(trayecto: Journey, db: Session) -> dict:
         ]
 
         # Calcular cumplimiento de tiempo
-        cumplio_tiempo = None
-        if trayecto.fecha_salida and trayecto.fecha_llegada and ruta and ruta.tiempo_estimado:
-            duracion_real = (trayecto.fecha_llegada - trayecto.fecha_salida).total_seconds() / 60
-            margen = ruta.tiempo_estimado * 0.1  # 10% de margen
-            cumplio_tiempo = (ruta.tiempo_estimado - margen) <= duracion_real <= (ruta.tiempo_estimado + margen)
+        cumplio_tiempo = cumplio_tiempo_estimado(
+            trayecto.fecha_salida, trayecto.fecha_llegada, ruta.tiempo_estimado if ruta else None
+        )
 
         # Crear diccionario base
         response = {
@@ -100,6 +153,8 @@ def prepare_journey_response(trayecto: Journey, db: Session) -> dict:
             "estado": trayecto.estado.value if hasattr(trayecto.estado, 'value') else str(trayecto.estado),
             "fecha_salida": trayecto.fecha_salida,
             "fecha_llegada": trayecto.fecha_llegada,
+            "inicio_programado": trayecto.inicio_programado,
+            "fin_programado": trayecto.fin_programado,
             "duracion_minutos": trayecto.duracion_minutos,
             "cantidad_pasajeros": trayecto.cantidad_pasajeros,
             "duracion_actual": trayecto.duracion_actual,
@@ -143,11 +198,18 @@ async def crear_trayecto(request: Request, journey: JourneyCreate, db: Session =
             raise HTTPException(status_code=404, detail=f"Ruta con ID {journey.ruta_id} no encontrada")
         # logger.info(f"Ruta validada: {ruta.nombre} (ID: {ruta.id})")
         
+        # Validar que el conductor y el vehículo estén libres en el horario
+        inicio, fin = normalizar_horario(journey.inicio_programado, journey.fin_programado, ruta.tiempo_estimado)
+        verificar_disponibilidad(db, journey.conductor_id, journey.vehiculo_id, inicio, fin)
+        verificar_pico_y_placa(db, vehiculo, inicio, fin)
+        
         # Crear trayecto
         new_journey = Journey(
             conductor_id=journey.conductor_id,
             vehiculo_id=journey.vehiculo_id,
             ruta_id=journey.ruta_id,
+            inicio_programado=inicio,
+            fin_programado=fin,
             estado=EstadoTrayecto.PROGRAMADO
         )
         
@@ -181,53 +243,79 @@ async def crear_trayecto(request: Request, journey: JourneyCreate, db: Session =
         logger.error(traceback.format_exc())
         raise HTTPException(status_code=500, detail=str(e))
 
+def filas_trayectos(db: Session, condicion: Optional[list] = None, incluir_sin_vehiculo: bool = False) -> List[dict]:
+    """
+    Listado de trayectos con los mismos campos que `prepare_journey_response`,
+    armado con dos consultas de proyección (trayectos con sus joins y novedades)
+    en lugar de cuatro consultas por trayecto. `condicion` son filtros extra
+    sobre Journey (rango de fechas, archivado).
+    """
+    filtros = list(condicion or [])
+    if not incluir_sin_vehiculo:
+        filtros.append(Journey.vehiculo_id != None)
+    filas = db.query(
+        Journey.id, Journey.conductor_id, Journey.vehiculo_id, Journey.ruta_id, Journey.estado,
+        Journey.fecha_salida, Journey.fecha_llegada, Journey.inicio_programado, Journey.fin_programado,
+        Journey.duracion_minutos, Journey.cantidad_pasajeros, Journey.duracion_actual,
+        Route.id, Route.nombre, Route.tiempo_estimado, User.id, User.nombre_completo, Vehicle.id, Vehicle.placa
+    ).outerjoin(Route, Route.id == Journey.ruta_id).outerjoin(
+        User, User.id == Journey.conductor_id
+    ).outerjoin(
+        Vehicle, Vehicle.id == Journey.vehiculo_id
+    ).filter(*filtros).order_by(Journey.id).all()
+
+    novedades = {}
+    for trayecto_id, tipo, notas in db.query(Novedad.trayecto_id, Novedad.tipo, Novedad.notas).join(
+        Journey, Journey.id == Novedad.trayecto_id
+    ).filter(*filtros).order_by(Novedad.id):
+        novedades.setdefault(trayecto_id, []).append(
+            {"tipo": tipo.value if hasattr(tipo, 'value') else str(tipo), "notas": notas}
+        )
+
+    return [
+        {
+            "id": trayecto_id,
+            "conductor_id": conductor_id,
+            "vehiculo_id": vehiculo_id,
+            "ruta_id": ruta_id,
+            "estado": estado.value if hasattr(estado, 'value') else str(estado),
+            "fecha_salida": fecha_salida,
+            "fecha_llegada": fecha_llegada,
+            "inicio_programado": inicio_programado,
+            "fin_programado": fin_programado,
+            "duracion_minutos": duracion_minutos,
+            "cantidad_pasajeros": cantidad_pasajeros,
+            "duracion_actual": duracion_actual,
+            "nombre_ruta": nombre_ruta if ruta_encontrada is not None else "Sin ruta",
+            "nombre_conductor": nombre_conductor if conductor_encontrado is not None else "Sin conductor",
+            "placa_vehiculo": placa if vehiculo_encontrado is not None else "Sin vehículo",
+            "novedades": novedades.get(trayecto_id, []),
+            "cumplio_tiempo": cumplio_tiempo_estimado(fecha_salida, fecha_llegada, tiempo_estimado)
+        }
+        for (trayecto_id, conductor_id, vehiculo_id, ruta_id, estado, fecha_salida, fecha_llegada,
+             inicio_programado, fin_programado, duracion_minutos, cantidad_pasajeros, duracion_actual,
+             ruta_encontrada, nombre_ruta, tiempo_estimado, conductor_encontrado, nombre_conductor,
+             vehiculo_encontrado, placa) in filas
+    ]
+
 @router.get("", response_model=List[JourneyResponse])
-async def listar_trayectos(request: Request, db: Session = Depends(get_db)):
+async def listar_trayectos(desde: Optional[date] = None, hasta: Optional[date] = None, db: Session = Depends(get_db_lectura)):
+    """
+    Sin fechas: los trayectos de la tabla caliente. Con `desde`/`hasta`: los del
+    rango, incluidos los que ya se movieron al archivo mensual (utils/archive.py).
+    Se codifica directo con orjson sin revalidar cada fila contra JourneyResponse.
+    """
     try:
-        # logger.info("=== Iniciando listado de trayectos ===")
-        # logger.info(f"URL: {request.url}")
-        # logger.info(f"Headers: {dict(request.headers)}")
-        
-        # Verificar conexión a la base de datos
-        try:
-            db.execute(text("SELECT 1"))
-            # logger.info("Conexión a la base de datos verificada")
-        except Exception as e:
-            logger.error(f"Error de conexión a la base de datos: {str(e)}")
-            raise HTTPException(status_code=500, detail="Error de conexión a la base de datos")
-        
-        # Contar total de registros en la tabla
-        total_count = db.query(Journey).count()
-        # logger.info(f"Total de registros en la tabla Journey: {total_count}")
-        
-        # Obtener todos los trayectos que no tengan un vehiculo_id nulo
-        trayectos = db.query(Journey).filter(Journey.vehiculo_id != None).all()
-        # logger.info(f"Trayectos encontrados (filtrando nulos): {len(trayectos)}")
-        
-        # Verificar estructura de cada trayecto
-        for t in trayectos:
-            # logger.info(f"Trayecto ID: {t.id}")
-            # logger.info(f"Estado: {t.estado}")
-            # logger.info(f"Conductor ID: {t.conductor_id}")
-            # logger.info(f"Vehículo ID: {t.vehiculo_id}")
-            # logger.info(f"Ruta ID: {t.ruta_id}")
-            pass
-        
-        response = []
-        for t in trayectos:
-            try:
-                journey_response = prepare_journey_response(t, db)
-                response.append(journey_response)
-                # logger.info(f"Trayecto {t.id} procesado correctamente")
-            except Exception as e:
-                logger.error(f"Error procesando trayecto {t.id}: {str(e)}")
-                logger.error(traceback.format_exc())
-                continue
-        
-        # logger.info(f"Total de trayectos procesados: {len(response)}")
-        # logger.info("=== Fin del listado de trayectos ===")
-        return response
-        
+        if desde is None and hasta is None:
+            return RespuestaJSON(filas_trayectos(db))
+        if desde and hasta and hasta < desde:
+            raise HTTPException(status_code=400, detail="hasta debe ser igual o posterior a desde")
+        archivados = [fila for fila in trayectos_archivados(desde, hasta) if fila["vehiculo_id"] is not None]
+        filas = archivados + filas_trayectos(db, filtro_rango(desde, hasta))
+        filas.sort(key=lambda fila: fila["id"])
+        return RespuestaJSON(filas)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error("=== Error en listado de trayectos ===")
         logger.error(f"Error: {str(e)}")
@@ -244,10 +332,29 @@ async def iniciar_trayecto(trayecto_id: int, db: Session = Depends(get_db)):
         if trayecto.estado != EstadoTrayecto.PROGRAMADO:
             raise HTTPException(status_code=400, detail="El trayecto no está en estado PROGRAMADO")
         
+        ahora = datetime.now(timezone.utc)
+        if trayecto.inicio_programado is None:
+            # Trayecto anterior al horario obligatorio: ocupa desde ahora la duración de la ruta
+            tiempo_estimado = db.query(Route.tiempo_estimado).filter(Route.id == trayecto.ruta_id).scalar()
+            verificar_disponibilidad(
+                db, trayecto.conductor_id, trayecto.vehiculo_id,
+                *intervalo_reserva(None, None, ahora, tiempo_estimado), excluir_id=trayecto.id
+            )
+
         trayecto.estado = EstadoTrayecto.EN_CURSO
-        trayecto.fecha_salida = datetime.now(timezone.utc)
+        trayecto.fecha_salida = ahora
+        # Iniciado a mano puede estar todavía en la terminal (ver utils/geofence.py)
+        trayecto.salio_origen = False
         db.commit()
         db.refresh(trayecto)
+        tabla = tabla_posiciones()
+        if tabla:
+            # La última posición conocida del conductor aparece en el mapa desde el inicio
+            ubicacion = db.query(Location).filter(Location.conductor_id == trayecto.conductor_id).first()
+            tabla.escribir(
+                trayecto.conductor_id, trayecto.id, trayecto.vehiculo_id, trayecto.ruta_id,
+                *((ubicacion.lat, ubicacion.lng, ubicacion.timestamp) if ubicacion else ())
+            )
         return prepare_journey_response(trayecto, db)
     except HTTPException:
         raise
@@ -270,6 +377,9 @@ async def detener_trayecto(trayecto_id: int, db: Session = Depends(get_db)):
         trayecto.fecha_llegada = datetime.now(timezone.utc)
         db.commit()
         db.refresh(trayecto)
+        tabla = tabla_posiciones()
+        if tabla:
+            tabla.cerrar(trayecto.conductor_id, trayecto.id)
         return prepare_journey_response(trayecto, db)
     except HTTPException:
         raise
@@ -307,6 +417,9 @@ async def finalizar_trayecto(trayecto_id: int, datos: FinalizarTrayectoRequest,
         
         db.commit()
         db.refresh(trayecto)
+        tabla = tabla_posiciones()
+        if tabla:
+            tabla.cerrar(trayecto.conductor_id, trayecto.id)
         return prepare_journey_response(trayecto, db)
     except HTTPException:
         raise
@@ -316,12 +429,23 @@ async def finalizar_trayecto(trayecto_id: int, datos: FinalizarTrayectoRequest,
         db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
 
+COLUMNAS_UBICACION = (
+    "conductor_id", "lat", "lng", "timestamp", "placa_vehiculo", "nombre_conductor", "nombre_ruta", "vehiculo_id", "ruta_id"
+)
+
 @router.get("/ubicaciones", tags=["Monitoreo"])
-async def obtener_ubicaciones(db: Session = Depends(get_db)):
+async def obtener_ubicaciones(request: Request, db: Session = Depends(get_db_lectura)):
+    """Posiciones de los trayectos en curso; formato según Accept (ver utils/wire_format.py)"""
     try:
-        # Query con JOIN para obtener información completa
-        ubicaciones_completas = db.query(
-            Location, Journey, Vehicle, User, Route
+        # De la tabla compartida entre workers (utils/live_positions.py) si está disponible
+        ubicaciones = filas_feed(db)
+        if ubicaciones is not None:
+            return respuesta_feed(request, COLUMNAS_UBICACION, ubicaciones, columnas_fecha=("timestamp",))
+
+        # Query de proyección con JOIN: solo las columnas que se envían
+        ubicaciones = db.query(
+            Location.conductor_id, Location.lat, Location.lng, Location.timestamp,
+            Vehicle.placa, User.nombre_completo, Route.nombre, Vehicle.id, Route.id
         ).join(
             Journey, Location.conductor_id == Journey.conductor_id
         ).join(
@@ -333,32 +457,9 @@ async def obtener_ubicaciones(db: Session = Depends(get_db)):
         ).filter(
             Journey.estado == EstadoTrayecto.EN_CURSO
         ).all()
-        
-        response_data = [
-            {
-                "conductor_id": u.Location.conductor_id,
-                "lat": u.Location.lat,
-                "lng": u.Location.lng,
-                "timestamp": u.Location.timestamp.isoformat() if u.Location.timestamp else None,
-                "placa_vehiculo": u.Vehicle.placa,
-                "nombre_conductor": u.User.nombre_completo,
-                "nombre_ruta": u.Route.nombre,
-                "vehiculo_id": u.Vehicle.id,
-                "ruta_id": u.Route.id
-            } for u in ubicaciones_completas
-        ]
-        
-        logger.info(f"Datos de ubicaciones completas a enviar: {len(response_data)} registros")
 
-        # Intentar serializar manualmente para depuración
-        try:
-            json_compatible_data = jsonable_encoder(response_data)
-            logger.info(f"Datos de ubicaciones serializados correctamente")
-            return json_compatible_data
-        except Exception as serial_e:
-            logger.error(f"Error durante la serialización de ubicaciones: {str(serial_e)}")
-            logger.error(traceback.format_exc())
-            raise HTTPException(status_code=500, detail="Error de serialización al obtener ubicaciones")
+        logger.info(f"Datos de ubicaciones completas a enviar: {len(ubicaciones)} registros")
+        return respuesta_feed(request, COLUMNAS_UBICACION, ubicaciones, columnas_fecha=("timestamp",))
 
     except Exception as e:
         logger.error(f"Error al obtener o serializar ubicaciones: {str(e)}")
@@ -370,7 +471,11 @@ async def obtener_trayecto(trayecto_id: int, db: Session = Depends(get_db)):
     try:
         trayecto = db.query(Journey).filter(Journey.id == trayecto_id).first()
         if trayecto is None:
-            raise HTTPException(status_code=404, detail="Trayecto no encontrado")
+            # Los trayectos cerrados de meses anteriores están en el archivo mensual
+            archivado = trayecto_archivado(trayecto_id)
+            if archivado is None:
+                raise HTTPException(status_code=404, detail="Trayecto no encontrado")
+            return RespuestaJSON(archivado)
         return prepare_journey_response(trayecto, db)
     except HTTPException:
         raise
@@ -384,25 +489,72 @@ async def actualizar_ubicacion(
     data: dict = Body(...),
     db: Session = Depends(get_db)
 ):
+    """
+    Un punto ({conductor_id, lat, lng[, timestamp]}) o un lote guardado sin
+    conexión ({conductor_id, puntos: [{lat, lng, timestamp}, ...]}). Los
+    puntos dentro de la banda muerta del último aceptado se descartan sin
+    escribir (utils/gps.py); la respuesta trae el intervalo recomendado para
+    el próximo reporte y los eventos de geocerca (utils/geofence.py) y de
+    desvío del trazado (utils/route_deviation.py).
+    """
     conductor_id = data.get("conductor_id")
-    lat = data.get("lat")
-    lng = data.get("lng")
-    if not conductor_id or lat is None or lng is None:
+    crudos = data.get("puntos") if "puntos" in data else [data]
+    if not conductor_id or not isinstance(crudos, list) or not crudos \
+            or any(not isinstance(p, dict) or p.get("lat") is None or p.get("lng") is None for p in crudos):
         raise HTTPException(status_code=400, detail="Datos incompletos")
+    now = datetime.now(timezone.utc)
+    try:
+        puntos = sorted(
+            (Punto(float(p["lat"]), float(p["lng"]), parsear_timestamp(p.get("timestamp"), now)) for p in crudos),
+            key=lambda p: p.timestamp
+        )
+    except (TypeError, ValueError, OverflowError, OSError) as e:
+        raise HTTPException(status_code=400, detail=f"Punto inválido: {e}")
     trayecto_activo = db.query(Journey).filter(Journey.conductor_id == conductor_id, Journey.estado == EstadoTrayecto.EN_CURSO).first()
-    if not trayecto_activo:
+    # Sin trayecto en curso se aceptan ubicaciones si hay uno PROGRAMADO por
+    # empezar: al salir de la geocerca de origen se inicia solo
+    candidatos = [trayecto_activo] if trayecto_activo else trayectos_programados_cercanos(db, conductor_id, now)
+    if not candidatos:
         raise HTTPException(status_code=403, detail="No tienes trayecto activo")
     ubicacion = db.query(Location).filter(Location.conductor_id == conductor_id).first()
-    now = datetime.now(timezone.utc)
+    ultimo = Punto(ubicacion.lat, ubicacion.lng, utc(ubicacion.timestamp)) if ubicacion else None
+    aceptados = filtrar_banda_muerta(ultimo, puntos)
+    metricas.registrar_ubicacion(len(puntos), descartadas=len(puntos) - len(aceptados))
+    if not aceptados:
+        return {"ok": True, "aceptados": 0, "descartados": len(puntos),
+                "intervalo_recomendado_s": intervalo_recomendado(ultimo, None), "eventos": []}
+
+    indice = indice_geocercas(db)
+    eventos, anterior = [], ultimo
+    for aceptado in aceptados:
+        eventos += evaluar(indice, candidatos, anterior, aceptado)
+        for trayecto in candidatos:
+            eventos += evaluar_desvio(db, indice, trayecto, anterior, aceptado)
+        anterior = aceptado
+    en_curso = next((t for t in candidatos if t.estado == EstadoTrayecto.EN_CURSO), None)
+    en_curso = en_curso and (en_curso.conductor_id, en_curso.id, en_curso.vehiculo_id, en_curso.ruta_id)
+    cerrado = trayecto_activo and trayecto_activo.estado != EstadoTrayecto.EN_CURSO and \
+        (trayecto_activo.conductor_id, trayecto_activo.id)
+
+    # La tabla guarda solo la posición más reciente
+    punto = aceptados[-1]
     if ubicacion:
-        ubicacion.lat = lat
-        ubicacion.lng = lng
-        ubicacion.timestamp = now
+        ubicacion.lat = punto.lat
+        ubicacion.lng = punto.lng
+        ubicacion.timestamp = punto.timestamp
     else:
-        ubicacion = Location(conductor_id=conductor_id, lat=lat, lng=lng, timestamp=now)
+        ubicacion = Location(conductor_id=conductor_id, lat=punto.lat, lng=punto.lng, timestamp=punto.timestamp)
         db.add(ubicacion)
     db.commit()
-    return {"ok": True} 
+    tabla = tabla_posiciones()
+    if tabla and en_curso:
+        tabla.escribir(*en_curso, punto.lat, punto.lng, punto.timestamp)
+    if tabla and cerrado:
+        tabla.cerrar(*cerrado)
+    anterior = aceptados[-2] if len(aceptados) > 1 else ultimo
+    return {"ok": True, "aceptados": len(aceptados), "descartados": len(puntos) - len(aceptados),
+            "intervalo_recomendado_s": intervalo_recomendado(anterior, punto),
+            "eventos": [evento._asdict() for evento in eventos]}
 
 @router.delete("/{trayecto_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def eliminar_trayecto(trayecto_id: int, db: Session = Depends(get_db)):
@@ -422,36 +574,219 @@ async def editar_trayecto(trayecto_id: int, datos: JourneyUpdate, db: Session =
         raise HTTPException(status_code=404, detail="Trayecto no encontrado")
     if trayecto.estado != EstadoTrayecto.PROGRAMADO:
         raise HTTPException(status_code=400, detail="Solo se pueden editar trayectos en estado PROGRAMADO")
-    for field, value in datos.dict(exclude_unset=True).items():
+    cambios = datos.dict(exclude_unset=True)
+
+    # Recalcular el horario si cambia; un inicio nuevo sin fin toma la duración de la ruta
+    if "inicio_programado" in cambios or "fin_programado" in cambios:
+        inicio = cambios.get("inicio_programado")
+        if "inicio_programado" not in cambios and trayecto.inicio_programado is not None:
+            inicio = a_utc_guardado(trayecto.inicio_programado)
+        fin = cambios.get("fin_programado")
+        if "fin_programado" not in cambios and "inicio_programado" not in cambios and trayecto.fin_programado is not None:
+            fin = a_utc_guardado(trayecto.fin_programado)
+        ruta = db.query(Route).filter(Route.id == cambios.get("ruta_id", trayecto.ruta_id)).first()
+        cambios["inicio_programado"], cambios["fin_programado"] = normalizar_horario(
+            inicio, fin, ruta.tiempo_estimado if ruta else None
+        )
+
+    if cambios.keys() & {"conductor_id", "vehiculo_id", "inicio_programado", "fin_programado"}:
+        inicio = cambios.get("inicio_programado", trayecto.inicio_programado)
+        fin = cambios.get("fin_programado", trayecto.fin_programado)
+        verificar_disponibilidad(
+            db,
+            cambios.get("conductor_id", trayecto.conductor_id),
+            cambios.get("vehiculo_id", trayecto.vehiculo_id),
+            inicio and a_utc_guardado(inicio),
+            fin and a_utc_guardado(fin),
+            excluir_id=trayecto.id
+        )
+        vehiculo = db.query(Vehicle).filter(Vehicle.id == cambios.get("vehiculo_id", trayecto.vehiculo_id)).first()
+        if vehiculo is not None:
+            verificar_pico_y_placa(db, vehiculo, inicio and a_utc_guardado(inicio), fin and a_utc_guardado(fin))
+
+    for field, value in cambios.items():
         setattr(trayecto, field, value)
     db.commit()
     db.refresh(trayecto)
     return prepare_journey_response(trayecto, db)
 
-@router.post("/bulk", response_model=List[JourneyResponse])
+def _fila_error(fila: int, detalle: str) -> dict:
+    return {"fila": fila, "estado": "error", "id": None, "clave": None, "detalle": detalle}
+
+def validar_lote_trayectos(db: Session, datos_fila: Dict[int, dict]) -> Tuple[Dict[int, dict], Dict[int, Tuple[datetime, datetime]]]:
+    """
+    Referencias, horarios, pico y placa y cruces de un lote de trayectos (claves base 0).
+    Devuelve (índice -> fila de error, índice -> (inicio, fin) de las válidas).
+    Los cruces se calculan solo entre filas con referencias válidas, para que
+    una fila descartada no bloquee a otra del mismo lote.
+    """
+    # Una consulta IN por tabla referenciada para todo el lote
+    conductores = {i for (i,) in db.query(User.id).filter(User.id.in_({d["conductor_id"] for d in datos_fila.values()})).all()}
+    vehiculos = {
+        i: (placa, pico_placa) for i, placa, pico_placa in db.query(Vehicle.id, Vehicle.placa, Vehicle.pico_placa).filter(
+            Vehicle.id.in_({d["vehiculo_id"] for d in datos_fila.values()})
+        ).all()
+    }
+    tiempos = dict(db.query(Route.id, Route.tiempo_estimado).filter(Route.id.in_({d["ruta_id"] for d in datos_fila.values()})).all())
+    regla = obtener_regla(db)
+
+    errores = {}
+    horarios = {}
+    for indice, datos in datos_fila.items():
+        if datos["conductor_id"] not in conductores:
+            errores[indice] = _fila_error(indice + 1, f"Conductor con ID {datos['conductor_id']} no encontrado")
+        elif datos["vehiculo_id"] not in vehiculos:
+            errores[indice] = _fila_error(indice + 1, f"Vehículo con ID {datos['vehiculo_id']} no encontrado")
+        elif datos["ruta_id"] not in tiempos:
+            errores[indice] = _fila_error(indice + 1, f"Ruta con ID {datos['ruta_id']} no encontrada")
+        else:
+            try:
+                inicio, fin = normalizar_horario(datos["inicio_programado"], datos["fin_programado"], tiempos[datos["ruta_id"]])
+            except HTTPException as he:
+                errores[indice] = _fila_error(indice + 1, he.detail)
+                continue
+            motivo = regla.motivo_horario(*vehiculos[datos["vehiculo_id"]], inicio, fin)
+            if motivo:
+                errores[indice] = _fila_error(indice + 1, motivo)
+            else:
+                horarios[indice] = (inicio, fin)
+
+    conflictos = conflictos_lote(db, [
+        (indice, datos_fila[indice]["conductor_id"], datos_fila[indice]["vehiculo_id"], inicio, fin)
+        for indice, (inicio, fin) in horarios.items()
+    ])
+    for indice, motivo in conflictos.items():
+        errores[indice] = _fila_error(indice + 1, motivo)
+        del horarios[indice]
+    return errores, horarios
+
+def _insertar_trayectos(db: Session, datos_fila: Dict[int, dict], horarios: Dict[int, Tuple[datetime, datetime]]) -> Dict[int, int]:
+    """Inserta las filas válidas en un solo INSERT ... RETURNING; devuelve índice -> id"""
+    if not horarios:
+        return {}
+    indices = list(horarios)
+    ids = db.execute(insert(Journey).returning(Journey.id), [
+        {
+            "conductor_id": datos_fila[indice]["conductor_id"],
+            "vehiculo_id": datos_fila[indice]["vehiculo_id"],
+            "ruta_id": datos_fila[indice]["ruta_id"],
+            "inicio_programado": horarios[indice][0],
+            "fin_programado": horarios[indice][1],
+            "estado": EstadoTrayecto.PROGRAMADO
+        }
+        for indice in indices
+    ]).scalars().all()
+    # sort_by_parameter_order haría un INSERT por fila en SQLite; los ids
+    # autoincrementales de un mismo INSERT crecen en el orden de las filas
+    return dict(zip(indices, sorted(ids)))
+
+@router.post("/bulk", response_model=ResultadoImportacion)
 async def crear_trayectos_bulk(journeys: List[JourneyCreate], db: Session = Depends(get_db)):
-    trayectos_creados = []
-    for journey in journeys:
-        # Validar conductor
-        conductor = db.query(User).filter(User.id == journey.conductor_id).first()
-        if not conductor:
-            continue
-        # Validar vehículo
-        vehiculo = db.query(Vehicle).filter(Vehicle.id == journey.vehiculo_id).first()
-        if not vehiculo:
-            continue
-        # Validar ruta
-        ruta = db.query(Route).filter(Route.id == journey.ruta_id).first()
-        if not ruta:
-            continue
-        new_journey = Journey(
-            conductor_id=journey.conductor_id,
-            vehiculo_id=journey.vehiculo_id,
-            ruta_id=journey.ruta_id,
-            estado=EstadoTrayecto.PROGRAMADO
-        )
-        db.add(new_journey)
-        db.commit()
-        db.refresh(new_journey)
-        trayectos_creados.append(prepare_journey_response(new_journey, db))
-    return trayectos_creados 
\ No newline at end of file
+    """Crea trayectos por lote; las filas con errores se informan en el resultado y no se crean"""
+    datos_fila = {indice: journey.dict() for indice, journey in enumerate(journeys)}
+    errores, horarios = validar_lote_trayectos(db, datos_fila) if journeys else ({}, {})
+
+    reporte = dict(errores)
+    for indice, trayecto_id in _insertar_trayectos(db, datos_fila, horarios).items():
+        reporte[indice] = {"fila": indice + 1, "estado": "creado", "id": trayecto_id, "clave": None, "detalle": None}
+    db.commit()
+    for indice, error in errores.items():
+        logger.warning(f"Trayecto {indice + 1} del lote omitido: {error['detalle']}")
+    return {
+        "total": len(journeys), "creados": len(horarios), "actualizados": 0, "omitidos": 0, "errores": len(errores),
+        "filas": [reporte[indice] for indice in sorted(reporte)]
+    }
+
+def escribir_lote_trayectos(db: Session, lote) -> List[dict]:
+    """Valida un lote de la carga masiva (referencias y cruces de horario) y lo inserta en un solo INSERT"""
+    # Claves por número de fila del archivo (base 0) para que los cruces dentro del lote lo citen
+    datos_fila = {fila - 1: datos for fila, datos in lote}
+    reporte, horarios = validar_lote_trayectos(db, datos_fila)
+    for indice, trayecto_id in _insertar_trayectos(db, datos_fila, horarios).items():
+        reporte[indice] = {"fila": indice + 1, "estado": "creado", "id": trayecto_id, "clave": None, "detalle": None}
+    return [reporte[indice] for indice in sorted(reporte)]
+
+@router.post("/carga", response_model=CargaResponse, status_code=202,
+             dependencies=[Depends(check_role_access(["administrador", "supervisor", "operador"]))])
+async def cargar_trayectos_archivo(
+    background_tasks: BackgroundTasks,
+    archivo: UploadFile = File(...),
+    db: Session = Depends(get_db)
+):
+    """
+    Carga trayectos programados desde un CSV/XLSX (conductor_id, vehiculo_id, ruta_id,
+    inicio_programado, fin_programado) en segundo plano; las filas con cruces de
+    horario se reportan como error y no detienen la carga.
+    """
+    return iniciar_carga(db, background_tasks, archivo, "trayectos", JourneyCreate, escribir_lote_trayectos)
+
+@router.post("/despacho", response_model=DespachoResponse,
+             dependencies=[Depends(check_role_access(["administrador", "supervisor", "operador"]))])
+async def despachar_trayectos(datos: DespachoRequest, db: Session = Depends(get_db)):
+    """Asigna conductor y vehículo a las salidas del día y crea todos los trayectos en un solo INSERT"""
+    if not datos.salidas:
+        return {"fecha": datos.fecha, "asignados": [], "sin_asignar": []}
+
+    rutas = dict(db.query(Route.id, Route.tiempo_estimado).filter(
+        Route.id.in_({s.ruta_id for s in datos.salidas})
+    ).all())
+
+    salidas = []
+    sin_asignar = {}
+    for indice, salida in enumerate(datos.salidas):
+        inicio = a_utc(datetime.combine(datos.fecha, salida.hora_salida))
+        fin = inicio + timedelta(minutes=rutas.get(salida.ruta_id) or DURACION_POR_DEFECTO_MINUTOS)
+        salidas.append(Salida(indice=indice, ruta_id=salida.ruta_id, inicio=inicio, fin=fin, pasajeros=salida.pasajeros or 0))
+        if salida.ruta_id not in rutas:
+            sin_asignar[indice] = f"Ruta con ID {salida.ruta_id} no encontrada"
+
+    validas = [s for s in salidas if s.indice not in sin_asignar]
+    asignaciones = {}
+    if validas:
+        vehiculos, conductores = preparar_despacho(db, datos.fecha, validas)
+        asignaciones, motivos = resolver(validas, vehiculos, conductores)
+        sin_asignar.update(motivos)
+
+    trayecto_ids = {}
+    if datos.confirmar and asignaciones:
+        indices = sorted(asignaciones)
+        filas = [
+            {
+                "ruta_id": salidas[i].ruta_id,
+                "conductor_id": asignaciones[i][0],
+                "vehiculo_id": asignaciones[i][1],
+                "inicio_programado": salidas[i].inicio,
+                "fin_programado": salidas[i].fin,
+                "estado": EstadoTrayecto.PROGRAMADO
+            }
+            for i in indices
+        ]
+        try:
+            ids = db.scalars(insert(Journey).returning(Journey.id), filas).all()
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Error guardando el despacho: {str(e)}")
+            logger.error(traceback.format_exc())
+            raise HTTPException(status_code=500, detail="Error al guardar los trayectos del despacho")
+        trayecto_ids = dict(zip(indices, ids))
+
+    def item(salida: Salida, **extra) -> dict:
+        original = datos.salidas[salida.indice]
+        return {
+            "ruta_id": salida.ruta_id,
+            "hora_salida": original.hora_salida,
+            "inicio_programado": salida.inicio,
+            "fin_programado": salida.fin,
+            **extra
+        }
+
+    return {
+        "fecha": datos.fecha,
+        "asignados": [
+            item(s, conductor_id=asignaciones[s.indice][0], vehiculo_id=asignaciones[s.indice][1],
+                 trayecto_id=trayecto_ids.get(s.indice))
+            for s in salidas if s.indice in asignaciones
+        ],
+        "sin_asignar": [item(s, motivo=sin_asignar[s.indice]) for s in salidas if s.indice in sin_asignar]
+    }
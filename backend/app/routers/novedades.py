@@ -1,12 +1,14 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from sqlalchemy import func, and_
-from datetime import datetime, timedelta
+from datetime import timedelta
 from typing import List
-from ..database import get_db
+from ..database import get_db, get_db_lectura
 from ..models import Novedad, Journey, User, Route
 from ..schemas.novedad import NovedadCreate, NovedadResponse, NovedadStats
 from .auth import get_current_user
+from ..utils.archive import novedades_archivadas_por_tipo
+from ..utils.scheduling import hoy_operacion, inicio_dia
 
 router = APIRouter(prefix="/novedades", tags=["novedades"])
 
@@ -59,10 +61,14 @@ def crear_novedad(
 def obtener_novedades(
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db_lectura),
     current_user: User = Depends(get_current_user)
 ):
-    """Obtener lista de novedades"""
+    """
+    Obtener lista de novedades de la tabla caliente. Las de trayectos ya
+    archivados (utils/archive.py) no aparecen aquí: se ven en el trayecto
+    (GET /trayectos/{id}) y cuentan en /novedades/stats.
+    """
     query = db.query(Novedad)
     
     # Si es conductor, solo mostrar sus novedades
@@ -95,10 +101,10 @@ def obtener_novedades(
 
 @router.get("/stats", response_model=NovedadStats)
 def obtener_estadisticas_novedades(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_db_lectura),
     current_user: User = Depends(get_current_user)
 ):
-    """Obtener estadísticas de novedades"""
+    """Obtener estadísticas de novedades, incluidas las archivadas en total y por tipo"""
     # Permitir a todos los roles autenticados ver estadísticas
     if not current_user:
         raise HTTPException(status_code=403, detail="No tienes permisos para ver estadísticas")
@@ -111,11 +117,17 @@ def obtener_estadisticas_novedades(
     tipos = db.query(Novedad.tipo, func.count(Novedad.id)).group_by(Novedad.tipo).all()
     for tipo, count in tipos:
         por_tipo[tipo.value] = count
+    archivadas = novedades_archivadas_por_tipo()
+    for tipo, count in archivadas.items():
+        por_tipo[tipo] = por_tipo.get(tipo, 0) + count
+    total += sum(archivadas.values())
     
-    # Novedades de hoy
-    hoy = datetime.now().date()
+    # Novedades de hoy: rango sobre la columna (no date(columna)) para usar ix_novedades_fecha_reporte
+    # El día es el de la operación (ZONA_HORARIA), no el del servidor
+    hoy = hoy_operacion()
     novedades_hoy = db.query(func.count(Novedad.id)).filter(
-        func.date(Novedad.fecha_reporte) == hoy
+        Novedad.fecha_reporte >= inicio_dia(hoy),
+        Novedad.fecha_reporte < inicio_dia(hoy + timedelta(days=1))
     ).scalar()
     
     return NovedadStats(
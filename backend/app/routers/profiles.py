@@ -0,0 +1,58 @@
+from fastapi import APIRouter, Depends, HTTPException, Response
+from pydantic import BaseModel
+from datetime import datetime
+from typing import List, Optional
+from .auth import check_admin_access
+from ..utils.profiler import listar_perfiles, obtener_perfil, limpiar_perfiles
+
+class PerfilResponse(BaseModel):
+    id: int
+    metodo: str
+    ruta: str
+    estado: Optional[int] = None
+    duracion_ms: float
+    muestras: int
+    usuario: str
+    creado_en: datetime
+
+router = APIRouter(
+    prefix="/admin/perfiles",
+    tags=["Perfilado"],
+    dependencies=[Depends(check_admin_access)]
+)
+
+def _perfil_o_404(perfil_id: int):
+    perfil = obtener_perfil(perfil_id)
+    if perfil is None:
+        raise HTTPException(status_code=404, detail="Perfil no encontrado (el anillo solo guarda los más recientes)")
+    return perfil
+
+@router.get("", response_model=List[PerfilResponse])
+async def listar():
+    """Perfiles guardados, del más reciente al más antiguo"""
+    return [perfil.resumen() for perfil in listar_perfiles()]
+
+@router.get("/{perfil_id}/pstats")
+async def descargar_pstats(perfil_id: int):
+    """Archivo para `python -m pstats`, snakeviz o gprof2dot"""
+    perfil = _perfil_o_404(perfil_id)
+    return Response(
+        content=perfil.pstats,
+        media_type="application/octet-stream",
+        headers={"Content-Disposition": f'attachment; filename="perfil_{perfil.id}.pstats"'}
+    )
+
+@router.get("/{perfil_id}/colapsado")
+async def descargar_colapsado(perfil_id: int):
+    """Pilas colapsadas (una por línea con su conteo) para flamegraph.pl o speedscope"""
+    perfil = _perfil_o_404(perfil_id)
+    return Response(
+        content=perfil.colapsado,
+        media_type="text/plain; charset=utf-8",
+        headers={"Content-Disposition": f'attachment; filename="perfil_{perfil.id}.folded"'}
+    )
+
+@router.delete("")
+async def borrar_perfiles():
+    limpiar_perfiles()
+    return {"message": "Perfiles eliminados"}
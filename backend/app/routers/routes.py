@@ -1,10 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, File, UploadFile, Request
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import List, Optional, Tuple
 from ..database import get_db
 from ..models.route import Route
-from pydantic import BaseModel
+from pydantic import BaseModel, TypeAdapter
 from ..routers.auth import check_admin_access, check_role_access
+from ..utils.bulk import importar, PoliticaConflicto, ErrorImportacion
+from ..schemas.importacion import ResultadoImportacion, CargaResponse
+from ..utils.uploads import iniciar_carga, escritor_importacion
+from ..utils.catalog_cache import respuesta_catalogo, invalidar_catalogo
+from ..utils.geofence import invalidar_geocercas
+from ..utils.route_deviation import invalidar_trazados
+from ..utils.gps import distancia_m
 
 class RouteBase(BaseModel):
     nombre: str
@@ -13,6 +20,12 @@ class RouteBase(BaseModel):
     distancia: Optional[float] = None
     tiempo_estimado: Optional[int] = None
     activa: Optional[bool] = True
+    # Centros de las geocercas; sin definir se usan los extremos de la geometría
+    origen_lat: Optional[float] = None
+    origen_lng: Optional[float] = None
+    destino_lat: Optional[float] = None
+    destino_lng: Optional[float] = None
+    radio_geocerca: Optional[float] = None  # en metros
 
 class RouteCreate(RouteBase):
     pass
@@ -24,6 +37,11 @@ class RouteUpdate(BaseModel):
     distancia: Optional[float] = None
     tiempo_estimado: Optional[int] = None
     activa: Optional[bool] = None
+    origen_lat: Optional[float] = None
+    origen_lng: Optional[float] = None
+    destino_lat: Optional[float] = None
+    destino_lng: Optional[float] = None
+    radio_geocerca: Optional[float] = None
 
 class RouteResponse(RouteBase):
     id: int
@@ -34,6 +52,26 @@ class RouteResponse(RouteBase):
 class RoutesCreateBulk(BaseModel):
     rutas: List[RouteCreate]
 
+class GeometriaRuta(BaseModel):
+    puntos: List[Tuple[float, float]]  # [lat, lng] del origen al destino
+
+def validar_geocercas(datos: dict):
+    for campo in ("origen", "destino"):
+        lat, lng = datos.get(f"{campo}_lat"), datos.get(f"{campo}_lng")
+        if (lat is None) != (lng is None):
+            raise HTTPException(status_code=400, detail=f"{campo}_lat y {campo}_lng van juntos")
+        if lat is not None and not (-90 <= lat <= 90 and -180 <= lng <= 180):
+            raise HTTPException(status_code=400, detail=f"Coordenadas de {campo} fuera de rango")
+    if datos.get("radio_geocerca") is not None and datos["radio_geocerca"] <= 0:
+        raise HTTPException(status_code=400, detail="radio_geocerca debe ser positivo")
+
+def invalidar_rutas():
+    invalidar_catalogo("rutas")
+    invalidar_geocercas()
+    invalidar_trazados()
+
+catalogo_rutas = TypeAdapter(List[RouteResponse])
+
 router = APIRouter(
     prefix="/rutas",
     tags=["Rutas"]
@@ -41,18 +79,23 @@ router = APIRouter(
 
 @router.post("", response_model=RouteResponse, dependencies=[Depends(check_admin_access)])
 async def crear_ruta(ruta: RouteCreate, db: Session = Depends(get_db)):
+    validar_geocercas(ruta.dict())
     db_ruta = Route(**ruta.dict())
     db.add(db_ruta)
     db.commit()
+    invalidar_rutas()
     db.refresh(db_ruta)
     return db_ruta
 
 @router.get("", response_model=List[RouteResponse])
-async def listar_rutas(solo_activas: bool = False, db: Session = Depends(get_db)):
-    query = db.query(Route)
-    if solo_activas:
-        query = query.filter(Route.activa == True)
-    return query.all()
+async def listar_rutas(request: Request, solo_activas: bool = False, db: Session = Depends(get_db)):
+    """Catálogo de rutas servido desde la caché (ver utils/catalog_cache.py)"""
+    def cargar() -> bytes:
+        query = db.query(Route)
+        if solo_activas:
+            query = query.filter(Route.activa == True)
+        return catalogo_rutas.dump_json(catalogo_rutas.validate_python(query.order_by(Route.id).all(), from_attributes=True))
+    return respuesta_catalogo(request, "rutas", solo_activas, cargar)
 
 @router.get("/{ruta_id}", response_model=RouteResponse)
 async def obtener_ruta(ruta_id: int, db: Session = Depends(get_db)):
@@ -69,10 +112,40 @@ async def actualizar_ruta(ruta_id: int, ruta: RouteUpdate, db: Session = Depends
         raise HTTPException(status_code=404, detail="Ruta no encontrada")
     for key, value in ruta.dict(exclude_unset=True).items():
         setattr(db_ruta, key, value)
+    validar_geocercas({c: getattr(db_ruta, c) for c in ("origen_lat", "origen_lng", "destino_lat", "destino_lng", "radio_geocerca")})
     db.commit()
+    invalidar_rutas()
     db.refresh(db_ruta)
     return db_ruta
 
+@router.get("/{ruta_id}/geometria", response_model=GeometriaRuta)
+async def obtener_geometria_ruta(ruta_id: int, db: Session = Depends(get_db)):
+    """Trazado de la ruta; fuera del catálogo para no inflar GET /rutas"""
+    geometria = db.query(Route.geometria).filter(Route.id == ruta_id).first()
+    if geometria is None:
+        raise HTTPException(status_code=404, detail="Ruta no encontrada")
+    return {"puntos": geometria[0] or []}
+
+@router.put("/{ruta_id}/geometria", response_model=GeometriaRuta,
+           dependencies=[Depends(check_role_access(["administrador", "supervisor"]))])
+async def actualizar_geometria_ruta(ruta_id: int, geometria: GeometriaRuta, db: Session = Depends(get_db)):
+    """Reemplaza el trazado; si la ruta no tiene distancia se calcula del trazado"""
+    db_ruta = db.query(Route).filter(Route.id == ruta_id).first()
+    if db_ruta is None:
+        raise HTTPException(status_code=404, detail="Ruta no encontrada")
+    puntos = [[lat, lng] for lat, lng in geometria.puntos]
+    if len(puntos) < 2:
+        raise HTTPException(status_code=400, detail="El trazado necesita al menos dos puntos")
+    if any(not (-90 <= lat <= 90 and -180 <= lng <= 180) for lat, lng in puntos):
+        raise HTTPException(status_code=400, detail="Coordenadas fuera de rango")
+    db_ruta.geometria = puntos
+    if db_ruta.distancia is None:
+        metros = sum(distancia_m(*a, *b) for a, b in zip(puntos, puntos[1:]))
+        db_ruta.distancia = round(metros / 1000, 2)
+    db.commit()
+    invalidar_rutas()
+    return {"puntos": puntos}
+
 @router.delete("/{ruta_id}")
 async def eliminar_ruta(ruta_id: int, db: Session = Depends(get_db)):
     db_ruta = db.query(Route).filter(Route.id == ruta_id).first()
@@ -81,16 +154,31 @@ async def eliminar_ruta(ruta_id: int, db: Session = Depends(get_db)):
     
     db.delete(db_ruta)
     db.commit()
+    invalidar_rutas()
     return {"message": "Ruta eliminada"}
 
-@router.post("/bulk", response_model=List[RouteResponse])
-async def crear_rutas_bulk(rutas: RoutesCreateBulk, db: Session = Depends(get_db)):
-    db_rutas = []
-    for ruta in rutas.rutas:
-        db_ruta = Route(**ruta.dict())
-        db_rutas.append(db_ruta)
-    db.add_all(db_rutas)
-    db.commit()
-    for ruta in db_rutas:
-        db.refresh(ruta)
-    return db_rutas 
\ No newline at end of file
+@router.post("/bulk", response_model=ResultadoImportacion)
+async def crear_rutas_bulk(
+    rutas: RoutesCreateBulk,
+    politica: PoliticaConflicto = PoliticaConflicto.OMITIR,
+    db: Session = Depends(get_db)
+):
+    """Importa rutas por lotes; una ruta se considera existente si ya hay otra con el mismo nombre"""
+    try:
+        resultado = importar(db, Route, [ruta.dict() for ruta in rutas.rutas], ("nombre",), politica, claves_unicas=False)
+    except ErrorImportacion as e:
+        raise HTTPException(status_code=409, detail=e.resultado)
+    invalidar_rutas()
+    return resultado
+
+@router.post("/carga", response_model=CargaResponse, status_code=202, dependencies=[Depends(check_admin_access)])
+async def cargar_rutas_archivo(
+    background_tasks: BackgroundTasks,
+    archivo: UploadFile = File(...),
+    politica: PoliticaConflicto = PoliticaConflicto.OMITIR,
+    db: Session = Depends(get_db)
+):
+    """Carga rutas desde un CSV/XLSX en segundo plano; el progreso se consulta en /cargas/{id}"""
+    escribir_lote = escritor_importacion(Route, ("nombre",), politica, claves_unicas=False)
+    return iniciar_carga(db, background_tasks, archivo, "rutas", RouteCreate, escribir_lote, politica.value,
+                         al_confirmar=invalidar_rutas)
@@ -0,0 +1,26 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from ..database import get_db
+from ..models.carga import CargaMasiva
+from ..schemas.importacion import CargaResponse
+
+router = APIRouter(
+    prefix="/cargas",
+    tags=["Cargas masivas"]
+)
+
+@router.get("", response_model=List[CargaResponse])
+async def listar_cargas(entidad: Optional[str] = None, limite: int = 20, db: Session = Depends(get_db)):
+    query = db.query(CargaMasiva)
+    if entidad:
+        query = query.filter(CargaMasiva.entidad == entidad)
+    return query.order_by(CargaMasiva.id.desc()).limit(min(limite, 100)).all()
+
+@router.get("/{carga_id}", response_model=CargaResponse)
+async def obtener_carga(carga_id: int, db: Session = Depends(get_db)):
+    """Progreso de una carga masiva: la UI la consulta periódicamente hasta que termina"""
+    carga = db.query(CargaMasiva).filter(CargaMasiva.id == carga_id).first()
+    if carga is None:
+        raise HTTPException(status_code=404, detail="Carga no encontrada")
+    return carga
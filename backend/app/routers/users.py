@@ -1,10 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks, File, UploadFile
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from ..database import get_db
 from ..models.user import User, RolUsuario
 from pydantic import BaseModel, EmailStr, validator
-from ..routers.auth import get_password_hash, verify_password
+from ..routers.auth import get_password_hash, verify_password, check_admin_access
+from ..utils.bulk import importar, PoliticaConflicto, ErrorImportacion
+from ..schemas.importacion import ResultadoImportacion, CargaResponse
+from ..utils.uploads import iniciar_carga, escritor_importacion
 
 # Schemas
 class UserBase(BaseModel):
@@ -207,21 +210,44 @@ async def migrate_roles(db: Session = Depends(get_db)):
             detail=f"Error en migración: {str(e)}"
         )
 
-@router.post("/bulk", response_model=List[UserResponse])
-async def crear_usuarios_bulk(usuarios: UsersCreateBulk, db: Session = Depends(get_db)):
-    db_usuarios = []
-    for usuario in usuarios.usuarios:
-        hashed_password = get_password_hash(usuario.password)
-        db_usuario = User(
-            email=usuario.email,
-            username=usuario.username,
-            nombre_completo=usuario.nombre_completo,
-            hashed_password=hashed_password,
-            rol=normalize_role(usuario.rol).value
-        )
-        db_usuarios.append(db_usuario)
-    db.add_all(db_usuarios)
-    db.commit()
-    for db_usuario in db_usuarios:
-        db.refresh(db_usuario)
-    return db_usuarios 
\ No newline at end of file
+@router.post("/bulk", response_model=ResultadoImportacion)
+async def crear_usuarios_bulk(
+    usuarios: UsersCreateBulk,
+    politica: PoliticaConflicto = PoliticaConflicto.OMITIR,
+    db: Session = Depends(get_db)
+):
+    """Importa usuarios por lotes; un usuario existe si coincide su email o su username"""
+    registros = [
+        {
+            "email": usuario.email,
+            "username": usuario.username,
+            "nombre_completo": usuario.nombre_completo,
+            "hashed_password": get_password_hash(usuario.password),
+            "rol": normalize_role(usuario.rol).value
+        }
+        for usuario in usuarios.usuarios
+    ]
+    try:
+        return importar(db, User, registros, ("email", "username"), politica)
+    except ErrorImportacion as e:
+        raise HTTPException(status_code=409, detail=e.resultado)
+
+def _registro_usuario(usuario: dict) -> dict:
+    return {
+        "email": usuario["email"],
+        "username": usuario["username"],
+        "nombre_completo": usuario["nombre_completo"],
+        "hashed_password": get_password_hash(usuario["password"]),
+        "rol": normalize_role(usuario["rol"]).value
+    }
+
+@router.post("/carga", response_model=CargaResponse, status_code=202, dependencies=[Depends(check_admin_access)])
+async def cargar_usuarios_archivo(
+    background_tasks: BackgroundTasks,
+    archivo: UploadFile = File(...),
+    politica: PoliticaConflicto = PoliticaConflicto.OMITIR,
+    db: Session = Depends(get_db)
+):
+    """Carga usuarios desde un CSV/XLSX (columna password en texto plano) en segundo plano"""
+    escribir_lote = escritor_importacion(User, ("email", "username"), politica, preparar=_registro_usuario)
+    return iniciar_carga(db, background_tasks, archivo, "usuarios", UserCreate, escribir_lote, politica.value)
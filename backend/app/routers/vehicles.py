@@ -1,10 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException, Body
+from fastapi import APIRouter, Depends, HTTPException, Body, BackgroundTasks, File, UploadFile, Request
 from sqlalchemy.orm import Session
 from typing import List, Optional
-from ..database import get_db
-from ..models.vehicle import Vehicle, PicoYPlacaConfig
-from pydantic import BaseModel
-from datetime import date
+from ..database import get_db, get_db_lectura
+from ..models.vehicle import Vehicle, PicoYPlacaConfig, CumplimientoFlota
+from pydantic import BaseModel, TypeAdapter
+from datetime import date, datetime, timedelta, timezone
+from sqlalchemy import and_, or_, func, case
+from ..utils.pico_y_placa import obtener_regla, obtener_indice_flota, establecer_regla, invalidar_flota
+from ..utils.bulk import importar, PoliticaConflicto, ErrorImportacion
+from ..schemas.importacion import ResultadoImportacion, CargaResponse
+from ..utils.uploads import iniciar_carga, escritor_importacion
+from .auth import check_role_access
+from ..utils.scheduling import hoy_operacion
+from ..utils.catalog_cache import respuesta_catalogo, invalidar_catalogo
+from ..utils.availability import calendario_disponibilidad, bits_a_texto, MAX_DIAS_CALENDARIO
 
 class VehicleBase(BaseModel):
     placa: str
@@ -38,12 +47,104 @@ class VehicleResponse(VehicleBase):
 class VehiclesCreateBulk(BaseModel):
     vehiculos: List[VehicleCreate]
 
+catalogo_vehiculos = TypeAdapter(List[VehicleResponse])
+
 class PicoYPlacaConfigSchema(BaseModel):
     config: dict
 
     class Config:
         from_attributes = True
 
+class VehiculoRestringido(BaseModel):
+    id: int
+    placa: Optional[str] = None
+
+class RestringidosPicoYPlacaResponse(BaseModel):
+    fecha: date
+    digitos: List[str]
+    vehiculos: List[VehiculoRestringido]
+
+class DisponibilidadVehiculo(BaseModel):
+    id: int
+    placa: Optional[str] = None
+    disponibilidad: str  # un carácter por día desde `desde`: '1' disponible, '0' no
+    dias_disponibles: int
+    bloqueos: Optional[dict[str, str]] = None
+
+class CalendarioDisponibilidadResponse(BaseModel):
+    desde: date
+    hasta: date
+    dias: int
+    disponibles_por_dia: List[int]
+    vehiculos: List[DisponibilidadVehiculo]
+
+class DocumentoVencimiento(BaseModel):
+    documento: str
+    vencimiento: date
+    dias_restantes: int
+
+class VehicleVencimientoResponse(VehicleResponse):
+    proximo_vencimiento: date
+    documentos: List[DocumentoVencimiento]
+
+class CumplimientoDocumento(BaseModel):
+    vencidos: int
+    por_vencer: int
+    al_dia: int
+    sin_registro: int
+
+class CumplimientoFlotaResponse(BaseModel):
+    fecha: date
+    generado_en: datetime
+    dias_alerta: int
+    total_vehiculos: int
+    vehiculos_activos: int
+    vehiculos_al_dia: int
+    documentos: dict[str, CumplimientoDocumento]
+
+# Documentos con vencimiento: nombre en la respuesta -> columna del modelo
+DOCUMENTOS_VENCIMIENTO = {
+    "soat": Vehicle.soat_vencimiento,
+    "tecnomecanica": Vehicle.tecnomecanica_vencimiento,
+    "kit": Vehicle.kit_vencimiento,
+}
+DIAS_ALERTA_VENCIMIENTO = 30
+
+def calcular_cumplimiento_flota(db: Session, hoy: date) -> dict:
+    """Calcula los conteos de cumplimiento de toda la flota en una sola consulta agregada"""
+    limite = hoy + timedelta(days=DIAS_ALERTA_VENCIMIENTO)
+    columnas = [func.count(Vehicle.id), func.sum(case((Vehicle.activo == True, 1), else_=0))]
+    for columna in DOCUMENTOS_VENCIMIENTO.values():
+        columnas += [
+            func.sum(case((columna < hoy, 1), else_=0)),
+            func.sum(case((and_(columna >= hoy, columna <= limite), 1), else_=0)),
+            func.sum(case((columna > limite, 1), else_=0)),
+        ]
+    columnas.append(func.sum(case((and_(*[col > limite for col in DOCUMENTOS_VENCIMIENTO.values()]), 1), else_=0)))
+    fila = [valor or 0 for valor in db.query(*columnas).one()]
+
+    total, activos = fila[0], fila[1]
+    documentos = {}
+    for i, nombre in enumerate(DOCUMENTOS_VENCIMIENTO):
+        vencidos, por_vencer, al_dia = fila[2 + i * 3: 5 + i * 3]
+        documentos[nombre] = {
+            "vencidos": vencidos,
+            "por_vencer": por_vencer,
+            "al_dia": al_dia,
+            "sin_registro": total - vencidos - por_vencer - al_dia,
+        }
+    return {
+        "dias_alerta": DIAS_ALERTA_VENCIMIENTO,
+        "total_vehiculos": total,
+        "vehiculos_activos": activos,
+        "vehiculos_al_dia": fila[-1],
+        "documentos": documentos,
+    }
+
+def invalidar_cumplimiento_flota(db: Session):
+    """Descarta las fotos de cumplimiento vigentes; se recalculan en la siguiente lectura"""
+    db.query(CumplimientoFlota).filter(CumplimientoFlota.fecha >= hoy_operacion()).delete(synchronize_session=False)
+
 router = APIRouter(
     prefix="/vehiculos",
     tags=["Vehículos"]
@@ -62,39 +163,26 @@ async def crear_vehiculo(vehiculo: VehicleCreate, db: Session = Depends(get_db))
         activo=vehiculo.activo
     )
     db.add(db_vehiculo)
+    invalidar_cumplimiento_flota(db)
     db.commit()
+    invalidar_flota()
+    invalidar_catalogo("vehiculos")
     db.refresh(db_vehiculo)
     return db_vehiculo
 
 @router.get("", response_model=List[VehicleResponse])
-async def listar_vehiculos(solo_activos: bool = False, db: Session = Depends(get_db)):
-    query = db.query(Vehicle)
-    if solo_activos:
-        query = query.filter(Vehicle.activo == True)
-    return query.all()
+async def listar_vehiculos(request: Request, solo_activos: bool = False, db: Session = Depends(get_db)):
+    """Catálogo de vehículos servido desde la caché (ver utils/catalog_cache.py)"""
+    def cargar() -> bytes:
+        query = db.query(Vehicle)
+        if solo_activos:
+            query = query.filter(Vehicle.activo == True)
+        return catalogo_vehiculos.dump_json(catalogo_vehiculos.validate_python(query.order_by(Vehicle.id).all(), from_attributes=True))
+    return respuesta_catalogo(request, "vehiculos", solo_activos, cargar)
 
 @router.get("/pico-y-placa-config", response_model=PicoYPlacaConfigSchema)
 async def get_pico_y_placa_config(db: Session = Depends(get_db)):
-    default = {"1": ["0", "1"], "2": ["2", "3"], "3": ["4"], "4": ["5", "6"], "5": ["7", "8"], "6": ["9"], "0": []}
-    config = db.query(PicoYPlacaConfig).first()
-    needs_update = False
-
-    if not config:
-        config = PicoYPlacaConfig(config=default)
-        db.add(config)
-        db.commit()
-        db.refresh(config)
-    else:
-        # Si el campo config es None, vacío o no es un dict válido, lo repara
-        if not config.config or not isinstance(config.config, dict):
-            config.config = default
-            needs_update = True
-
-    if needs_update:
-        db.commit()
-        db.refresh(config)
-
-    return {"config": config.config}
+    return {"config": obtener_regla(db).config}
 
 @router.put("/pico-y-placa-config", response_model=PicoYPlacaConfigSchema)
 async def update_pico_y_placa_config(data: PicoYPlacaConfigSchema = Body(...), db: Session = Depends(get_db)):
@@ -106,8 +194,119 @@ async def update_pico_y_placa_config(data: PicoYPlacaConfigSchema = Body(...), d
         config.config = data.config
     db.commit()
     db.refresh(config)
+    establecer_regla(config.config)
     return {"config": config.config}
 
+@router.get("/pico-y-placa/restringidos", response_model=RestringidosPicoYPlacaResponse)
+async def listar_restringidos_pico_y_placa(fecha: Optional[date] = None, db: Session = Depends(get_db)):
+    """Vehículos de la flota con pico y placa en la fecha (hoy por defecto), resuelto en memoria"""
+    fecha = fecha or hoy_operacion()
+    regla = obtener_regla(db)
+    restringidos = obtener_indice_flota(db).restringidos(regla, fecha)
+    return {
+        "fecha": fecha,
+        "digitos": regla.digitos_restringidos(fecha),
+        "vehiculos": [{"id": vehiculo_id, "placa": placa} for vehiculo_id, placa in sorted(restringidos)]
+    }
+
+@router.get("/disponibilidad", response_model=CalendarioDisponibilidadResponse)
+async def obtener_calendario_disponibilidad(
+    desde: Optional[date] = None,
+    hasta: Optional[date] = None,
+    solo_activos: bool = False,
+    detalle: bool = False,
+    db: Session = Depends(get_db_lectura)
+):
+    """Calendario vehículo × día combinando activo, pico y placa, vencimientos y trayectos reservados"""
+    desde = desde or hoy_operacion()
+    hasta = hasta or desde + timedelta(days=29)
+    if hasta < desde:
+        raise HTTPException(status_code=400, detail="La fecha 'hasta' debe ser posterior a 'desde'")
+    if (hasta - desde).days + 1 > MAX_DIAS_CALENDARIO:
+        raise HTTPException(status_code=400, detail=f"El rango no puede superar {MAX_DIAS_CALENDARIO} días")
+
+    calendario, filas = calendario_disponibilidad(db, desde, hasta, solo_activos)
+    dias = calendario.dias
+    vehiculos = []
+    for fila in filas:
+        vehiculo = {
+            "id": fila["id"],
+            "placa": fila["placa"],
+            "disponibilidad": bits_a_texto(fila["disponible"], dias),
+            "dias_disponibles": bin(fila["disponible"]).count("1"),
+        }
+        if detalle:
+            vehiculo["bloqueos"] = {motivo: bits_a_texto(mascara, dias) for motivo, mascara in fila["bloqueos"].items()}
+        vehiculos.append(vehiculo)
+
+    return {
+        "desde": desde,
+        "hasta": hasta,
+        "dias": dias,
+        "disponibles_por_dia": calendario.totales_por_dia(f["disponible"] for f in filas),
+        "vehiculos": vehiculos
+    }
+
+@router.get("/vencimientos", response_model=List[VehicleVencimientoResponse])
+async def listar_vencimientos(
+    desde: Optional[date] = None,
+    hasta: Optional[date] = None,
+    solo_activos: bool = False,
+    db: Session = Depends(get_db_lectura)
+):
+    """Vehículos con algún documento que vence en [desde, hasta], ordenados por el vencimiento más próximo"""
+    hoy = hoy_operacion()
+    desde = desde or hoy
+    hasta = hasta or hoy + timedelta(days=DIAS_ALERTA_VENCIMIENTO)
+    if hasta < desde:
+        raise HTTPException(status_code=400, detail="La fecha 'hasta' debe ser posterior a 'desde'")
+
+    # Cada rama del OR usa el índice de su columna de vencimiento
+    query = db.query(Vehicle).filter(or_(
+        *[columna.between(desde, hasta) for columna in DOCUMENTOS_VENCIMIENTO.values()]
+    ))
+    if solo_activos:
+        query = query.filter(Vehicle.activo == True)
+
+    resultado = []
+    for vehiculo in query.all():
+        documentos = []
+        for nombre, columna in DOCUMENTOS_VENCIMIENTO.items():
+            vencimiento = getattr(vehiculo, columna.key)
+            if vencimiento is not None and desde <= vencimiento <= hasta:
+                documentos.append({
+                    "documento": nombre,
+                    "vencimiento": vencimiento,
+                    "dias_restantes": (vencimiento - hoy).days
+                })
+        documentos.sort(key=lambda d: d["vencimiento"])
+        respuesta = VehicleResponse.model_validate(vehiculo).model_dump()
+        respuesta.update(proximo_vencimiento=documentos[0]["vencimiento"], documentos=documentos)
+        resultado.append(respuesta)
+
+    resultado.sort(key=lambda v: (v["proximo_vencimiento"], v["placa"] or ""))
+    return resultado
+
+@router.get("/cumplimiento", response_model=CumplimientoFlotaResponse)
+async def obtener_cumplimiento_flota(db: Session = Depends(get_db)):
+    """Resumen de cumplimiento documental de la flota, precalculado una vez por día"""
+    hoy = hoy_operacion()
+    snapshot = db.query(CumplimientoFlota).filter(CumplimientoFlota.fecha == hoy).first()
+    if not snapshot:
+        snapshot = CumplimientoFlota(
+            fecha=hoy,
+            datos=calcular_cumplimiento_flota(db, hoy),
+            generado_en=datetime.now(timezone.utc)
+        )
+        db.add(snapshot)
+        try:
+            db.commit()
+        except Exception:
+            # Otro worker generó la foto del día al mismo tiempo
+            db.rollback()
+            snapshot = db.query(CumplimientoFlota).filter(CumplimientoFlota.fecha == hoy).one()
+    return {"fecha": snapshot.fecha, "generado_en": snapshot.generado_en, **snapshot.datos}
+
 @router.get("/{vehiculo_id}", response_model=VehicleResponse)
 async def obtener_vehiculo(vehiculo_id: int, db: Session = Depends(get_db)):
     vehiculo = db.query(Vehicle).filter(Vehicle.id == vehiculo_id).first()
@@ -115,27 +314,45 @@ async def obtener_vehiculo(vehiculo_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Vehículo no encontrado")
     return vehiculo
 
-@router.post("/bulk", response_model=List[VehicleResponse])
-async def crear_vehiculos_bulk(vehiculos: VehiclesCreateBulk, db: Session = Depends(get_db)):
-    db_vehiculos = []
-    for vehiculo in vehiculos.vehiculos:
-        db_vehiculo = Vehicle(
-            placa=vehiculo.placa,
-            modelo=vehiculo.modelo,
-            capacidad=vehiculo.capacidad,
-            soat_vencimiento=vehiculo.soat_vencimiento,
-            tecnomecanica_vencimiento=vehiculo.tecnomecanica_vencimiento,
-            kit_vencimiento=vehiculo.kit_vencimiento,
-            pico_placa=vehiculo.pico_placa,
-            activo=vehiculo.activo
-        )
-        db_vehiculos.append(db_vehiculo)
-    
-    db.add_all(db_vehiculos)
-    db.commit()
-    for vehiculo in db_vehiculos:
-        db.refresh(vehiculo)
-    return db_vehiculos
+@router.post("/bulk", response_model=ResultadoImportacion)
+async def crear_vehiculos_bulk(
+    vehiculos: VehiclesCreateBulk,
+    politica: PoliticaConflicto = PoliticaConflicto.OMITIR,
+    db: Session = Depends(get_db)
+):
+    """Importa vehículos por lotes; `politica` decide qué hacer con placas ya registradas"""
+    try:
+        resultado = importar(db, Vehicle, [v.dict() for v in vehiculos.vehiculos], ("placa",), politica, commit=False)
+        invalidar_cumplimiento_flota(db)
+        db.commit()
+    except ErrorImportacion as e:
+        raise HTTPException(status_code=409, detail=e.resultado)
+    invalidar_flota()
+    invalidar_catalogo("vehiculos")
+    return resultado
+
+@router.post("/carga", response_model=CargaResponse, status_code=202,
+             dependencies=[Depends(check_role_access(["administrador", "supervisor"]))])
+async def cargar_vehiculos_archivo(
+    background_tasks: BackgroundTasks,
+    archivo: UploadFile = File(...),
+    politica: PoliticaConflicto = PoliticaConflicto.OMITIR,
+    db: Session = Depends(get_db)
+):
+    """Carga vehículos desde un CSV/XLSX en segundo plano; el progreso se consulta en /cargas/{id}"""
+    importar_lote = escritor_importacion(Vehicle, ("placa",), politica)
+
+    def escribir_lote(db_carga: Session, lote):
+        reporte = importar_lote(db_carga, lote)
+        invalidar_cumplimiento_flota(db_carga)
+        return reporte
+
+    def al_confirmar():
+        invalidar_flota()
+        invalidar_catalogo("vehiculos")
+
+    return iniciar_carga(db, background_tasks, archivo, "vehiculos", VehicleCreate, escribir_lote, politica.value,
+                         al_confirmar=al_confirmar)
 
 @router.put("/{vehiculo_id}", response_model=VehicleResponse)
 async def actualizar_vehiculo(vehiculo_id: int, vehiculo: VehicleUpdate, db: Session = Depends(get_db)):
@@ -146,7 +363,10 @@ async def actualizar_vehiculo(vehiculo_id: int, vehiculo: VehicleUpdate, db: Ses
     for key, value in vehiculo.dict(exclude_unset=True).items():
         setattr(db_vehiculo, key, value)
     
+    invalidar_cumplimiento_flota(db)
     db.commit()
+    invalidar_flota()
+    invalidar_catalogo("vehiculos")
     db.refresh(db_vehiculo)
     return db_vehiculo
 
@@ -157,5 +377,8 @@ async def eliminar_vehiculo(vehiculo_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Vehículo no encontrado")
     
     db.delete(db_vehiculo)
+    invalidar_cumplimiento_flota(db)
     db.commit()
+    invalidar_flota()
+    invalidar_catalogo("vehiculos")
     return {"message": "Vehículo eliminado"} 
\ No newline at end of file
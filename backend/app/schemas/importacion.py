@@ -0,0 +1,38 @@
+from pydantic import BaseModel
+from datetime import datetime
+from typing import List, Optional
+
+class FilaImportacion(BaseModel):
+    fila: int
+    estado: str  # creado | actualizado | omitido | error
+    id: Optional[int] = None
+    clave: Optional[str] = None
+    detalle: Optional[str] = None
+
+class ResultadoImportacion(BaseModel):
+    total: int
+    creados: int
+    actualizados: int
+    omitidos: int
+    errores: int
+    filas: List[FilaImportacion]
+
+class CargaResponse(BaseModel):
+    id: int
+    entidad: str
+    archivo: Optional[str] = None
+    politica: Optional[str] = None
+    estado: str  # PENDIENTE | PROCESANDO | COMPLETADA | FALLIDA
+    filas_procesadas: int
+    creados: int
+    actualizados: int
+    omitidos: int
+    errores: int
+    porcentaje: Optional[float] = None
+    errores_detalle: Optional[List[FilaImportacion]] = None
+    mensaje: Optional[str] = None
+    creado_en: datetime
+    finalizado_en: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
@@ -0,0 +1,323 @@
+"""
+Archivo mensual de trayectos cerrados.
+
+Los trayectos COMPLETADO y CANCELADO de meses anteriores a la ventana de
+retención (`ARCHIVO_RETENCION_DIAS`), junto con sus novedades, salen de las
+tablas calientes a un archivo por mes:
+
+    {ARCHIVO_DIR}/trayectos/AAAA-MM.json.gz
+
+Cada archivo es JSON columnar comprimido con gzip:
+{"mes": "2024-03", "trayectos": {"n": ..., "columnas": {...}},
+ "novedades": {"n": ..., "columnas": {...}}}. Los trayectos se guardan con los
+mismos campos (ya desnormalizados: ruta, conductor, placa, novedades) que
+devuelve GET /trayectos, de modo que el listado puede mezclarlos sin volver a
+consultar nada; las novedades se guardan completas.
+
+El archivo es la única copia de esos trayectos: ARCHIVO_DIR tiene que ser
+una ruta absoluta a un directorio que ya exista en almacenamiento
+persistente (un volumen montado, no el sistema de archivos del contenedor,
+que se pierde al redesplegar). Sin definir, o relativa, no se archiva.
+
+El archivo se escribe en un temporal, se sincroniza a disco, se vuelve a
+leer para comprobar que trae todos los ids y solo entonces se renombra y se
+borran las filas. Archivar de nuevo un mes ya archivado fusiona por id: si
+el proceso se interrumpe entre los dos pasos, volver a ejecutarlo no duplica
+ni pierde trayectos.
+
+Qué lee el archivo: GET /trayectos con desde/hasta, GET /trayectos/{id} y
+los totales de GET /novedades/stats. GET /novedades/ lista solo las
+novedades de la tabla caliente; las archivadas se ven en su trayecto.
+
+Uso (desde backend/, p. ej. mensual en un cron):
+    python -m app.utils.archive [--retencion-dias 180] [--simular]
+"""
+import argparse
+import bisect
+import gzip
+import logging
+import os
+import sys
+import threading
+from collections import Counter, OrderedDict
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+import orjson
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from ..core.config import settings
+from ..models.journey import Journey, EstadoTrayecto
+from ..models.novedad import Novedad
+from .fast_json import dumps
+from .scheduling import hoy_operacion
+
+logger = logging.getLogger(__name__)
+
+ESTADOS_CERRADOS = (EstadoTrayecto.COMPLETADO, EstadoTrayecto.CANCELADO)
+COLUMNAS_NOVEDAD = ("id", "trayecto_id", "conductor_id", "tipo", "notas", "fecha_reporte")
+LOTE_BORRADO = 500
+MESES_EN_CACHE = 12
+
+# Fecha con la que un trayecto cae en un mes del archivo y en un rango de consulta
+fecha_trayecto = func.coalesce(Journey.fecha_salida, Journey.inicio_programado, Journey.fecha_llegada)
+
+class ArchivoNoDisponible(RuntimeError):
+    pass
+
+def directorio_archivo() -> str:
+    return os.path.join(settings.ARCHIVO_DIR or "", "trayectos")
+
+def validar_directorio():
+    """Lanza ArchivoNoDisponible si ARCHIVO_DIR no sirve para guardar la única copia"""
+    raiz = settings.ARCHIVO_DIR
+    if not raiz:
+        raise ArchivoNoDisponible("ARCHIVO_DIR no está definido")
+    if not os.path.isabs(raiz):
+        raise ArchivoNoDisponible(f"ARCHIVO_DIR debe ser una ruta absoluta: {raiz!r}")
+    if not os.path.isdir(raiz):
+        raise ArchivoNoDisponible(f"ARCHIVO_DIR no existe (¿volumen sin montar?): {raiz}")
+
+def ruta_mes(mes: str) -> str:
+    return os.path.join(directorio_archivo(), f"{mes}.json.gz")
+
+def meses_archivados() -> List[str]:
+    if not settings.ARCHIVO_DIR:
+        return []
+    try:
+        nombres = os.listdir(directorio_archivo())
+    except FileNotFoundError:
+        return []
+    return sorted(n[:-len(".json.gz")] for n in nombres if n.endswith(".json.gz"))
+
+def _inicio_dia(dia: date) -> datetime:
+    return datetime.combine(dia, time.min, tzinfo=timezone.utc)
+
+def _columnar(filas: List[dict], columnas) -> dict:
+    return {"n": len(filas), "columnas": {c: [f[c] for f in filas] for c in columnas}}
+
+def _filas(bloque: dict) -> List[dict]:
+    columnas = bloque["columnas"]
+    return [dict(zip(columnas, valores)) for valores in zip(*columnas.values())] if bloque["n"] else []
+
+# Lectura ------------------------------------------------------------------
+
+_cache: "OrderedDict[Tuple[str, float], dict]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+def leer_mes(mes: str) -> Optional[dict]:
+    """Contenido de un mes archivado; los últimos meses leídos quedan en memoria"""
+    ruta = ruta_mes(mes)
+    try:
+        clave = (ruta, os.path.getmtime(ruta))
+    except FileNotFoundError:
+        return None
+    with _cache_lock:
+        if clave in _cache:
+            _cache.move_to_end(clave)
+            return _cache[clave]
+    with gzip.open(ruta, "rb") as archivo:
+        contenido = orjson.loads(archivo.read())
+    with _cache_lock:
+        _cache[clave] = contenido
+        while len(_cache) > MESES_EN_CACHE:
+            _cache.popitem(last=False)
+    return contenido
+
+def _meses_entre(desde: date, hasta: date) -> List[str]:
+    meses, actual = [], desde.replace(day=1)
+    while actual <= hasta:
+        meses.append(f"{actual:%Y-%m}")
+        actual = (actual + timedelta(days=32)).replace(day=1)
+    return meses
+
+def _fecha_fila(fila: dict) -> str:
+    return (fila["fecha_salida"] or fila["inicio_programado"] or fila["fecha_llegada"] or "")[:10]
+
+def trayectos_archivados(desde: Optional[date], hasta: Optional[date]) -> List[dict]:
+    """Trayectos archivados (con los campos del listado) cuya fecha cae en [desde, hasta]"""
+    archivados = meses_archivados()
+    if not archivados:
+        return []
+    desde = desde or date.fromisoformat(f"{archivados[0]}-01")
+    hasta = hasta or hoy_operacion()
+    inicio, fin = desde.isoformat(), hasta.isoformat()
+    filas = []
+    for mes in _meses_entre(desde, hasta):
+        contenido = leer_mes(mes) if mes in archivados else None
+        if contenido:
+            filas.extend(f for f in _filas(contenido["trayectos"]) if inicio <= _fecha_fila(f) <= fin)
+    return filas
+
+def trayecto_archivado(trayecto_id: int) -> Optional[dict]:
+    """Fila del listado de un trayecto archivado, buscándolo del mes más reciente al más antiguo"""
+    for mes in reversed(meses_archivados()):
+        contenido = leer_mes(mes)
+        if not contenido or not contenido["trayectos"]["n"]:
+            continue
+        columnas = contenido["trayectos"]["columnas"]
+        # Las filas de cada mes están ordenadas por id
+        i = bisect.bisect_left(columnas["id"], trayecto_id)
+        if i < len(columnas["id"]) and columnas["id"][i] == trayecto_id:
+            return {c: valores[i] for c, valores in columnas.items()}
+    return None
+
+# ruta -> (mtime, conteo por tipo)
+_conteos: Dict[str, Tuple[float, Counter]] = {}
+
+def novedades_archivadas_por_tipo() -> Counter:
+    """Novedades archivadas por tipo (valor del Enum), sumando todos los meses"""
+    total = Counter()
+    for mes in meses_archivados():
+        ruta = ruta_mes(mes)
+        try:
+            modificado = os.path.getmtime(ruta)
+        except FileNotFoundError:
+            continue
+        guardado = _conteos.get(ruta)
+        if guardado is None or guardado[0] != modificado:
+            contenido = leer_mes(mes)
+            conteo = Counter(contenido["novedades"]["columnas"]["tipo"]) if contenido and contenido["novedades"]["n"] else Counter()
+            guardado = _conteos[ruta] = (modificado, conteo)
+        total.update(guardado[1])
+    return total
+
+def filtro_rango(desde: Optional[date], hasta: Optional[date]):
+    """Condición sobre la tabla caliente equivalente al rango del archivo"""
+    condiciones = []
+    if desde:
+        condiciones.append(fecha_trayecto >= _inicio_dia(desde))
+    if hasta:
+        condiciones.append(fecha_trayecto < _inicio_dia(hasta + timedelta(days=1)))
+    return condiciones
+
+# Archivado ----------------------------------------------------------------
+
+def limite_retencion(hoy: date, retencion_dias: int) -> date:
+    """Primer día del mes de (hoy - retención): se archivan solo meses completos anteriores"""
+    return (hoy - timedelta(days=retencion_dias)).replace(day=1)
+
+def _escribir_mes(mes: str, trayectos: List[dict], novedades: List[dict]):
+    previo = leer_mes(mes)
+    if previo:
+        # Un archivado anterior interrumpido antes de borrar: se fusiona por id
+        nuevos_t = {f["id"] for f in trayectos}
+        nuevos_n = {f["id"] for f in novedades}
+        trayectos = [f for f in _filas(previo["trayectos"]) if f["id"] not in nuevos_t] + trayectos
+        novedades = [f for f in _filas(previo["novedades"]) if f["id"] not in nuevos_n] + novedades
+    trayectos.sort(key=lambda f: f["id"])
+    novedades.sort(key=lambda f: f["id"])
+
+    os.makedirs(directorio_archivo(), exist_ok=True)
+    contenido = orjson.dumps({
+        "mes": mes,
+        "trayectos": _columnar(trayectos, trayectos[0].keys() if trayectos else ()),
+        "novedades": _columnar(novedades, COLUMNAS_NOVEDAD),
+    }, option=orjson.OPT_NON_STR_KEYS)
+    temporal = f"{ruta_mes(mes)}.tmp"
+    with open(temporal, "wb") as destino:
+        with gzip.GzipFile(fileobj=destino, mode="wb", compresslevel=6) as archivo:
+            archivo.write(contenido)
+        destino.flush()
+        os.fsync(destino.fileno())
+    _verificar(temporal, [f["id"] for f in trayectos], [f["id"] for f in novedades])
+    os.replace(temporal, ruta_mes(mes))
+    descriptor = os.open(directorio_archivo(), os.O_RDONLY)
+    try:
+        os.fsync(descriptor)
+    finally:
+        os.close(descriptor)
+
+def _verificar(ruta: str, trayectos: List[int], novedades: List[int]):
+    """Relee el archivo escrito; si no trae exactamente esos ids no se borra nada"""
+    try:
+        with gzip.open(ruta, "rb") as archivo:
+            leido = orjson.loads(archivo.read())
+        ids_t = leido["trayectos"]["columnas"].get("id", []) if leido["trayectos"]["n"] else []
+        ids_n = leido["novedades"]["columnas"]["id"] if leido["novedades"]["n"] else []
+    except (OSError, EOFError, orjson.JSONDecodeError, KeyError) as e:
+        raise ArchivoNoDisponible(f"{ruta} no se pudo releer: {e}")
+    if ids_t != trayectos or ids_n != novedades:
+        raise ArchivoNoDisponible(f"{ruta} no contiene los trayectos y novedades escritos")
+
+def archivar_mes(db: Session, mes_inicio: date, simular: bool = False) -> Tuple[int, int]:
+    """Archiva los trayectos cerrados de un mes; devuelve (trayectos, novedades)"""
+    from ..routers.journeys import filas_trayectos
+
+    mes_fin = (mes_inicio + timedelta(days=32)).replace(day=1)
+    condicion = [
+        Journey.estado.in_(ESTADOS_CERRADOS),
+        fecha_trayecto >= _inicio_dia(mes_inicio),
+        fecha_trayecto < _inicio_dia(mes_fin),
+    ]
+    ids = [i for (i,) in db.query(Journey.id).filter(*condicion).order_by(Journey.id)]
+    if not ids:
+        return 0, 0
+    # Los trayectos sin vehículo no salen en el listado, pero también se archivan
+    trayectos = filas_trayectos(db, condicion, incluir_sin_vehiculo=True)
+    novedades = [
+        dict(zip(COLUMNAS_NOVEDAD, (n.id, n.trayecto_id, n.conductor_id, n.tipo.value, n.notas, n.fecha_reporte)))
+        for n in db.query(Novedad).join(Journey, Journey.id == Novedad.trayecto_id).filter(*condicion)
+    ]
+    if simular:
+        return len(trayectos), len(novedades)
+    validar_directorio()
+
+    # Misma codificación que las respuestas de la API (fechas ISO, Enum por valor)
+    trayectos = orjson.loads(dumps(trayectos))
+    novedades = orjson.loads(dumps(novedades))
+    _escribir_mes(f"{mes_inicio:%Y-%m}", trayectos, novedades)
+
+    for i in range(0, len(ids), LOTE_BORRADO):
+        lote = ids[i:i + LOTE_BORRADO]
+        db.query(Novedad).filter(Novedad.trayecto_id.in_(lote)).delete(synchronize_session=False)
+        db.query(Journey).filter(Journey.id.in_(lote)).delete(synchronize_session=False)
+    db.commit()
+    return len(trayectos), len(novedades)
+
+def archivar(db: Session, retencion_dias: Optional[int] = None, simular: bool = False) -> Dict[str, Tuple[int, int]]:
+    """Archiva mes a mes todo lo cerrado antes del límite de retención"""
+    retencion = settings.ARCHIVO_RETENCION_DIAS if retencion_dias is None else retencion_dias
+    limite = limite_retencion(hoy_operacion(), retencion)
+    primero = db.query(func.min(fecha_trayecto)).filter(
+        Journey.estado.in_(ESTADOS_CERRADOS), fecha_trayecto < _inicio_dia(limite)
+    ).scalar()
+    resultado = {}
+    if primero is None:
+        return resultado
+    mes = primero.date().replace(day=1)
+    while mes < limite:
+        trayectos, novedades = archivar_mes(db, mes, simular)
+        if trayectos:
+            resultado[f"{mes:%Y-%m}"] = (trayectos, novedades)
+            logger.info(f"{mes:%Y-%m}: {trayectos} trayectos y {novedades} novedades "
+                        f"{'por archivar' if simular else 'archivados'}")
+        mes = (mes + timedelta(days=32)).replace(day=1)
+    return resultado
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Archiva los trayectos cerrados fuera de la ventana de retención")
+    parser.add_argument("--retencion-dias", type=int, default=settings.ARCHIVO_RETENCION_DIAS)
+    parser.add_argument("--simular", action="store_true", help="solo informa qué se archivaría")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    from ..database import SessionLocal, get_engine
+
+    get_engine()
+    db = SessionLocal()
+    try:
+        resultado = archivar(db, args.retencion_dias, args.simular)
+    except ArchivoNoDisponible as e:
+        logger.error(f"No se archivó nada: {e}")
+        return 1
+    finally:
+        db.close()
+    total = sum(t for t, _ in resultado.values())
+    logger.info(f"{total} trayectos en {len(resultado)} meses {'por archivar' if args.simular else 'archivados'} "
+                f"(límite {limite_retencion(hoy_operacion(), args.retencion_dias)})")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
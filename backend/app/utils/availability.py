@@ -0,0 +1,154 @@
+"""
+Calendario de disponibilidad de la flota (vehículo × día) con bitsets.
+
+Cada vehículo se representa con un entero: el bit `i` está encendido si el
+vehículo se puede usar el día `desde + i`. El calendario se arma en una sola
+pasada combinando máscaras precalculadas:
+
+- `activo`: un vehículo inactivo no tiene ningún día disponible.
+- pico y placa: máscara de días por día de la semana, combinada con la
+  máscara de dígitos del vehículo (ver `utils.pico_y_placa`).
+- vencimientos: SOAT, tecnomecánica y kit habilitan los días hasta su fecha
+  de vencimiento inclusive; una fecha sin registrar no bloquea.
+- reservas: trayectos PROGRAMADO/EN_CURSO ocupan el día de su inicio
+  programado (o de su salida real si no tienen horario).
+
+Los datos se cargan con consultas de proyección (sin hidratar objetos ORM).
+"""
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from ..models.journey import Journey, EstadoTrayecto
+from ..models.vehicle import Vehicle
+from .pico_y_placa import ReglaPicoYPlaca, mascara_vehiculo, dia_semana, obtener_regla
+from .scheduling import inicio_dia, zona_operacion
+
+MAX_DIAS_CALENDARIO = 92
+ESTADOS_RESERVA = (EstadoTrayecto.PROGRAMADO, EstadoTrayecto.EN_CURSO)
+
+def fecha_local(valor) -> Optional[date]:
+    """Fecha calendario (en ZONA_HORARIA) de un datetime guardado en UTC"""
+    if valor is None:
+        return None
+    if isinstance(valor, datetime):
+        if valor.tzinfo is None:
+            valor = valor.replace(tzinfo=timezone.utc)
+        return valor.astimezone(zona_operacion()).date()
+    return valor
+
+def mascara_hasta(desde: date, dias: int, vencimiento: Optional[date]) -> int:
+    """Días del rango en los que el documento sigue vigente (hasta `vencimiento` inclusive)"""
+    if vencimiento is None:
+        return (1 << dias) - 1
+    k = (vencimiento - desde).days + 1
+    if k <= 0:
+        return 0
+    return (1 << min(k, dias)) - 1
+
+def bits_a_texto(mascara: int, dias: int) -> str:
+    """Bitset como texto '1'/'0', un carácter por día empezando por `desde`"""
+    return format(mascara, f"0{dias}b")[::-1] if dias else ""
+
+class CalendarioFlota:
+    """Calcula bitsets de disponibilidad para un rango de fechas"""
+
+    def __init__(self, regla: ReglaPicoYPlaca, desde: date, hasta: date):
+        self.regla = regla
+        self.desde = desde
+        self.dias = (hasta - desde).days + 1
+        self.todos = (1 << self.dias) - 1
+        # Días del rango que caen en cada día de la semana (0=Domingo)
+        self.dias_semana = [0] * 7
+        for i in range(self.dias):
+            self.dias_semana[dia_semana(desde + timedelta(days=i))] |= 1 << i
+        self._pico_placa: Dict[int, int] = {}
+
+    def mascara_pico_placa(self, mascara_digitos: int) -> int:
+        """Días restringidos para una máscara de dígitos (memoizado por máscara)"""
+        restringidos = self._pico_placa.get(mascara_digitos)
+        if restringidos is None:
+            restringidos = 0
+            for dia in range(7):
+                if mascara_digitos & self.regla.mascaras[dia]:
+                    restringidos |= self.dias_semana[dia]
+            self._pico_placa[mascara_digitos] = restringidos
+        return restringidos
+
+    def mascara_reservas(self, fechas: Iterable[date]) -> int:
+        reservas = 0
+        for fecha in fechas:
+            i = (fecha - self.desde).days
+            if 0 <= i < self.dias:
+                reservas |= 1 << i
+        return reservas
+
+    def calcular(self, vehiculos: Iterable[tuple], reservas: Dict[int, List[date]]) -> List[dict]:
+        """
+        vehiculos: (id, placa, pico_placa, activo, soat, tecnomecanica, kit)
+        reservas: vehiculo_id -> fechas con trayectos PROGRAMADO/EN_CURSO
+        """
+        resultado = []
+        for vehiculo_id, placa, pico_placa, activo, soat, tecnomecanica, kit in vehiculos:
+            bloqueo_inactivo = 0 if activo or activo is None else self.todos
+            bloqueo_pico_placa = self.mascara_pico_placa(mascara_vehiculo(placa, pico_placa))
+            vigentes = (mascara_hasta(self.desde, self.dias, soat)
+                        & mascara_hasta(self.desde, self.dias, tecnomecanica)
+                        & mascara_hasta(self.desde, self.dias, kit))
+            bloqueo_documentos = self.todos & ~vigentes
+            bloqueo_reservas = self.mascara_reservas(reservas.get(vehiculo_id, ()))
+            disponible = self.todos & ~(bloqueo_inactivo | bloqueo_pico_placa | bloqueo_documentos | bloqueo_reservas)
+            resultado.append({
+                "id": vehiculo_id,
+                "placa": placa,
+                "disponible": disponible,
+                "bloqueos": {
+                    "inactivo": bloqueo_inactivo,
+                    "pico_y_placa": bloqueo_pico_placa,
+                    "documentos": bloqueo_documentos,
+                    "reservas": bloqueo_reservas,
+                },
+            })
+        return resultado
+
+    def totales_por_dia(self, mascaras: Iterable[int]) -> List[int]:
+        totales = [0] * self.dias
+        for mascara in mascaras:
+            while mascara:
+                bit = mascara & -mascara
+                totales[bit.bit_length() - 1] += 1
+                mascara ^= bit
+        return totales
+
+def cargar_vehiculos(db: Session, solo_activos: bool = False) -> List[tuple]:
+    query = db.query(
+        Vehicle.id, Vehicle.placa, Vehicle.pico_placa, Vehicle.activo,
+        Vehicle.soat_vencimiento, Vehicle.tecnomecanica_vencimiento, Vehicle.kit_vencimiento
+    )
+    if solo_activos:
+        query = query.filter(Vehicle.activo == True)
+    return query.order_by(Vehicle.id).all()
+
+def cargar_reservas(db: Session, desde: date, hasta: date) -> Dict[int, List[date]]:
+    """Fechas ocupadas por vehículo según los trayectos PROGRAMADO/EN_CURSO del rango"""
+    inicio = inicio_dia(desde)
+    fin = inicio_dia(hasta + timedelta(days=1))
+    # Horario programado si existe; si no, la salida real
+    momento = func.coalesce(Journey.inicio_programado, Journey.fecha_salida)
+    filas = db.query(Journey.vehiculo_id, momento).filter(
+        Journey.estado.in_(ESTADOS_RESERVA),
+        momento >= inicio,
+        momento < fin
+    ).all()
+    reservas: Dict[int, List[date]] = {}
+    for vehiculo_id, fecha in filas:
+        reservas.setdefault(vehiculo_id, []).append(fecha_local(fecha))
+    return reservas
+
+def calendario_disponibilidad(db: Session, desde: date, hasta: date, solo_activos: bool = False) -> Tuple[CalendarioFlota, List[dict]]:
+    """Carga los datos con consultas de proyección y calcula el calendario en una pasada"""
+    calendario = CalendarioFlota(obtener_regla(db), desde, hasta)
+    filas = calendario.calcular(cargar_vehiculos(db, solo_activos), cargar_reservas(db, desde, hasta))
+    return calendario, filas
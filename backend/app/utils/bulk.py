@@ -0,0 +1,189 @@
+"""
+Importación masiva por lotes con política de conflictos.
+
+Cada lote de `TAMANO_LOTE` filas cuesta un puñado de sentencias:
+
+1. Un SELECT indexado de los registros existentes con las mismas claves
+   (placa, email/username, nombre) para clasificar cada fila.
+2. Un INSERT multi-fila ... ON CONFLICT ... RETURNING id. Con
+   PostgreSQL/SQLite y una sola clave única, la política "actualizar" hace el
+   upsert completo en esta misma sentencia (ON CONFLICT DO UPDATE).
+3. Solo si hace falta, un UPDATE executemany por id para las filas
+   que se actualizan y no caben en el caso anterior.
+
+La política "fallar" es todo o nada: si alguna fila choca con un registro
+existente se hace rollback de todo el lote y se informa qué filas fallaron.
+"""
+from enum import Enum
+from typing import Dict, List, Optional, Sequence
+
+from sqlalchemy import insert, update, or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+TAMANO_LOTE = 1000
+
+class PoliticaConflicto(str, Enum):
+    OMITIR = "omitir"
+    ACTUALIZAR = "actualizar"
+    FALLAR = "fallar"
+
+class ErrorImportacion(Exception):
+    """La política "fallar" encontró conflictos; `resultado` trae el detalle por fila"""
+
+    def __init__(self, resultado: dict):
+        super().__init__("La importación tiene filas en conflicto")
+        self.resultado = resultado
+
+def _insert_dialecto(db: Session, tabla):
+    """INSERT con soporte ON CONFLICT si el motor lo tiene, si no None"""
+    nombre = db.get_bind().dialect.name
+    if nombre == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as insert_pg
+        return insert_pg(tabla)
+    if nombre == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as insert_sqlite
+        return insert_sqlite(tabla)
+    return None
+
+def _fila(indice: int, estado: str, clave, id: Optional[int] = None, detalle: Optional[str] = None) -> dict:
+    return {"fila": indice + 1, "estado": estado, "id": id, "clave": None if clave is None else str(clave), "detalle": detalle}
+
+def resumir(filas: List[dict]) -> dict:
+    conteo = {"creado": 0, "actualizado": 0, "omitido": 0, "error": 0}
+    for fila in filas:
+        conteo[fila["estado"]] += 1
+    return {
+        "total": len(filas),
+        "creados": conteo["creado"],
+        "actualizados": conteo["actualizado"],
+        "omitidos": conteo["omitido"],
+        "errores": conteo["error"],
+        "filas": filas,
+    }
+
+def importar(
+    db: Session,
+    modelo,
+    registros: List[dict],
+    claves: Sequence[str],
+    politica: PoliticaConflicto = PoliticaConflicto.OMITIR,
+    claves_unicas: bool = True,
+    tamano_lote: int = TAMANO_LOTE,
+    commit: bool = True,
+) -> dict:
+    """
+    Inserta `registros` (dicts con columnas del modelo) y devuelve el reporte por fila.
+
+    claves: columnas que identifican un registro existente; la primera es la
+    que se informa en el reporte. claves_unicas indica si están respaldadas por
+    restricciones UNIQUE (requisito de ON CONFLICT).
+    """
+    tabla = modelo.__table__
+    pk = modelo.id
+    columnas_clave = [getattr(modelo, clave) for clave in claves]
+    principal = claves[0]
+    reporte: Dict[int, dict] = {}
+
+    # Duplicados dentro del mismo lote: gana la primera aparición
+    vistos = [set() for _ in claves]
+    pendientes = []
+    for indice, registro in enumerate(registros):
+        valores = [registro.get(clave) for clave in claves]
+        repetida = next((c for c, v, s in zip(claves, valores, vistos) if v is not None and v in s), None)
+        if repetida:
+            reporte[indice] = _fila(indice, "error", registro.get(principal), detalle=f"{repetida} duplicado en el archivo")
+            continue
+        for valor, s in zip(valores, vistos):
+            if valor is not None:
+                s.add(valor)
+        pendientes.append(indice)
+
+    upsert_nativo = (
+        politica == PoliticaConflicto.ACTUALIZAR and claves_unicas and len(claves) == 1
+        and _insert_dialecto(db, tabla) is not None
+    )
+
+    try:
+        for inicio in range(0, len(pendientes), tamano_lote):
+            lote = pendientes[inicio:inicio + tamano_lote]
+
+            # 1. Registros existentes con alguna de las claves del lote
+            condiciones = [
+                columna.in_({registros[i][clave] for i in lote if registros[i].get(clave) is not None})
+                for clave, columna in zip(claves, columnas_clave)
+            ]
+            existentes: List[Dict] = [{} for _ in claves]
+            for fila in db.query(pk, *columnas_clave).filter(or_(*condiciones)).all():
+                for posicion, valor in enumerate(fila[1:]):
+                    existentes[posicion][valor] = fila[0]
+
+            nuevos, actualizar = [], []
+            for i in lote:
+                ids = {existentes[p].get(registros[i].get(clave)) for p, clave in enumerate(claves)} - {None}
+                if not ids:
+                    nuevos.append(i)
+                elif len(ids) > 1:
+                    reporte[i] = _fila(i, "error", registros[i].get(principal),
+                                       detalle="Las claves coinciden con registros distintos")
+                elif politica == PoliticaConflicto.OMITIR:
+                    reporte[i] = _fila(i, "omitido", registros[i].get(principal), id=ids.pop(), detalle="Ya existe")
+                elif politica == PoliticaConflicto.FALLAR:
+                    reporte[i] = _fila(i, "error", registros[i].get(principal), id=ids.pop(), detalle="Ya existe")
+                else:
+                    actualizar.append((i, ids.pop()))
+
+            if politica == PoliticaConflicto.FALLAR and any(reporte[i]["estado"] == "error" for i in lote if i in reporte):
+                continue
+
+            # 2. INSERT multi-fila con RETURNING (upsert completo si la clave es única)
+            if upsert_nativo:
+                filas_upsert = nuevos + [i for i, _ in actualizar]
+                if filas_upsert:
+                    sentencia = _insert_dialecto(db, tabla)
+                    columnas = [c for c in registros[filas_upsert[0]] if c != principal]
+                    sentencia = sentencia.on_conflict_do_update(
+                        index_elements=[principal],
+                        set_={c: sentencia.excluded[c] for c in columnas}
+                    ).returning(pk, columnas_clave[0])
+                    ids = {valor: id_ for id_, valor in db.execute(sentencia, [registros[i] for i in filas_upsert]).all()}
+                    previos = dict(actualizar)
+                    for i in filas_upsert:
+                        valor = registros[i].get(principal)
+                        reporte[i] = _fila(i, "actualizado" if i in previos else "creado", valor, id=ids.get(valor))
+                continue
+
+            if nuevos:
+                sentencia = _insert_dialecto(db, tabla) if claves_unicas and politica != PoliticaConflicto.FALLAR else None
+                if sentencia is not None:
+                    sentencia = sentencia.on_conflict_do_nothing()
+                else:
+                    sentencia = insert(tabla)
+                sentencia = sentencia.returning(pk, columnas_clave[0])
+                insertados = {valor: id_ for id_, valor in db.execute(sentencia, [registros[i] for i in nuevos]).all()}
+                for i in nuevos:
+                    valor = registros[i].get(principal)
+                    if valor in insertados:
+                        reporte[i] = _fila(i, "creado", valor, id=insertados[valor])
+                    else:
+                        # Otro proceso insertó la misma clave entre el SELECT y el INSERT
+                        reporte[i] = _fila(i, "omitido", valor, detalle="Ya existe")
+
+            # 3. UPDATE executemany por id
+            if actualizar:
+                db.execute(update(modelo), [dict(registros[i], id=id_) for i, id_ in actualizar])
+                for i, id_ in actualizar:
+                    reporte[i] = _fila(i, "actualizado", registros[i].get(principal), id=id_)
+
+        resultado = resumir([reporte[i] for i in sorted(reporte)])
+        if politica == PoliticaConflicto.FALLAR and resultado["errores"]:
+            db.rollback()
+            raise ErrorImportacion(resultado)
+        if commit:
+            db.commit()
+        return resultado
+    except IntegrityError as e:
+        db.rollback()
+        raise ErrorImportacion(resumir([
+            _fila(i, "error", registros[i].get(principal), detalle=str(e.orig)) for i in pendientes
+        ]))
@@ -0,0 +1,70 @@
+"""
+Caché de lectura para los catálogos de rutas y vehículos.
+
+Los listados (`GET /rutas`, `GET /vehiculos` y sus variantes solo_activas /
+solo_activos) se consultan constantemente y cambian pocas veces al día. Cada
+variante se guarda ya serializada en bytes junto con su ETag, así una lectura
+cacheada no toca la base de datos, ni hidrata objetos ORM, ni pasa por la
+validación de pydantic; si el cliente envía `If-None-Match` con el mismo ETag
+se responde 304 sin cuerpo.
+
+Los handlers de escritura de `routers/routes.py` y `routers/vehicles.py`
+invalidan su catálogo después del commit. Como cada worker tiene su propia
+caché, las entradas expiran tras `CACHE_TTL_SEGUNDOS` para recoger cambios
+hechos por otros workers.
+"""
+import hashlib
+import threading
+import time
+from typing import Callable, Dict, Hashable, Optional, Tuple
+
+from fastapi import Request, Response
+
+CACHE_TTL_SEGUNDOS = 60
+
+class EntradaCatalogo:
+    __slots__ = ("cuerpo", "etag", "expira")
+
+    def __init__(self, cuerpo: bytes, expira: float):
+        self.cuerpo = cuerpo
+        self.etag = '"' + hashlib.blake2b(cuerpo, digest_size=16).hexdigest() + '"'
+        self.expira = expira
+
+_lock = threading.Lock()
+_entradas: Dict[Tuple[str, Hashable], EntradaCatalogo] = {}
+# Se incrementa en cada invalidación: una lectura que empezó antes no guarda datos viejos
+_generaciones: Dict[str, int] = {}
+
+def obtener(catalogo: str, variante: Hashable, cargar: Callable[[], bytes]) -> EntradaCatalogo:
+    """Entrada cacheada de la variante; `cargar` serializa el catálogo solo si falta o expiró"""
+    clave = (catalogo, variante)
+    entrada = _entradas.get(clave)
+    if entrada is not None and time.monotonic() < entrada.expira:
+        return entrada
+    generacion = _generaciones.get(catalogo, 0)
+    entrada = EntradaCatalogo(cargar(), time.monotonic() + CACHE_TTL_SEGUNDOS)
+    with _lock:
+        if _generaciones.get(catalogo, 0) == generacion:
+            _entradas[clave] = entrada
+    return entrada
+
+def invalidar_catalogo(catalogo: str):
+    """Descarta todas las variantes del catálogo; llamar después del commit"""
+    with _lock:
+        _generaciones[catalogo] = _generaciones.get(catalogo, 0) + 1
+        for clave in [c for c in _entradas if c[0] == catalogo]:
+            del _entradas[clave]
+
+def _coincide(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    etiquetas = {e.strip().removeprefix("W/") for e in if_none_match.split(",")}
+    return "*" in etiquetas or etag in etiquetas
+
+def respuesta_catalogo(request: Request, catalogo: str, variante: Hashable, cargar: Callable[[], bytes]) -> Response:
+    """Respuesta JSON del catálogo con ETag; 304 si el cliente ya tiene esa versión"""
+    entrada = obtener(catalogo, variante, cargar)
+    cabeceras = {"ETag": entrada.etag, "Cache-Control": "no-cache"}
+    if _coincide(request.headers.get("if-none-match"), entrada.etag):
+        return Response(status_code=304, headers=cabeceras)
+    return Response(content=entrada.cuerpo, media_type="application/json", headers=cabeceras)
@@ -0,0 +1,244 @@
+"""
+Asignación automática de conductor y vehículo para las salidas del día.
+
+Las salidas se recorren en orden de hora (partición de intervalos): cada una
+toma el vehículo libre de menor capacidad suficiente (best fit) y el
+conductor libre con menos carga en el día, prefiriendo mantener la pareja
+conductor/vehículo de su salida anterior. Un recurso está libre si no tiene
+ninguna reserva, existente o asignada en este mismo despacho, que se cruce
+con el intervalo de la salida.
+
+Si no queda un conductor o un vehículo libre, antes de descartar la salida
+se busca una ruta de aumento (Kuhn): un recurso apto cuyas salidas de este
+despacho que lo ocupan puedan pasar a otro recurso apto, recursivamente.
+Así el greedy ya no descarta una salida por haber gastado antes el recurso
+equivocado: en cada franja de salidas que se cruzan entre sí se encuentra
+cualquier asignación alcanzable con hasta PROFUNDIDAD_AUMENTO reubicaciones
+encadenadas (sin ese límite, las de conductores y de vehículos serían
+emparejamientos máximos). Entre franjas encadenadas a lo largo del día sigue
+siendo una heurística: con reservas previas el óptimo global es un problema
+de asignación de intervalos con elegibilidad, y resolverlo exacto no
+compensa para un despacho diario.
+
+Las rutas de aumento solo se buscan cuando una salida se queda sin recurso y
+la cota de Hall en su hora de salida no descarta que exista una, así que el
+caso normal sigue costando O(salidas × recursos); cada búsqueda visita cada
+recurso a lo sumo una vez.
+
+Todos los datos se cargan antes con consultas de proyección; la búsqueda no
+consulta la base de datos.
+"""
+import bisect
+import heapq
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy.orm import Session
+
+from ..models.user import User
+from ..models.vehicle import Vehicle
+from .availability import CalendarioFlota, cargar_vehiculos
+from .pico_y_placa import obtener_regla
+from .scheduling import Intervalo, reservas_ventana
+
+PROFUNDIDAD_AUMENTO = 8
+
+def se_cruzan(intervalos: List[Intervalo], inicio: datetime, fin: datetime) -> bool:
+    return any(a < fin and inicio < b for a, b in intervalos)
+
+@dataclass
+class Salida:
+    indice: int
+    ruta_id: int
+    inicio: datetime
+    fin: datetime
+    pasajeros: int = 0
+
+@dataclass
+class Recurso:
+    id: int
+    capacidad: int = 0
+    reservas: List[Intervalo] = field(default_factory=list)
+    # Salidas asignadas en este despacho, sin cruces y ordenadas por inicio; son las únicas que se pueden mover
+    salidas: List[Salida] = field(default_factory=list)
+    _inicios: List[datetime] = field(default_factory=list, repr=False)
+
+    @property
+    def asignaciones(self) -> int:
+        return len(self.salidas)
+
+    def asignar(self, salida: Salida):
+        posicion = bisect.bisect_left(self._inicios, salida.inicio)
+        self._inicios.insert(posicion, salida.inicio)
+        self.salidas.insert(posicion, salida)
+
+    def quitar(self, salida: Salida):
+        posicion = bisect.bisect_left(self._inicios, salida.inicio)
+        del self._inicios[posicion], self.salidas[posicion]
+
+    def bloqueantes(self, salida: Salida) -> List[Salida]:
+        """Salidas de este despacho que se cruzan con `salida`: como no se cruzan entre sí, también están ordenadas por fin"""
+        resultado = []
+        posicion = bisect.bisect_left(self._inicios, salida.fin) - 1
+        while posicion >= 0 and self.salidas[posicion].fin > salida.inicio:
+            resultado.append(self.salidas[posicion])
+            posicion -= 1
+        return resultado
+
+    def libre(self, salida: Salida) -> bool:
+        return not se_cruzan(self.reservas, salida.inicio, salida.fin) and not self.bloqueantes(salida)
+
+Movimiento = Tuple[Salida, Recurso, Recurso]
+
+class _Aumento:
+    """Búsqueda de rutas de aumento sobre un tipo de recurso, con registro para deshacer"""
+
+    def __init__(self, apto: Callable[[Recurso, Salida], bool], compite: Callable[[Salida, Salida], bool]):
+        self.apto = apto
+        # compite(a, s): todo recurso apto para `a` también lo es para `s`
+        self.compite = compite
+        self.movimientos: List[Movimiento] = []
+
+    def sin_cupo(self, salida: Salida, recursos: List[Recurso], en_curso: List[Salida]) -> bool:
+        """
+        Cota de Hall en el inicio de `salida`: cada salida asignada que sigue en
+        curso y compite por los mismos recursos ocupa uno distinto, así que si
+        no quedan más recursos aptos sin reserva en ese instante ninguna ruta
+        de aumento puede liberar uno.
+        """
+        instante = salida.inicio
+        aptos = sum(
+            1 for r in recursos
+            if self.apto(r, salida) and not any(a <= instante < b for a, b in r.reservas)
+        )
+        return sum(1 for otra in en_curso if self.compite(otra, salida)) >= aptos
+
+    def deshacer(self, hasta: int):
+        while len(self.movimientos) > hasta:
+            salida, origen, destino = self.movimientos.pop()
+            destino.quitar(salida)
+            origen.asignar(salida)
+
+    def buscar(self, salida: Salida, orden: List[Recurso], visitados: Set[int], profundidad: int = 0,
+               aumentar: bool = True) -> Optional[Recurso]:
+        """Primer recurso de `orden` libre para `salida` o, si no hay, uno que quede libre reubicando sus salidas"""
+        ocupados = []
+        for recurso in orden:
+            if recurso.id in visitados or not self.apto(recurso, salida) \
+                    or se_cruzan(recurso.reservas, salida.inicio, salida.fin):
+                continue
+            bloqueantes = recurso.bloqueantes(salida)
+            if not bloqueantes:
+                return recurso
+            ocupados.append((recurso, bloqueantes))
+        if not aumentar or profundidad >= PROFUNDIDAD_AUMENTO:
+            return None
+        for recurso, bloqueantes in ocupados:
+            if recurso.id in visitados:
+                continue
+            visitados.add(recurso.id)
+            if self._liberar(recurso, bloqueantes, orden, visitados, profundidad):
+                return recurso
+        return None
+
+    def _liberar(self, recurso: Recurso, bloqueantes: List[Salida], orden: List[Recurso],
+                 visitados: Set[int], profundidad: int) -> bool:
+        """Pasa `bloqueantes` de `recurso` a otros recursos; si alguno no cabe deshace lo movido"""
+        punto = len(self.movimientos)
+        for bloqueante in bloqueantes:
+            destino = self.buscar(bloqueante, orden, visitados, profundidad + 1)
+            if destino is None:
+                self.deshacer(punto)
+                return False
+            recurso.quitar(bloqueante)
+            destino.asignar(bloqueante)
+            self.movimientos.append((bloqueante, recurso, destino))
+        return True
+
+def resolver(salidas: List[Salida], vehiculos: List[Recurso], conductores: List[Recurso]) -> Tuple[Dict[int, Tuple[int, int]], Dict[int, str]]:
+    """
+    Devuelve (asignaciones, sin_asignar): índice de salida -> (conductor_id, vehiculo_id)
+    e índice de salida -> motivo.
+    """
+    sin_asignar: Dict[int, str] = {}
+    vehiculos = sorted(vehiculos, key=lambda v: (v.capacidad, v.id))
+    vehiculo_por_id = {v.id: v for v in vehiculos}
+    ultimo_vehiculo: Dict[int, int] = {}
+    aumento_conductores = _Aumento(lambda c, s: True, lambda a, s: True)
+    aumento_vehiculos = _Aumento(lambda v, s: v.capacidad >= s.pasajeros, lambda a, s: a.pasajeros >= s.pasajeros)
+    en_curso: List[Tuple[datetime, int, Salida]] = []  # heap por fin de las salidas asignadas
+
+    for salida in sorted(salidas, key=lambda s: (s.inicio, s.fin, s.indice)):
+        while en_curso and en_curso[0][0] <= salida.inicio:
+            heapq.heappop(en_curso)
+        # Primero intentar conservar la pareja conductor/vehículo de la salida anterior
+        eleccion = None
+        orden_conductores = sorted(conductores, key=lambda c: (c.asignaciones, c.id))
+        for conductor in orden_conductores:
+            vehiculo = vehiculo_por_id.get(ultimo_vehiculo.get(conductor.id))
+            if vehiculo and vehiculo.capacidad >= salida.pasajeros and conductor.libre(salida) and vehiculo.libre(salida):
+                eleccion = (conductor, vehiculo)
+                break
+
+        if eleccion is None:
+            # Best fit entre los libres; si no hay, ruta de aumento
+            punto = len(aumento_conductores.movimientos)
+            activas = [otra for _, _, otra in en_curso]
+            conductor = aumento_conductores.buscar(
+                salida, orden_conductores, set(),
+                aumentar=not aumento_conductores.sin_cupo(salida, conductores, activas)
+            )
+            if conductor is None:
+                sin_asignar[salida.indice] = "No hay conductores libres en el horario"
+                continue
+            vehiculo = aumento_vehiculos.buscar(
+                salida, vehiculos, set(), aumentar=not aumento_vehiculos.sin_cupo(salida, vehiculos, activas)
+            )
+            if vehiculo is None:
+                aumento_conductores.deshacer(punto)
+                sin_asignar[salida.indice] = "No hay vehículos disponibles con capacidad suficiente"
+                continue
+            eleccion = (conductor, vehiculo)
+
+        conductor, vehiculo = eleccion
+        for recurso in eleccion:
+            recurso.asignar(salida)
+        ultimo_vehiculo[conductor.id] = vehiculo.id
+        heapq.heappush(en_curso, (salida.fin, salida.indice, salida))
+
+    conductor_de = {s.indice: c.id for c in conductores for s in c.salidas}
+    asignaciones = {s.indice: (conductor_de[s.indice], v.id) for v in vehiculos for s in v.salidas}
+    return asignaciones, sin_asignar
+
+def cargar_reservas_intervalos(db: Session, inicio: datetime, fin: datetime) -> Tuple[Dict[int, List[Intervalo]], Dict[int, List[Intervalo]]]:
+    """Intervalos ocupados por vehículo y por conductor según los trayectos PROGRAMADO/EN_CURSO"""
+    por_vehiculo: Dict[int, List[Intervalo]] = {}
+    por_conductor: Dict[int, List[Intervalo]] = {}
+    for _, conductor_id, vehiculo_id, *intervalo in reservas_ventana(db, inicio, fin):
+        por_vehiculo.setdefault(vehiculo_id, []).append(tuple(intervalo))
+        por_conductor.setdefault(conductor_id, []).append(tuple(intervalo))
+    return por_vehiculo, por_conductor
+
+def preparar_despacho(db: Session, fecha: date, salidas: List[Salida]) -> Tuple[List[Recurso], List[Recurso]]:
+    """Carga vehículos aptos para la fecha y conductores activos con sus reservas"""
+    calendario = CalendarioFlota(obtener_regla(db), fecha, fecha)
+    aptos = {
+        fila["id"] for fila in calendario.calcular(cargar_vehiculos(db, solo_activos=True), {})
+        if fila["disponible"] & 1
+    }
+    capacidades = dict(db.query(Vehicle.id, Vehicle.capacidad).filter(Vehicle.activo == True).all())
+
+    inicio = min(s.inicio for s in salidas)
+    fin = max(s.fin for s in salidas)
+    reservas_vehiculo, reservas_conductor = cargar_reservas_intervalos(db, inicio, fin)
+
+    vehiculos = [
+        Recurso(id=vehiculo_id, capacidad=capacidades.get(vehiculo_id) or 0, reservas=list(reservas_vehiculo.get(vehiculo_id, [])))
+        for vehiculo_id in sorted(aptos)
+    ]
+    conductores = [
+        Recurso(id=conductor_id, reservas=list(reservas_conductor.get(conductor_id, [])))
+        for (conductor_id,) in db.query(User.id).filter(User.rol == 'conductor', User.activo == True).all()
+    ]
+    return vehiculos, conductores
@@ -0,0 +1,38 @@
+"""
+Serialización JSON rápida para los listados grandes y los endpoints en vivo.
+
+El camino normal de FastAPI para una lista es: objetos ORM/dicts → validación
+con el `response_model` → `jsonable_encoder` → `json.dumps`. Para listas de
+miles de filas ese trabajo domina la CPU de la petición. Aquí las filas se
+arman como tuplas/dicts planos desde consultas de proyección y se codifican
+una sola vez con orjson, devolviendo un `Response` que FastAPI no vuelve a
+validar (el `response_model` del endpoint queda solo para la documentación).
+
+orjson escribe datetime/date en ISO 8601 y los Enum por su valor, igual que
+la salida de pydantic para los mismos campos; con OPT_UTC_Z las fechas UTC con
+zona (timestamptz en PostgreSQL) salen con "Z", como en pydantic, y no con
+"+00:00".
+"""
+from typing import Any, Iterable, Sequence
+
+import orjson
+from fastapi import Response
+
+OPCIONES = orjson.OPT_NON_STR_KEYS | orjson.OPT_UTC_Z
+
+class RespuestaJSON(Response):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=OPCIONES)
+
+def dumps(contenido: Any) -> bytes:
+    return orjson.dumps(contenido, option=OPCIONES)
+
+def filas_a_dicts(columnas: Sequence[str], filas: Iterable[Sequence]) -> list:
+    """Tuplas de una consulta de proyección a dicts con las claves de `columnas`"""
+    return [dict(zip(columnas, fila)) for fila in filas]
+
+def respuesta_filas(columnas: Sequence[str], filas: Iterable[Sequence]) -> Response:
+    """Lista JSON de objetos a partir de tuplas, codificada una sola vez"""
+    return RespuestaJSON(filas_a_dicts(columnas, filas))
@@ -0,0 +1,196 @@
+"""
+Geocercas de origen y destino de las rutas para iniciar y finalizar trayectos.
+
+Cada ruta puede tener un círculo en el origen y otro en el destino (centro
+explícito o, por defecto, el primer y el último punto de su `geometria`;
+radio `radio_geocerca` o GEOCERCA_RADIO_METROS).
+
+Índice espacial: una grilla uniforme de CELDA_GRADOS; cada geocerca se
+registra en las celdas que toca su caja envolvente. Evaluar una ubicación
+es calcular su celda y medir la distancia solo a las geocercas de esa
+celda: O(1) amortizado, sin importar cuántas rutas haya. Cada worker
+construye el índice en el primer uso y lo reconstruye al invalidarlo (al
+editar rutas) o tras INDICE_TTL_SEGUNDOS, para recoger cambios de otros
+workers.
+
+Con cada ubicación aceptada del conductor (POST /trayectos/ubicacion) se
+compara el punto anterior con el actual:
+
+- en_origen: un trayecto PROGRAMADO (inicio_programado a menos de
+  GEOCERCA_VENTANA_MINUTOS) entra a la geocerca de origen. Solo aviso.
+- inicio: sale de la geocerca de origen. Pasa a EN_CURSO con la hora de
+  salida si GEOCERCA_INICIO_AUTOMATICO; si no, es una sugerencia.
+- llegada: un trayecto EN_CURSO entra a la geocerca de destino; se anota
+  la hora en fecha_llegada (y se borra si vuelve a salir). Aviso. Solo
+  cuenta después de haber visto el trayecto fuera de la geocerca de origen
+  (`salio_origen`): en una ruta circular origen y destino son el mismo
+  círculo y un trayecto iniciado a mano en la terminal "llegaría" al salir.
+- fin: lleva GEOCERCA_PERMANENCIA_SEGUNDOS dentro del destino. Pasa a
+  COMPLETADO si GEOCERCA_FIN_AUTOMATICO; por defecto es una sugerencia,
+  porque al finalizar el conductor informa la cantidad de pasajeros.
+"""
+import math
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+from sqlalchemy.orm import Session
+
+from ..core.config import settings
+from ..models.journey import Journey, EstadoTrayecto
+from ..models.route import Route
+from .gps import Punto, distancia_m, utc
+
+CELDA_GRADOS = 0.01  # ~1,1 km de latitud
+METROS_POR_GRADO = 111_320.0
+INDICE_TTL_SEGUNDOS = 60
+
+ORIGEN, DESTINO = "origen", "destino"
+EN_ORIGEN, INICIO, LLEGADA, FIN = "en_origen", "inicio", "llegada", "fin"
+
+class Geocerca(NamedTuple):
+    ruta_id: int
+    tipo: str  # ORIGEN o DESTINO
+    lat: float
+    lng: float
+    radio_m: float
+
+class Evento(NamedTuple):
+    tipo: str
+    trayecto_id: int
+    aplicado: bool
+
+def geocercas_ruta(ruta: Route) -> List[Geocerca]:
+    """Geocercas de origen y destino definidas (explícitas o por los extremos del trazado)"""
+    radio = ruta.radio_geocerca or settings.GEOCERCA_RADIO_METROS
+    geometria = ruta.geometria or []
+    extremos = {
+        ORIGEN: ((ruta.origen_lat, ruta.origen_lng), geometria[0] if geometria else None),
+        DESTINO: ((ruta.destino_lat, ruta.destino_lng), geometria[-1] if geometria else None),
+    }
+    geocercas = []
+    for tipo, (explicito, del_trazado) in extremos.items():
+        centro = explicito if None not in explicito else del_trazado
+        if centro is not None:
+            geocercas.append(Geocerca(ruta.id, tipo, float(centro[0]), float(centro[1]), float(radio)))
+    return geocercas
+
+class IndiceGeocercas:
+    def __init__(self, geocercas: Iterable[Geocerca], celda_grados: float = CELDA_GRADOS):
+        self.celda_grados = celda_grados
+        self._celdas: Dict[Tuple[int, int], List[Geocerca]] = defaultdict(list)
+        for geocerca in geocercas:
+            margen_lat = geocerca.radio_m / METROS_POR_GRADO
+            margen_lng = geocerca.radio_m / (METROS_POR_GRADO * max(math.cos(math.radians(geocerca.lat)), 1e-6))
+            fila_min, col_min = self._celda(geocerca.lat - margen_lat, geocerca.lng - margen_lng)
+            fila_max, col_max = self._celda(geocerca.lat + margen_lat, geocerca.lng + margen_lng)
+            for fila in range(fila_min, fila_max + 1):
+                for col in range(col_min, col_max + 1):
+                    self._celdas[(fila, col)].append(geocerca)
+
+    def _celda(self, lat: float, lng: float) -> Tuple[int, int]:
+        return math.floor(lat / self.celda_grados), math.floor(lng / self.celda_grados)
+
+    def contienen(self, lat: float, lng: float) -> List[Geocerca]:
+        """Geocercas que contienen el punto"""
+        return [
+            g for g in self._celdas.get(self._celda(lat, lng), ())
+            if distancia_m(lat, lng, g.lat, g.lng) <= g.radio_m
+        ]
+
+    def dentro(self, punto: Optional[Punto]) -> Set[Tuple[int, str]]:
+        """(ruta_id, tipo) de las geocercas que contienen el punto"""
+        if punto is None:
+            return set()
+        return {(g.ruta_id, g.tipo) for g in self.contienen(punto.lat, punto.lng)}
+
+# Índice del proceso -----------------------------------------------------------
+
+_indice: Optional[IndiceGeocercas] = None
+_indice_expira = 0.0
+_generacion = 0
+_lock = threading.Lock()
+
+def invalidar_geocercas():
+    """Descarta el índice del proceso; llamar después del commit al editar rutas"""
+    global _indice, _generacion
+    with _lock:
+        _indice = None
+        _generacion += 1
+
+def indice_geocercas(db: Session) -> IndiceGeocercas:
+    global _indice, _indice_expira
+    indice = _indice
+    if indice is not None and time.monotonic() < _indice_expira:
+        return indice
+    generacion = _generacion
+    rutas = db.query(Route).filter(Route.activa == True).all()
+    indice = IndiceGeocercas(g for ruta in rutas for g in geocercas_ruta(ruta))
+    with _lock:
+        # Una invalidación durante la carga deja el índice sin guardar
+        if generacion == _generacion:
+            _indice, _indice_expira = indice, time.monotonic() + INDICE_TTL_SEGUNDOS
+    return indice
+
+# Evaluación ---------------------------------------------------------------
+
+def trayectos_programados_cercanos(db: Session, conductor_id: int, momento: datetime) -> List[Journey]:
+    """Trayectos PROGRAMADO del conductor cuyo inicio cae dentro de la ventana de geocercas"""
+    ventana = timedelta(minutes=settings.GEOCERCA_VENTANA_MINUTOS)
+    return db.query(Journey).filter(
+        Journey.conductor_id == conductor_id,
+        Journey.estado == EstadoTrayecto.PROGRAMADO,
+        Journey.inicio_programado >= momento - ventana,
+        Journey.inicio_programado <= momento + ventana,
+    ).order_by(Journey.inicio_programado).all()
+
+def _finalizar(trayecto: Journey, llegada: datetime):
+    trayecto.estado = EstadoTrayecto.COMPLETADO
+    trayecto.fecha_llegada = llegada
+    if trayecto.fecha_salida:
+        trayecto.duracion_minutos = int((utc(llegada) - utc(trayecto.fecha_salida)).total_seconds() / 60)
+
+def evaluar(indice: IndiceGeocercas, trayectos: List[Journey], anterior: Optional[Punto], actual: Punto) -> List[Evento]:
+    """
+    Eventos de geocerca del punto `actual` para los trayectos candidatos del
+    conductor (el EN_CURSO o los PROGRAMADO cercanos). Aplica las
+    transiciones automáticas sobre los objetos; el commit queda a cargo de
+    quien llama.
+    """
+    antes, ahora = indice.dentro(anterior), indice.dentro(actual)
+    eventos = []
+    for trayecto in trayectos:
+        origen, destino = (trayecto.ruta_id, ORIGEN), (trayecto.ruta_id, DESTINO)
+        if trayecto.estado == EstadoTrayecto.PROGRAMADO:
+            # Un punto anterior de otro día no cuenta como "estaba en el origen"
+            reciente = anterior is not None and trayecto.inicio_programado is not None and \
+                anterior.timestamp >= utc(trayecto.inicio_programado) - timedelta(minutes=settings.GEOCERCA_VENTANA_MINUTOS)
+            if origen in ahora and not (reciente and origen in antes):
+                eventos.append(Evento(EN_ORIGEN, trayecto.id, False))
+            elif reciente and origen in antes and origen not in ahora:
+                if settings.GEOCERCA_INICIO_AUTOMATICO:
+                    trayecto.estado = EstadoTrayecto.EN_CURSO
+                    trayecto.fecha_salida = actual.timestamp
+                    trayecto.salio_origen = True
+                eventos.append(Evento(INICIO, trayecto.id, settings.GEOCERCA_INICIO_AUTOMATICO))
+                # Un conductor sale con un solo trayecto
+                break
+        elif trayecto.estado == EstadoTrayecto.EN_CURSO:
+            if not trayecto.salio_origen:
+                if origen in ahora:
+                    continue
+                trayecto.salio_origen = True
+            if destino not in ahora:
+                if trayecto.fecha_llegada is not None:
+                    trayecto.fecha_llegada = None
+                continue
+            if trayecto.fecha_llegada is None:
+                trayecto.fecha_llegada = actual.timestamp
+                eventos.append(Evento(LLEGADA, trayecto.id, False))
+            elif (actual.timestamp - utc(trayecto.fecha_llegada)).total_seconds() >= settings.GEOCERCA_PERMANENCIA_SEGUNDOS:
+                if settings.GEOCERCA_FIN_AUTOMATICO:
+                    _finalizar(trayecto, utc(trayecto.fecha_llegada))
+                eventos.append(Evento(FIN, trayecto.id, settings.GEOCERCA_FIN_AUTOMATICO))
+    return eventos
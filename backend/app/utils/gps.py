@@ -0,0 +1,96 @@
+"""
+Filtro de banda muerta para las ubicaciones GPS de los conductores.
+
+Un bus detenido en un semáforo sigue enviando las mismas coordenadas cada
+pocos segundos. Un punto se descarta si se movió menos de
+GPS_BANDA_MUERTA_METROS respecto al último punto aceptado y llegó antes de
+GPS_BANDA_MUERTA_SEGUNDOS; pasado ese tiempo se acepta aunque no se haya
+movido, para que el mapa sepa que el conductor sigue conectado.
+
+Con un lote (puntos guardados sin conexión) las conversiones a radianes y
+los cosenos se calculan de una vez para todo el lote y el filtro recorre los
+puntos en orden contra el último aceptado.
+
+`intervalo_recomendado` le dice al cliente cada cuánto reportar: detenido,
+el máximo; en movimiento, el tiempo que tarda en recorrer
+GPS_DISTANCIA_OBJETIVO_METROS a la velocidad actual, acotado al mínimo.
+"""
+import math
+from datetime import datetime, timezone
+from typing import List, NamedTuple, Optional, Tuple
+
+from ..core.config import settings
+
+RADIO_TIERRA_M = 6_371_008.8
+VELOCIDAD_DETENIDO_MS = 0.5
+
+class Punto(NamedTuple):
+    lat: float
+    lng: float
+    timestamp: datetime
+
+def distancia_m(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """Distancia haversine en metros entre dos coordenadas en grados"""
+    lat1, lng1, lat2, lng2 = map(math.radians, (lat1, lng1, lat2, lng2))
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 2 * RADIO_TIERRA_M * math.asin(math.sqrt(min(1.0, h)))
+
+def utc(valor: datetime) -> datetime:
+    # Los datetime sin zona están guardados en UTC
+    return valor.replace(tzinfo=timezone.utc) if valor.tzinfo is None else valor
+
+def parsear_timestamp(valor, ahora: datetime) -> datetime:
+    """Hora de un punto: ISO 8601 o milisegundos desde la época; sin valor, `ahora`"""
+    if valor is None:
+        return ahora
+    if isinstance(valor, bool):
+        raise ValueError(f"timestamp inválido: {valor!r}")
+    if isinstance(valor, (int, float)):
+        momento = datetime.fromtimestamp(valor / 1000, timezone.utc)
+    else:
+        momento = utc(datetime.fromisoformat(str(valor).replace("Z", "+00:00")))
+    # Un reloj del teléfono adelantado no puede dejar puntos en el futuro
+    return min(momento, ahora)
+
+def filtrar_banda_muerta(ultimo: Optional[Punto], puntos: List[Punto],
+                         metros: Optional[float] = None, segundos: Optional[float] = None) -> List[Punto]:
+    """Puntos aceptados de `puntos` (ordenados por tiempo) frente al último aceptado"""
+    metros = settings.GPS_BANDA_MUERTA_METROS if metros is None else metros
+    segundos = settings.GPS_BANDA_MUERTA_SEGUNDOS if segundos is None else segundos
+    if not puntos:
+        return []
+    radianes = [(math.radians(p.lat), math.radians(p.lng)) for p in puntos]
+    cosenos = [math.cos(lat) for lat, _ in radianes]
+
+    ancla: Optional[Tuple[float, float, float, datetime]] = None
+    if ultimo is not None:
+        lat0 = math.radians(ultimo.lat)
+        ancla = (lat0, math.radians(ultimo.lng), math.cos(lat0), utc(ultimo.timestamp))
+
+    aceptados = []
+    for punto, (lat1, lng1), cos1 in zip(puntos, radianes, cosenos):
+        if ancla is not None:
+            lat0, lng0, cos0, t0 = ancla
+            # Un punto anterior al último aceptado (reenvío tardío) no aporta nada
+            if punto.timestamp <= t0:
+                continue
+            h = math.sin((lat1 - lat0) / 2) ** 2 + cos0 * cos1 * math.sin((lng1 - lng0) / 2) ** 2
+            distancia = 2 * RADIO_TIERRA_M * math.asin(math.sqrt(min(1.0, h)))
+            if distancia < metros and (punto.timestamp - t0).total_seconds() < segundos:
+                continue
+        aceptados.append(punto)
+        ancla = (lat1, lng1, cos1, punto.timestamp)
+    return aceptados
+
+def intervalo_recomendado(anterior: Optional[Punto], actual: Optional[Punto]) -> int:
+    """Segundos hasta el próximo reporte según la velocidad entre los dos últimos puntos aceptados"""
+    minimo, maximo = settings.GPS_INTERVALO_MIN_SEGUNDOS, settings.GPS_INTERVALO_MAX_SEGUNDOS
+    if anterior is None or actual is None:
+        return maximo if actual is None else minimo
+    segundos = (utc(actual.timestamp) - utc(anterior.timestamp)).total_seconds()
+    if segundos <= 0:
+        return minimo
+    velocidad = distancia_m(anterior.lat, anterior.lng, actual.lat, actual.lng) / segundos
+    if velocidad < VELOCIDAD_DETENIDO_MS:
+        return maximo
+    return int(max(minimo, min(maximo, settings.GPS_DISTANCIA_OBJETIVO_METROS / velocidad)))
@@ -0,0 +1,379 @@
+"""
+Tabla de posiciones en vivo en memoria compartida (mmap) entre workers.
+
+Con varios workers de uvicorn/gunicorn, un estado en memoria de cada proceso
+diverge entre ellos, así que GET /trayectos/ubicaciones tenía que consultar
+siempre la tabla `ubicaciones`. Esta tabla es un arreglo de structs de tamaño
+fijo en un archivo mapeado (en /dev/shm cuando existe), un slot por conductor
+(`conductor_id % POSICIONES_SLOTS`):
+
+    secuencia u32 | estado u32 | conductor i32 | trayecto i32 | vehiculo i32 |
+    ruta i32 | lat f64 | lng f64 | timestamp_ms i64            (48 bytes)
+
+- Escribe el worker que recibe el ping o el cambio de estado del trayecto
+  (iniciar, detener, finalizar); la base se sigue actualizando igual.
+- Lectura sin bloqueos (seqlock): el escritor deja la secuencia impar
+  mientras escribe y par al terminar; el lector descarta y relee un slot si
+  la secuencia era impar o cambió durante la lectura. Los escritores de un
+  mismo slot se excluyen con un lock de rango (fcntl.lockf).
+- La tabla vive mientras algún worker la tenga abierta (flock compartido):
+  el primer proceso que la abre sin otros la reinicia y la llena desde la
+  base con los trayectos EN_CURSO la primera vez que se usa.
+- Si dos conductores activos caen en el mismo slot la tabla se marca como
+  desbordada y el feed vuelve a consultar la base. Mientras siga así, cada
+  REVISION_DESBORDE_SEGUNDOS un worker compara los trayectos EN_CURSO de la
+  base con la tabla: si ya no hay choques (el ocupante terminó), libera los
+  slots de trayectos que ya no están en curso, escribe los que faltan y
+  quita la marca. `desbordada` cuenta los choques, así que uno nuevo durante
+  la revisión impide quitarla.
+
+Placa, nombre del conductor y nombre de la ruta no están en la tabla: cada
+worker los resuelve por id con una caché de NOMBRES_TTL_SEGUNDOS.
+
+Sin fcntl (Windows) o con POSICIONES_COMPARTIDAS=false no hay tabla y el
+feed lee de la base como antes.
+"""
+import hashlib
+import logging
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from ..core.config import settings
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+MAGICO = b"LDPS"
+VERSION = 1
+# magico, version, slots, cargada, desbordada (choques, 0 = sin desborde), maximo (slots usados)
+CABECERA = struct.Struct("<4sIIIII")
+TAM_CABECERA = 64
+SLOT = struct.Struct("<IIiiiiddq")
+SECUENCIA = struct.Struct("<I")
+DATOS_SLOT = struct.Struct("<Iiiiiddq")  # el slot sin la secuencia
+ACTIVO, CON_POSICION = 1, 2
+REINTENTOS_LECTURA = 100
+NOMBRES_TTL_SEGUNDOS = 60.0
+REVISION_DESBORDE_SEGUNDOS = 30.0
+
+def ruta_por_defecto() -> str:
+    from ..database import get_database_url
+
+    directorio = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+    # Una tabla por base: una base de pruebas no comparte posiciones con la real
+    sufijo = hashlib.sha1(get_database_url().encode("utf-8")).hexdigest()[:12]
+    return os.path.join(directorio, f"ludial_posiciones_{sufijo}")
+
+def _ms(valor: Optional[datetime]) -> int:
+    if valor is None:
+        return 0
+    if valor.tzinfo is None:
+        valor = valor.replace(tzinfo=timezone.utc)
+    return int(valor.timestamp() * 1000)
+
+class TablaPosiciones:
+    def __init__(self, ruta: str, slots: int):
+        self.ruta = ruta
+        self.slots = slots
+        self._tam = TAM_CABECERA + slots * SLOT.size
+        self._lock = threading.Lock()
+        self._revision = 0.0
+        self._fd = os.open(ruta, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(self._fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            primero = True
+        except BlockingIOError:
+            primero = False
+
+        if primero:
+            # Nadie más la usa: se reinicia (sin truncar a cero, por si otro
+            # proceso la mapea justo ahora)
+            os.ftruncate(self._fd, self._tam)
+            self._mm = mmap.mmap(self._fd, self._tam)
+            self._mm[:] = bytes(self._tam)
+            CABECERA.pack_into(self._mm, 0, MAGICO, VERSION, slots, 0, 0, 0)
+            fcntl.flock(self._fd, fcntl.LOCK_SH)
+        else:
+            # Espera a que el primero termine de inicializarla
+            fcntl.flock(self._fd, fcntl.LOCK_SH)
+            magico, version, slots_archivo = CABECERA.unpack_from(os.pread(self._fd, CABECERA.size, 0))[:3]
+            if (magico, version, slots_archivo) != (MAGICO, VERSION, slots):
+                os.close(self._fd)
+                raise ValueError(f"{ruta} tiene otro formato o tamaño ({slots_archivo} slots)")
+            self._mm = mmap.mmap(self._fd, self._tam)
+
+    # Cabecera -------------------------------------------------------------
+
+    def _cabecera(self) -> tuple:
+        return CABECERA.unpack_from(self._mm, 0)
+
+    def _actualizar_cabecera(self, **campos):
+        """Modifica la cabecera con un lock de rango entre procesos"""
+        fcntl.lockf(self._fd, fcntl.LOCK_EX, TAM_CABECERA, 0, os.SEEK_SET)
+        try:
+            magico, version, slots, cargada, desbordada, maximo = self._cabecera()
+            cargada = campos.get("cargada", cargada)
+            desbordada = campos.get("desbordada", desbordada)
+            maximo = max(maximo, campos.get("maximo", 0))
+            CABECERA.pack_into(self._mm, 0, magico, version, slots, cargada, desbordada, maximo)
+        finally:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN, TAM_CABECERA, 0, os.SEEK_SET)
+
+    def _marcar_desborde(self) -> bool:
+        """Suma un choque; devuelve si la tabla no estaba desbordada"""
+        fcntl.lockf(self._fd, fcntl.LOCK_EX, TAM_CABECERA, 0, os.SEEK_SET)
+        try:
+            magico, version, slots, cargada, desbordada, maximo = self._cabecera()
+            CABECERA.pack_into(self._mm, 0, magico, version, slots, cargada, desbordada % 0xFFFFFFFF + 1, maximo)
+            return desbordada == 0
+        finally:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN, TAM_CABECERA, 0, os.SEEK_SET)
+
+    def _quitar_desborde(self, visto: int) -> bool:
+        """Quita la marca si no hubo choques nuevos desde que se leyó `visto`"""
+        fcntl.lockf(self._fd, fcntl.LOCK_EX, TAM_CABECERA, 0, os.SEEK_SET)
+        try:
+            magico, version, slots, cargada, desbordada, maximo = self._cabecera()
+            if desbordada != visto:
+                return False
+            CABECERA.pack_into(self._mm, 0, magico, version, slots, cargada, 0, maximo)
+            return True
+        finally:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN, TAM_CABECERA, 0, os.SEEK_SET)
+
+    @property
+    def cargada(self) -> bool:
+        return bool(self._cabecera()[3])
+
+    @property
+    def desbordada(self) -> bool:
+        return bool(self._cabecera()[4])
+
+    # Escritura ------------------------------------------------------------
+
+    def _desplazamiento(self, indice: int) -> int:
+        return TAM_CABECERA + indice * SLOT.size
+
+    def _escribir_slot(self, conductor_id: int, condicion, valores: Optional[tuple]) -> Tuple[bool, int]:
+        """
+        Escribe el slot del conductor si `condicion(estado, conductor, trayecto)`
+        se cumple con su contenido actual (`valores` None lo desactiva).
+        Devuelve si escribió y el conductor que ocupaba el slot.
+        """
+        indice = conductor_id % self.slots
+        desplazamiento = self._desplazamiento(indice)
+        with self._lock:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, SLOT.size, desplazamiento, os.SEEK_SET)
+            try:
+                secuencia, estado, conductor, trayecto = SLOT.unpack_from(self._mm, desplazamiento)[:4]
+                if not condicion(estado, conductor, trayecto):
+                    return False, conductor
+                SECUENCIA.pack_into(self._mm, desplazamiento, (secuencia + 1) & 0xFFFFFFFF)
+                if valores is None:
+                    DATOS_SLOT.pack_into(self._mm, desplazamiento + SECUENCIA.size, 0, 0, 0, 0, 0, 0.0, 0.0, 0)
+                else:
+                    DATOS_SLOT.pack_into(self._mm, desplazamiento + SECUENCIA.size, *valores)
+                SECUENCIA.pack_into(self._mm, desplazamiento, (secuencia + 2) & 0xFFFFFFFF)
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, SLOT.size, desplazamiento, os.SEEK_SET)
+        if valores is not None and indice + 1 > self._cabecera()[5]:
+            self._actualizar_cabecera(maximo=indice + 1)
+        return True, conductor
+
+    def escribir(self, conductor_id: int, trayecto_id: int, vehiculo_id: Optional[int], ruta_id: Optional[int],
+                 lat: Optional[float] = None, lng: Optional[float] = None, timestamp: Optional[datetime] = None,
+                 sobrescribir: bool = True):
+        """
+        Trayecto en curso del conductor y, si se conoce, su última posición.
+        Con `sobrescribir=False` no pisa un slot activo (la carga inicial no
+        reemplaza un ping más reciente).
+        """
+        con_posicion = lat is not None and lng is not None
+        valores = (
+            ACTIVO | (CON_POSICION if con_posicion else 0), conductor_id, trayecto_id,
+            vehiculo_id or 0, ruta_id or 0,
+            float(lat) if con_posicion else 0.0, float(lng) if con_posicion else 0.0, _ms(timestamp),
+        )
+
+        def libre_o_propio(estado, conductor, _trayecto):
+            return not estado & ACTIVO or (sobrescribir and conductor == conductor_id)
+
+        escrito, ocupante = self._escribir_slot(conductor_id, libre_o_propio, valores)
+        # Cada choque cuenta, aunque ya esté desbordada, para que una revisión en curso no quite la marca
+        if not escrito and ocupante != conductor_id and self._marcar_desborde():
+            logger.warning(f"Slot de posiciones ocupado por otro conductor ({conductor_id} % {self.slots}); "
+                           "el feed vuelve a leer de la base")
+
+    def cerrar(self, conductor_id: int, trayecto_id: int):
+        """Quita el trayecto del feed (si el slot sigue siendo de ese trayecto)"""
+        self._escribir_slot(
+            conductor_id,
+            lambda estado, conductor, trayecto: bool(estado & ACTIVO) and (conductor, trayecto) == (conductor_id, trayecto_id),
+            None,
+        )
+
+    def _en_curso(self, db: Session) -> list:
+        from ..models.journey import Journey, EstadoTrayecto, Location
+
+        return db.query(
+            Journey.conductor_id, Journey.id, Journey.vehiculo_id, Journey.ruta_id,
+            Location.lat, Location.lng, Location.timestamp
+        ).outerjoin(Location, Location.conductor_id == Journey.conductor_id).filter(
+            Journey.estado == EstadoTrayecto.EN_CURSO
+        ).all()
+
+    def cargar(self, db: Session):
+        """Llena la tabla desde la base la primera vez que se usa"""
+        if self.cargada:
+            return
+        filas = self._en_curso(db)
+        # Si otro worker cargó al mismo tiempo, escribir de nuevo es inocuo
+        for fila in filas:
+            self.escribir(*fila, sobrescribir=False)
+        self._actualizar_cabecera(cargada=1)
+        logger.info(f"Tabla de posiciones {self.ruta} cargada con {len(filas)} trayectos en curso")
+
+    def revisar_desborde(self, db: Session) -> bool:
+        """
+        Intenta quitar la marca de desborde (como mucho una vez cada
+        REVISION_DESBORDE_SEGUNDOS por worker); devuelve si la tabla quedó
+        sin desborde.
+        """
+        visto = self._cabecera()[4]
+        if not visto:
+            return True
+        if time.monotonic() < self._revision:
+            return False
+        self._revision = time.monotonic() + REVISION_DESBORDE_SEGUNDOS
+        filas = self._en_curso(db)
+        conductores = {fila[0] for fila in filas}
+        if len({conductor % self.slots for conductor in conductores}) < len(conductores):
+            return False
+        # Slots de trayectos que terminaron sin pasar por cerrar (p. ej. un worker caído)
+        en_curso = {(fila[0], fila[1]) for fila in filas}
+        for indice in range(self._cabecera()[5]):
+            fila = self._releer_slot(indice)
+            if fila is not None and fila[1] & ACTIVO and (fila[2], fila[3]) not in en_curso:
+                self.cerrar(fila[2], fila[3])
+        # Los conductores que quedaron fuera entran ahora; un choque aquí vuelve a sumar
+        for fila in filas:
+            self.escribir(*fila, sobrescribir=False)
+        if not self._quitar_desborde(visto):
+            return False
+        logger.info(f"Tabla de posiciones {self.ruta} sin choques; el feed vuelve a leer de la tabla")
+        return True
+
+    # Lectura ----------------------------------------------------------------
+
+    def _releer_slot(self, indice: int) -> Optional[tuple]:
+        desplazamiento = self._desplazamiento(indice)
+        for _ in range(REINTENTOS_LECTURA):
+            fila = SLOT.unpack_from(self._mm, desplazamiento)
+            if not fila[0] & 1 and SECUENCIA.unpack_from(self._mm, desplazamiento)[0] == fila[0]:
+                return fila
+            time.sleep(0)
+        return None
+
+    def posiciones(self) -> List[Tuple[int, float, float, int, int, int]]:
+        """(conductor, lat, lng, timestamp_ms, vehiculo, ruta) de los trayectos en curso con posición"""
+        maximo = self._cabecera()[5]
+        instantanea = self._mm[TAM_CABECERA:TAM_CABECERA + maximo * SLOT.size]
+        resultado = []
+        for indice, fila in enumerate(SLOT.iter_unpack(instantanea)):
+            secuencia, estado = fila[0], fila[1]
+            if not secuencia & 1 and not estado & ACTIVO:
+                continue
+            # Seqlock: la copia vale si la secuencia era par y no cambió desde entonces
+            if secuencia & 1 or SECUENCIA.unpack_from(self._mm, self._desplazamiento(indice))[0] != secuencia:
+                fila = self._releer_slot(indice)
+                if fila is None:
+                    continue
+            _, estado, conductor, _, vehiculo, ruta, lat, lng, timestamp = fila
+            if estado & ACTIVO and estado & CON_POSICION:
+                resultado.append((conductor, lat, lng, timestamp, vehiculo, ruta))
+        return resultado
+
+# Nombres por id -----------------------------------------------------------
+
+_nombres: Dict[str, Dict[int, Optional[str]]] = {"conductor": {}, "vehiculo": {}, "ruta": {}}
+_nombres_expira = 0.0
+_nombres_lock = threading.Lock()
+
+def _resolver_nombres(db: Session, ids: Dict[str, set]) -> Dict[str, Dict[int, Optional[str]]]:
+    from ..models.route import Route
+    from ..models.user import User
+    from ..models.vehicle import Vehicle
+
+    global _nombres_expira
+    columnas = {"conductor": (User.id, User.nombre_completo), "vehiculo": (Vehicle.id, Vehicle.placa),
+                "ruta": (Route.id, Route.nombre)}
+    with _nombres_lock:
+        if time.monotonic() > _nombres_expira:
+            for cache in _nombres.values():
+                cache.clear()
+            _nombres_expira = time.monotonic() + NOMBRES_TTL_SEGUNDOS
+        faltantes = {tipo: valores - _nombres[tipo].keys() for tipo, valores in ids.items()}
+    for tipo, valores in faltantes.items():
+        if valores:
+            columna_id, columna_nombre = columnas[tipo]
+            encontrados = dict(db.query(columna_id, columna_nombre).filter(columna_id.in_(valores)).all())
+            with _nombres_lock:
+                _nombres[tipo].update({i: encontrados.get(i) for i in valores})
+    return _nombres
+
+def filas_feed(db: Session) -> Optional[List[tuple]]:
+    """
+    Filas de GET /trayectos/ubicaciones desde la tabla compartida, en el orden
+    de COLUMNAS_UBICACION; None si no hay tabla o está desbordada.
+    """
+    tabla = tabla_posiciones()
+    if tabla is None:
+        return None
+    tabla.cargar(db)
+    if tabla.desbordada and not tabla.revisar_desborde(db):
+        return None
+    # Igual que el JOIN de la consulta: sin vehículo o ruta el trayecto no se muestra
+    posiciones = [p for p in tabla.posiciones() if p[4] and p[5]]
+    nombres = _resolver_nombres(db, {
+        "conductor": {p[0] for p in posiciones},
+        "vehiculo": {p[4] for p in posiciones},
+        "ruta": {p[5] for p in posiciones},
+    })
+    return [
+        (conductor, lat, lng, datetime.fromtimestamp(timestamp / 1000, timezone.utc),
+         nombres["vehiculo"].get(vehiculo), nombres["conductor"].get(conductor), nombres["ruta"].get(ruta),
+         vehiculo, ruta)
+        for conductor, lat, lng, timestamp, vehiculo, ruta in posiciones
+    ]
+
+# Instancia del proceso ------------------------------------------------------
+
+_tabla: Optional[TablaPosiciones] = None
+_tabla_iniciada = False
+_tabla_lock = threading.Lock()
+
+def tabla_posiciones() -> Optional[TablaPosiciones]:
+    """Tabla compartida del proceso (se abre en el primer uso); None si está deshabilitada"""
+    global _tabla, _tabla_iniciada
+    if not _tabla_iniciada:
+        with _tabla_lock:
+            if not _tabla_iniciada:
+                if settings.POSICIONES_COMPARTIDAS and fcntl is not None:
+                    try:
+                        _tabla = TablaPosiciones(settings.POSICIONES_ARCHIVO or ruta_por_defecto(), settings.POSICIONES_SLOTS)
+                    except (OSError, ValueError) as e:
+                        logger.warning(f"Sin tabla de posiciones compartida, el feed lee de la base: {e}")
+                _tabla_iniciada = True
+    return _tabla
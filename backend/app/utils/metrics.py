@@ -0,0 +1,158 @@
+"""
+Métricas de la API en formato de texto de Prometheus (GET /metrics).
+
+- `http_requests_total{method, route, status}`: peticiones atendidas.
+- `http_request_duration_seconds{method, route, status}`: histograma de
+  latencia por plantilla de ruta (`/trayectos/{trayecto_id}`, no la URL
+  concreta, para no disparar la cardinalidad).
+- `http_requests_in_flight`: peticiones en curso.
+- `db_pool_*`: estado del pool de conexiones del engine.
+- `gps_ubicaciones_total`: ubicaciones GPS recibidas (tasa con rate()).
+- `gps_ubicaciones_descartadas_total`: las descartadas por la banda muerta
+  (utils/gps.py), sin escribir en la base.
+
+El middleware es ASGI puro: mide desde que llega la petición hasta que se
+envía el último fragmento de la respuesta. Los valores son por proceso; con
+varios workers cada uno expone los suyos.
+"""
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict, List, Tuple
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIN_RUTA = "sin_ruta"
+
+Clave = Tuple[str, str, str]  # (method, route, status)
+
+class Histograma:
+    __slots__ = ("cubetas", "suma", "conteo")
+
+    def __init__(self):
+        self.cubetas = [0] * (len(BUCKETS) + 1)  # la última es +Inf
+        self.suma = 0.0
+        self.conteo = 0
+
+    def observar(self, valor: float):
+        self.cubetas[bisect_left(BUCKETS, valor)] += 1
+        self.suma += valor
+        self.conteo += 1
+
+class RegistroMetricas:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencias: Dict[Clave, Histograma] = {}
+        self.en_curso = 0
+        self.ubicaciones_gps = 0
+        self.ubicaciones_descartadas = 0
+        self.inicio = time.time()
+
+    def observar_peticion(self, metodo: str, ruta: str, estado: int, segundos: float):
+        clave = (metodo, ruta, str(estado))
+        with self._lock:
+            histograma = self.latencias.get(clave)
+            if histograma is None:
+                histograma = self.latencias[clave] = Histograma()
+            histograma.observar(segundos)
+
+    def sumar_en_curso(self, delta: int):
+        with self._lock:
+            self.en_curso += delta
+
+    def registrar_ubicacion(self, cantidad: int = 1, descartadas: int = 0):
+        with self._lock:
+            self.ubicaciones_gps += cantidad
+            self.ubicaciones_descartadas += descartadas
+
+    def exponer(self) -> str:
+        """Texto en el formato de exposición de Prometheus"""
+        lineas: List[str] = []
+        with self._lock:
+            latencias = sorted(self.latencias.items())
+            en_curso = self.en_curso
+            ubicaciones = self.ubicaciones_gps
+            descartadas = self.ubicaciones_descartadas
+
+        lineas += ["# HELP http_requests_total Peticiones HTTP atendidas",
+                   "# TYPE http_requests_total counter"]
+        for (metodo, ruta, estado), h in latencias:
+            lineas.append(f'http_requests_total{{method="{metodo}",route="{_escapar(ruta)}",status="{estado}"}} {h.conteo}')
+
+        lineas += ["# HELP http_request_duration_seconds Latencia de las peticiones HTTP",
+                   "# TYPE http_request_duration_seconds histogram"]
+        for (metodo, ruta, estado), h in latencias:
+            etiquetas = f'method="{metodo}",route="{_escapar(ruta)}",status="{estado}"'
+            acumulado = 0
+            for limite, cantidad in zip(BUCKETS, h.cubetas):
+                acumulado += cantidad
+                lineas.append(f'http_request_duration_seconds_bucket{{{etiquetas},le="{limite}"}} {acumulado}')
+            lineas.append(f'http_request_duration_seconds_bucket{{{etiquetas},le="+Inf"}} {h.conteo}')
+            lineas.append(f'http_request_duration_seconds_sum{{{etiquetas}}} {h.suma:.6f}')
+            lineas.append(f'http_request_duration_seconds_count{{{etiquetas}}} {h.conteo}')
+
+        lineas += ["# HELP http_requests_in_flight Peticiones HTTP en curso",
+                   "# TYPE http_requests_in_flight gauge",
+                   f"http_requests_in_flight {en_curso}",
+                   "# HELP gps_ubicaciones_total Ubicaciones GPS recibidas",
+                   "# TYPE gps_ubicaciones_total counter",
+                   f"gps_ubicaciones_total {ubicaciones}",
+                   "# HELP gps_ubicaciones_descartadas_total Ubicaciones GPS descartadas por la banda muerta",
+                   "# TYPE gps_ubicaciones_descartadas_total counter",
+                   f"gps_ubicaciones_descartadas_total {descartadas}",
+                   "# HELP process_start_time_seconds Inicio del proceso (epoch)",
+                   "# TYPE process_start_time_seconds gauge",
+                   f"process_start_time_seconds {self.inicio:.3f}"]
+        lineas += _metricas_pool()
+        return "\n".join(lineas) + "\n"
+
+def _escapar(valor: str) -> str:
+    return valor.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _metricas_pool() -> List[str]:
+    """Estado del pool del engine, si ya se creó y el pool lo informa (QueuePool)"""
+    from .. import database
+
+    engine = database._engine
+    pool = getattr(engine, "pool", None)
+    if pool is None or not hasattr(pool, "checkedout"):
+        return []
+    valores = (
+        ("db_pool_size", "Tamaño configurado del pool", pool.size()),
+        ("db_pool_checked_out", "Conexiones en uso", pool.checkedout()),
+        ("db_pool_checked_in", "Conexiones libres en el pool", pool.checkedin()),
+        ("db_pool_overflow", "Conexiones por encima del tamaño del pool", max(pool.overflow(), 0)),
+    )
+    lineas = []
+    for nombre, ayuda, valor in valores:
+        lineas += [f"# HELP {nombre} {ayuda}", f"# TYPE {nombre} gauge", f"{nombre} {valor}"]
+    return lineas
+
+metricas = RegistroMetricas()
+
+class MetricasMiddleware:
+    """Middleware ASGI: cuenta peticiones en curso y observa la latencia por ruta y estado"""
+
+    def __init__(self, app, registro: RegistroMetricas = metricas):
+        self.app = app
+        self.registro = registro
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        inicio = time.perf_counter()
+        estado = [500]
+
+        async def enviar(mensaje):
+            if mensaje["type"] == "http.response.start":
+                estado[0] = mensaje["status"]
+            await send(mensaje)
+
+        self.registro.sumar_en_curso(1)
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            self.registro.sumar_en_curso(-1)
+            ruta = getattr(scope.get("route"), "path", None) or SIN_RUTA
+            self.registro.observar_peticion(scope["method"], ruta, estado[0], time.perf_counter() - inicio)
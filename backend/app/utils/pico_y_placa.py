@@ -0,0 +1,175 @@
+"""
+Motor de reglas de pico y placa compilado y cacheado en memoria.
+
+La configuración guardada en `pico_y_placa_config` ({"1": ["0", "1"], ...},
+con 0=Domingo como en `Date.getDay()` del frontend) se compila a una tabla
+de 7 máscaras de bits: el bit `d` de la máscara del día está encendido si
+los vehículos con dígito `d` tienen restricción ese día.
+
+La flota se indexa agrupando los vehículos por la máscara de sus dígitos,
+así "vehículos restringidos en la fecha D" es un AND de bits por grupo sin
+ninguna consulta a la base de datos. Ambas cachés se invalidan en las
+escrituras de este worker y expiran tras `CACHE_TTL_SEGUNDOS` para recoger
+cambios hechos por otros workers.
+
+Los trayectos programados se validan contra la regla con la fecha local
+(ZONA_HORARIA) de cada día que toca su horario.
+"""
+import threading
+import time
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy.orm import Session
+
+from ..models.vehicle import Vehicle, PicoYPlacaConfig
+from .scheduling import zona_operacion
+
+DEFAULT_CONFIG = {"1": ["0", "1"], "2": ["2", "3"], "3": ["4"], "4": ["5", "6"], "5": ["7", "8"], "6": ["9"], "0": []}
+CACHE_TTL_SEGUNDOS = 60
+
+def dia_semana(fecha: date) -> int:
+    """Día de la semana con 0=Domingo, igual que la configuración"""
+    return fecha.isoweekday() % 7
+
+def mascara_digitos(digitos: Iterable) -> int:
+    mascara = 0
+    for digito in digitos:
+        for caracter in str(digito):
+            if caracter.isdigit():
+                mascara |= 1 << int(caracter)
+    return mascara
+
+def mascara_vehiculo(placa: Optional[str], pico_placa: Optional[str]) -> int:
+    """Dígitos de restricción del vehículo: `pico_placa` si está definido, si no el último dígito de la placa"""
+    if pico_placa:
+        mascara = mascara_digitos([pico_placa])
+        if mascara:
+            return mascara
+    for caracter in reversed(placa or ""):
+        if caracter.isdigit():
+            return 1 << int(caracter)
+    return 0
+
+class ReglaPicoYPlaca:
+    """Configuración compilada: una máscara de dígitos por día de la semana"""
+
+    def __init__(self, config: dict):
+        self.config = config
+        self.mascaras: Tuple[int, ...] = tuple(
+            mascara_digitos(config.get(str(dia), []) or []) for dia in range(7)
+        )
+
+    def mascara_dia(self, fecha: date) -> int:
+        return self.mascaras[dia_semana(fecha)]
+
+    def digitos_restringidos(self, fecha: date) -> List[str]:
+        mascara = self.mascara_dia(fecha)
+        return [str(d) for d in range(10) if mascara >> d & 1]
+
+    def restringido(self, placa: Optional[str], pico_placa: Optional[str], fecha: date) -> bool:
+        return bool(mascara_vehiculo(placa, pico_placa) & self.mascara_dia(fecha))
+
+    def motivo_horario(self, placa: Optional[str], pico_placa: Optional[str],
+                       inicio: datetime, fin: datetime) -> Optional[str]:
+        """Mensaje si el vehículo tiene pico y placa en algún día local de [inicio, fin), o None"""
+        zona = zona_operacion()
+        dia = inicio.astimezone(zona).date()
+        ultimo = (fin - timedelta(microseconds=1)).astimezone(zona).date()
+        while dia <= ultimo:
+            if self.restringido(placa, pico_placa, dia):
+                return f"El vehículo {placa} tiene pico y placa el {dia.isoformat()}"
+            dia += timedelta(days=1)
+        return None
+
+class IndiceFlota:
+    """Vehículos agrupados por la máscara de sus dígitos de restricción"""
+
+    def __init__(self, vehiculos: Iterable[Tuple[int, Optional[str], Optional[str]]]):
+        self.grupos: Dict[int, List[Tuple[int, str]]] = {}
+        self.mascaras: Dict[int, int] = {}
+        for vehiculo_id, placa, pico_placa in vehiculos:
+            mascara = mascara_vehiculo(placa, pico_placa)
+            self.mascaras[vehiculo_id] = mascara
+            self.grupos.setdefault(mascara, []).append((vehiculo_id, placa))
+
+    def restringidos(self, regla: ReglaPicoYPlaca, fecha: date) -> List[Tuple[int, str]]:
+        """Vehículos (id, placa) con restricción en la fecha"""
+        mascara_dia = regla.mascara_dia(fecha)
+        if not mascara_dia:
+            return []
+        resultado = []
+        for mascara, vehiculos in self.grupos.items():
+            if mascara & mascara_dia:
+                resultado.extend(vehiculos)
+        return resultado
+
+    def ids_restringidos(self, regla: ReglaPicoYPlaca, fecha: date) -> set:
+        return {vehiculo_id for vehiculo_id, _ in self.restringidos(regla, fecha)}
+
+_lock = threading.Lock()
+_regla: Optional[ReglaPicoYPlaca] = None
+_regla_expira = 0.0
+_flota: Optional[IndiceFlota] = None
+_flota_expira = 0.0
+
+def cargar_config(db: Session) -> dict:
+    """Lee la configuración de la base de datos, creándola o reparándola si hace falta"""
+    config = db.query(PicoYPlacaConfig).first()
+    if not config:
+        config = PicoYPlacaConfig(config=DEFAULT_CONFIG)
+        db.add(config)
+        db.commit()
+        db.refresh(config)
+    elif not config.config or not isinstance(config.config, dict):
+        # Si el campo config es None, vacío o no es un dict válido, lo repara
+        config.config = DEFAULT_CONFIG
+        db.commit()
+        db.refresh(config)
+    return config.config
+
+def obtener_regla(db: Session) -> ReglaPicoYPlaca:
+    """Regla compilada; solo consulta la base de datos si la caché está vacía o expiró"""
+    global _regla, _regla_expira
+    regla = _regla
+    if regla is not None and time.monotonic() < _regla_expira:
+        return regla
+    with _lock:
+        if _regla is None or time.monotonic() >= _regla_expira:
+            _regla = ReglaPicoYPlaca(cargar_config(db))
+            _regla_expira = time.monotonic() + CACHE_TTL_SEGUNDOS
+        return _regla
+
+def obtener_indice_flota(db: Session) -> IndiceFlota:
+    """Índice de la flota por dígitos; se reconstruye con una sola consulta de proyección"""
+    global _flota, _flota_expira
+    flota = _flota
+    if flota is not None and time.monotonic() < _flota_expira:
+        return flota
+    with _lock:
+        if _flota is None or time.monotonic() >= _flota_expira:
+            _flota = IndiceFlota(db.query(Vehicle.id, Vehicle.placa, Vehicle.pico_placa).all())
+            _flota_expira = time.monotonic() + CACHE_TTL_SEGUNDOS
+        return _flota
+
+def establecer_regla(config: dict) -> ReglaPicoYPlaca:
+    """Reemplaza la regla cacheada tras guardar una configuración nueva"""
+    global _regla, _regla_expira
+    with _lock:
+        _regla = ReglaPicoYPlaca(config)
+        _regla_expira = time.monotonic() + CACHE_TTL_SEGUNDOS
+        return _regla
+
+def verificar_pico_y_placa(db: Session, vehiculo: Vehicle, inicio: Optional[datetime], fin: Optional[datetime]):
+    """Lanza 409 si el vehículo tiene pico y placa en el horario (UTC); sin horario no se valida"""
+    if inicio is None or fin is None:
+        return
+    mensaje = obtener_regla(db).motivo_horario(vehiculo.placa, vehiculo.pico_placa, inicio, fin)
+    if mensaje:
+        raise HTTPException(status_code=409, detail=mensaje)
+
+def invalidar_flota():
+    global _flota
+    with _lock:
+        _flota = None
@@ -0,0 +1,201 @@
+"""
+Perfilado bajo demanda de una petición puntual.
+
+Un administrador agrega `X-Perfilar: 1` (o `?perfilar=1`) a una petición; el
+middleware verifica su token con `get_current_user` + `check_admin_access`
+y, solo entonces, ejecuta esa petición con:
+
+- cProfile activo en el hilo del event loop (los endpoints `async def`),
+  descargable como archivo pstats (`python -m pstats`, snakeviz);
+- un muestreador que cada `PERFIL_INTERVALO_MS` toma la pila del event loop
+  y de los hilos que están ejecutando código de `app/` (los endpoints `def`
+  corren en el threadpool), descargable como pilas colapsadas para
+  flamegraph.pl o speedscope.
+
+Los perfiles se guardan en un anillo en memoria de `PERFILES_MAX` entradas y
+la respuesta perfilada lleva `X-Perfil-Id`. Con el interruptor apagado el
+costo es revisar un encabezado y el query string.
+
+Nota: cProfile y el muestreo ven todo lo que corre en esos hilos mientras
+dura la petición; bajo carga concurrente pueden aparecer otras peticiones.
+"""
+import cProfile
+import itertools
+import logging
+import marshal
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime, timezone
+from typing import Deque, List, Optional
+from urllib.parse import parse_qs
+
+from fastapi import HTTPException
+from starlette.datastructures import Headers
+
+from ..core.config import settings
+
+logger = logging.getLogger(__name__)
+
+DIRECTORIO_APP = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+class Perfil:
+    __slots__ = ("id", "metodo", "ruta", "estado", "duracion_ms", "creado_en", "usuario", "pstats", "colapsado", "muestras")
+
+    def __init__(self, id: int, metodo: str, ruta: str, usuario: str):
+        self.id = id
+        self.metodo = metodo
+        self.ruta = ruta
+        self.usuario = usuario
+        self.estado: Optional[int] = None
+        self.duracion_ms = 0.0
+        self.creado_en = datetime.now(timezone.utc)
+        self.pstats = b""
+        self.colapsado = ""
+        self.muestras = 0
+
+    def resumen(self) -> dict:
+        return {
+            "id": self.id,
+            "metodo": self.metodo,
+            "ruta": self.ruta,
+            "estado": self.estado,
+            "duracion_ms": round(self.duracion_ms, 1),
+            "muestras": self.muestras,
+            "usuario": self.usuario,
+            "creado_en": self.creado_en,
+        }
+
+_lock = threading.Lock()
+_perfiles: Deque[Perfil] = deque(maxlen=settings.PERFILES_MAX)
+_ids = itertools.count(1)
+
+def listar_perfiles() -> List[Perfil]:
+    with _lock:
+        return list(reversed(_perfiles))
+
+def obtener_perfil(perfil_id: int) -> Optional[Perfil]:
+    with _lock:
+        return next((p for p in _perfiles if p.id == perfil_id), None)
+
+def limpiar_perfiles():
+    with _lock:
+        _perfiles.clear()
+
+def _guardar(perfil: Perfil):
+    with _lock:
+        _perfiles.append(perfil)
+
+class Muestreador(threading.Thread):
+    """Toma periódicamente las pilas del event loop y de los hilos que ejecutan código de la app"""
+
+    def __init__(self, hilo_loop: int, intervalo: float):
+        super().__init__(name="muestreador-perfil", daemon=True)
+        self.hilo_loop = hilo_loop
+        self.intervalo = intervalo
+        self.detener = threading.Event()
+        self.pilas: Counter = Counter()
+
+    def run(self):
+        propio = threading.get_ident()
+        nombres = {h.ident: h.name for h in threading.enumerate()}
+        while not self.detener.wait(self.intervalo):
+            for hilo, frame in sys._current_frames().items():
+                if hilo == propio:
+                    continue
+                pila = []
+                de_la_app = hilo == self.hilo_loop
+                while frame is not None:
+                    codigo = frame.f_code
+                    de_la_app = de_la_app or codigo.co_filename.startswith(DIRECTORIO_APP)
+                    pila.append(f"{codigo.co_name} ({os.path.basename(codigo.co_filename)}:{codigo.co_firstlineno})")
+                    frame = frame.f_back
+                if de_la_app:
+                    if hilo not in nombres:
+                        nombres = {h.ident: h.name for h in threading.enumerate()}
+                    pila.append(nombres.get(hilo, str(hilo)))
+                    self.pilas[";".join(reversed(pila))] += 1
+
+    def colapsado(self) -> str:
+        return "".join(f"{pila} {n}\n" for pila, n in self.pilas.most_common())
+
+VALORES_ACTIVOS = ("1", "true")
+
+def _solicitado(scope) -> bool:
+    consulta = scope.get("query_string", b"")
+    if b"perfilar=" in consulta:
+        valores = parse_qs(consulta.decode("latin-1")).get("perfilar", ())
+        if any(v.lower() in VALORES_ACTIVOS for v in valores):
+            return True
+    return any(nombre == b"x-perfilar" and valor.decode("latin-1").strip().lower() in VALORES_ACTIVOS
+               for nombre, valor in scope.get("headers", ()))
+
+async def _usuario_administrador(scope) -> Optional[str]:
+    """Username si el token de la petición es de un administrador, si no None"""
+    from ..database import SessionLocal, get_engine
+    from ..routers.auth import get_current_user, check_admin_access
+
+    autorizacion = Headers(scope=scope).get("authorization", "")
+    if not autorizacion.lower().startswith("bearer "):
+        return None
+    get_engine()
+    db = SessionLocal()
+    try:
+        usuario = check_admin_access(await get_current_user(autorizacion[7:], db))
+        return usuario.username
+    except HTTPException:
+        return None
+    finally:
+        db.close()
+
+class PerfiladorMiddleware:
+    """Middleware ASGI: perfila la petición si un administrador lo pide"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not _solicitado(scope):
+            await self.app(scope, receive, send)
+            return
+        usuario = await _usuario_administrador(scope)
+        if usuario is None:
+            # Sin permisos la petición sigue normal, sin perfilar
+            await self.app(scope, receive, send)
+            return
+
+        perfil = Perfil(next(_ids), scope["method"], scope["path"], usuario)
+
+        async def enviar(mensaje):
+            if mensaje["type"] == "http.response.start":
+                perfil.estado = mensaje["status"]
+                mensaje["headers"] = list(mensaje.get("headers", [])) + [
+                    (b"x-perfil-id", str(perfil.id).encode())
+                ]
+            await send(mensaje)
+
+        perfilador = cProfile.Profile()
+        muestreador = Muestreador(threading.get_ident(), settings.PERFIL_INTERVALO_MS / 1000)
+        inicio = time.perf_counter()
+        muestreador.start()
+        perfilador.enable()
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            perfilador.disable()
+            muestreador.detener.set()
+            muestreador.join()
+            perfil.duracion_ms = (time.perf_counter() - inicio) * 1000
+            ruta = getattr(scope.get("route"), "path", None)
+            if ruta:
+                perfil.ruta = ruta
+            perfilador.create_stats()
+            # Mismo contenido que escribe pstats.Stats.dump_stats
+            perfil.pstats = marshal.dumps(pstats.Stats(perfilador).stats)
+            perfil.colapsado = muestreador.colapsado()
+            perfil.muestras = sum(muestreador.pilas.values())
+            _guardar(perfil)
+            logger.info(f"Perfil {perfil.id}: {perfil.metodo} {perfil.ruta} en {perfil.duracion_ms:.1f} ms ({usuario})")
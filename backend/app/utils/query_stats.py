@@ -0,0 +1,159 @@
+"""
+Conteo de consultas SQL por petición y detector de N+1.
+
+Los eventos `before_cursor_execute` / `after_cursor_execute` del engine
+acumulan, en las estadísticas de la petición en curso (una ContextVar que
+fija el middleware), el número de consultas, el tiempo total en la base de
+datos y las sentencias más lentas. Al enviar la respuesta el middleware:
+
+- agrega `Server-Timing: db;dur=<ms>;desc="<n> consultas"` (visible en la
+  pestaña de red del navegador),
+- escribe una línea de log JSON con el endpoint y las estadísticas,
+- marca como posible N+1 la petición en la que una misma sentencia (con los
+  parámetros normalizados) se repite `QUERY_N1_UMBRAL` veces o más: es la
+  firma de un endpoint cuyo número de consultas crece con el tamaño del
+  resultado.
+
+Se configura con QUERY_STATS_ENABLED, QUERY_N1_UMBRAL y QUERY_LENTAS_TOP
+(ver core/config.py). Las consultas fuera de una petición (CLI, tareas en
+segundo plano que ya respondieron) no se cuentan, salvo dentro de un bloque
+`with contar_consultas()`.
+"""
+import heapq
+import json
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, List, Optional, Tuple
+
+from sqlalchemy import event
+
+from ..core.config import settings
+
+logger = logging.getLogger("app.consultas")
+
+# Listas de parámetros expandidas (IN (?, ?, ?)) cuentan como la misma sentencia
+_PARAMETROS = re.compile(r"\(\s*(?:\?|%\(\w+\)s|%s|:\w+)(?:\s*,\s*(?:\?|%\(\w+\)s|%s|:\w+))*\s*\)")
+_ESPACIOS = re.compile(r"\s+")
+
+def normalizar_sql(sentencia: str) -> str:
+    return _PARAMETROS.sub("(?)", _ESPACIOS.sub(" ", sentencia).strip())
+
+class EstadisticasConsultas:
+    __slots__ = ("consultas", "tiempo_ms", "lentas", "sentencias")
+
+    def __init__(self):
+        self.consultas = 0
+        self.tiempo_ms = 0.0
+        self.lentas: List[Tuple[float, int, str]] = []  # min-heap de las más lentas
+        self.sentencias: Counter = Counter()
+
+    def registrar(self, sentencia: str, ms: float):
+        self.consultas += 1
+        self.tiempo_ms += ms
+        plantilla = normalizar_sql(sentencia)
+        self.sentencias[plantilla] += 1
+        entrada = (ms, self.consultas, plantilla)
+        if len(self.lentas) < settings.QUERY_LENTAS_TOP:
+            heapq.heappush(self.lentas, entrada)
+        elif ms > self.lentas[0][0]:
+            heapq.heapreplace(self.lentas, entrada)
+
+    def repetidas(self, umbral: int) -> List[Tuple[str, int]]:
+        return [(plantilla, n) for plantilla, n in self.sentencias.most_common() if n >= umbral]
+
+    def server_timing(self) -> str:
+        return f'db;dur={self.tiempo_ms:.1f};desc="{self.consultas} consultas"'
+
+_actual: ContextVar[Optional[EstadisticasConsultas]] = ContextVar("estadisticas_consultas", default=None)
+
+def estadisticas_actuales() -> Optional[EstadisticasConsultas]:
+    return _actual.get()
+
+@contextmanager
+def contar_consultas() -> Iterator[EstadisticasConsultas]:
+    """Cuenta las consultas del bloque, fuera de una petición (scripts, benchmarks)"""
+    estadisticas = EstadisticasConsultas()
+    token = _actual.set(estadisticas)
+    try:
+        yield estadisticas
+    finally:
+        _actual.reset(token)
+
+def _antes(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("inicios_consulta", []).append(time.perf_counter())
+
+def _despues(conn, cursor, statement, parameters, context, executemany):
+    inicio = conn.info["inicios_consulta"].pop()
+    estadisticas = _actual.get()
+    if estadisticas is not None:
+        estadisticas.registrar(statement, (time.perf_counter() - inicio) * 1000)
+
+def _error(contexto):
+    inicios = contexto.connection.info.get("inicios_consulta") if contexto.connection is not None else None
+    if inicios:
+        inicios.pop()
+
+def instrumentar_engine(engine):
+    """Registra los eventos de conteo en el engine (una vez por engine)"""
+    if not settings.QUERY_STATS_ENABLED or event.contains(engine, "before_cursor_execute", _antes):
+        return
+    event.listen(engine, "before_cursor_execute", _antes)
+    event.listen(engine, "after_cursor_execute", _despues)
+    event.listen(engine, "handle_error", _error)
+
+class ContadorConsultasMiddleware:
+    """Middleware ASGI: abre las estadísticas de la petición y las publica al responder"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.QUERY_STATS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        estadisticas = EstadisticasConsultas()
+        token = _actual.set(estadisticas)
+        inicio = time.perf_counter()
+
+        async def enviar(mensaje):
+            if mensaje["type"] == "http.response.start":
+                mensaje["headers"] = list(mensaje.get("headers", [])) + [
+                    (b"server-timing", estadisticas.server_timing().encode("latin-1"))
+                ]
+                self._registrar(scope, mensaje["status"], estadisticas, (time.perf_counter() - inicio) * 1000)
+            await send(mensaje)
+
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            _actual.reset(token)
+
+    @staticmethod
+    def _registrar(scope, estado: int, estadisticas: EstadisticasConsultas, total_ms: float):
+        if estadisticas.consultas == 0:
+            return
+        ruta = scope.get("route")
+        endpoint = getattr(ruta, "path", None) or scope.get("path")
+        registro = {
+            "metodo": scope.get("method"),
+            "endpoint": endpoint,
+            "estado": estado,
+            "consultas": estadisticas.consultas,
+            "db_ms": round(estadisticas.tiempo_ms, 1),
+            "total_ms": round(total_ms, 1),
+            "lentas": [
+                {"ms": round(ms, 1), "sql": sql[:300]}
+                for ms, _, sql in sorted(estadisticas.lentas, reverse=True)
+            ],
+        }
+        repetidas = estadisticas.repetidas(settings.QUERY_N1_UMBRAL)
+        if repetidas:
+            registro["posible_n_mas_1"] = [{"veces": n, "sql": sql[:300]} for sql, n in repetidas]
+            logger.warning(json.dumps(registro, ensure_ascii=False))
+        else:
+            logger.info(json.dumps(registro, ensure_ascii=False))
@@ -0,0 +1,68 @@
+"""
+Enrutamiento de lecturas a réplicas con "leer lo propio".
+
+Con DATABASE_REPLICA_URLS definido, los endpoints de solo lectura que usan
+`get_db_lectura` (app/database.py) reparten sus consultas entre las réplicas
+en round-robin; las escrituras siguen en la principal con `get_db`.
+
+Una réplica puede ir unos segundos atrasada, así que un cliente que acaba de
+escribir podría no ver su propio cambio en el listado siguiente. Para evitarlo:
+
+- MarcaEscrituraMiddleware agrega `X-Escritura: <epoch ms>` a toda respuesta
+  exitosa de POST/PUT/PATCH/DELETE.
+- El cliente (frontend/src/services/api.js) guarda el último valor y lo
+  reenvía como `X-Ultima-Escritura` en las peticiones siguientes.
+- Mientras no hayan pasado REPLICA_RETRASO_MAX_SEGUNDOS desde esa marca, las
+  lecturas del cliente van a la principal. `X-Leer-Principal: 1` fuerza la
+  principal en una petición puntual.
+
+Prueba local con dos bases (la réplica es una copia de la principal):
+    cp transporte.db replica.db
+    DATABASE_REPLICA_URLS=sqlite:///./replica.db uvicorn app.main:app
+"""
+import time
+
+from fastapi import Request
+
+from ..core.config import settings
+
+ENCABEZADO_ESCRITURA = "X-Escritura"
+ENCABEZADO_ULTIMA_ESCRITURA = "x-ultima-escritura"
+ENCABEZADO_LEER_PRINCIPAL = "x-leer-principal"
+METODOS_ESCRITURA = frozenset(("POST", "PUT", "PATCH", "DELETE"))
+
+def replicas_configuradas() -> bool:
+    return bool((settings.DATABASE_REPLICA_URLS or "").strip())
+
+def leer_de_principal(request: Request) -> bool:
+    """True si la petición debe leer de la principal para ver las escrituras del cliente"""
+    if request.headers.get(ENCABEZADO_LEER_PRINCIPAL) in ("1", "true"):
+        return True
+    marca = request.headers.get(ENCABEZADO_ULTIMA_ESCRITURA)
+    if not marca:
+        return False
+    try:
+        transcurrido = time.time() - int(marca) / 1000
+    except ValueError:
+        return False
+    return transcurrido < settings.REPLICA_RETRASO_MAX_SEGUNDOS
+
+class MarcaEscrituraMiddleware:
+    """Middleware ASGI: marca con X-Escritura las respuestas exitosas de escrituras"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope.get("method") not in METODOS_ESCRITURA or not replicas_configuradas():
+            await self.app(scope, receive, send)
+            return
+
+        async def enviar(mensaje):
+            if mensaje["type"] == "http.response.start" and mensaje["status"] < 400:
+                mensaje["headers"] = list(mensaje.get("headers", [])) + [
+                    (ENCABEZADO_ESCRITURA.lower().encode("latin-1"), str(int(time.time() * 1000)).encode("latin-1"))
+                ]
+            await send(mensaje)
+
+        await self.app(scope, receive, enviar)
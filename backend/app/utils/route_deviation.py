@@ -0,0 +1,179 @@
+"""
+Detección de desvíos: trayectos EN_CURSO que se apartan del trazado de su ruta.
+
+Índice espacial por ruta: los puntos de `geometria` se proyectan a metros
+(equirectangular alrededor de la latitud media del trazado, de sobra para
+rutas urbanas) y cada segmento se registra en las celdas de CELDA_METROS que
+toca su caja envolvente. La distancia de una ubicación al trazado se mide
+solo contra los segmentos de las celdas a menos de DESVIO_METROS_SALIDA, así
+que cuesta lo mismo con un trazado de 20 puntos que con uno de 5.000. Cada
+worker arma el índice de una ruta en su primer uso y lo descarta al
+invalidarlo (al editar rutas) o tras INDICE_TTL_SEGUNDOS.
+
+Histéresis para no generar una novedad por cada salto del GPS:
+
+- desvío: el punto actual y el anterior (ya en curso) están a más de
+  DESVIO_METROS_SALIDA del trazado. Se anota `desviado_desde` en el trayecto
+  y se crea una Novedad PROBLEMA_RUTA a nombre del conductor.
+- regreso: estando desviado, un punto a menos de DESVIO_METROS_REGRESO.
+  Se borra `desviado_desde` y se completa la nota con la duración.
+
+Entre los dos umbrales el estado no cambia. Dentro de las geocercas de origen
+y destino (terminales, patios) no se evalúa, y las rutas sin trazado nunca
+generan desvíos.
+"""
+import math
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy.orm import Session
+
+from ..core.config import settings
+from ..models.journey import Journey, EstadoTrayecto
+from ..models.novedad import Novedad, TipoNovedad
+from ..models.route import Route
+from .geofence import DESTINO, ORIGEN, Evento, IndiceGeocercas
+from .gps import Punto, utc
+
+CELDA_METROS = 250.0
+METROS_POR_GRADO = 111_320.0
+INDICE_TTL_SEGUNDOS = 60
+
+DESVIO, REGRESO = "desvio", "regreso"
+NOTA_DESVIO = "Desvío detectado automáticamente"
+
+class IndiceSegmentos:
+    """Segmentos del trazado de una ruta en una grilla uniforme en metros"""
+
+    def __init__(self, puntos: Sequence[Sequence[float]], celda_metros: float = CELDA_METROS):
+        self.celda_metros = celda_metros
+        self.lat0 = sum(p[0] for p in puntos) / len(puntos)
+        self.lng0 = sum(p[1] for p in puntos) / len(puntos)
+        self._escala_lng = METROS_POR_GRADO * math.cos(math.radians(self.lat0))
+        proyectados = [self._proyectar(float(lat), float(lng)) for lat, lng in puntos]
+        self._segmentos = list(zip(proyectados, proyectados[1:]))
+        self._celdas: Dict[Tuple[int, int], List[int]] = defaultdict(list)
+        for i, ((x1, y1), (x2, y2)) in enumerate(self._segmentos):
+            col_min, fila_min = self._celda(min(x1, x2), min(y1, y2))
+            col_max, fila_max = self._celda(max(x1, x2), max(y1, y2))
+            for col in range(col_min, col_max + 1):
+                for fila in range(fila_min, fila_max + 1):
+                    self._celdas[(col, fila)].append(i)
+
+    def _proyectar(self, lat: float, lng: float) -> Tuple[float, float]:
+        return (lng - self.lng0) * self._escala_lng, (lat - self.lat0) * METROS_POR_GRADO
+
+    def _celda(self, x: float, y: float) -> Tuple[int, int]:
+        return math.floor(x / self.celda_metros), math.floor(y / self.celda_metros)
+
+    def mas_cercano(self, lat: float, lng: float, radio_m: float) -> Optional[Tuple[int, float]]:
+        """(índice del segmento, distancia en metros) más cercano a menos de `radio_m`, o None"""
+        x, y = self._proyectar(lat, lng)
+        col_min, fila_min = self._celda(x - radio_m, y - radio_m)
+        col_max, fila_max = self._celda(x + radio_m, y + radio_m)
+        revisados = set()
+        mejor: Optional[Tuple[int, float]] = None
+        for col in range(col_min, col_max + 1):
+            for fila in range(fila_min, fila_max + 1):
+                for i in self._celdas.get((col, fila), ()):
+                    if i in revisados:
+                        continue
+                    revisados.add(i)
+                    distancia = _distancia_segmento(x, y, *self._segmentos[i])
+                    if distancia <= radio_m and (mejor is None or distancia < mejor[1]):
+                        mejor = (i, distancia)
+        return mejor
+
+    def distancia(self, lat: float, lng: float) -> float:
+        """Distancia en metros al trazado completo, sin usar la grilla"""
+        x, y = self._proyectar(lat, lng)
+        return min(_distancia_segmento(x, y, a, b) for a, b in self._segmentos)
+
+def _distancia_segmento(x: float, y: float, a: Tuple[float, float], b: Tuple[float, float]) -> float:
+    (ax, ay), (bx, by) = a, b
+    dx, dy = bx - ax, by - ay
+    largo2 = dx * dx + dy * dy
+    t = 0.0 if largo2 == 0 else max(0.0, min(1.0, ((x - ax) * dx + (y - ay) * dy) / largo2))
+    return math.hypot(x - (ax + t * dx), y - (ay + t * dy))
+
+# Índices del proceso ----------------------------------------------------------
+
+_indices: Dict[int, Tuple[Optional[IndiceSegmentos], float]] = {}
+_generacion = 0
+_lock = threading.Lock()
+
+def invalidar_trazados():
+    """Descarta los índices del proceso; llamar después del commit al editar rutas"""
+    global _generacion
+    with _lock:
+        _indices.clear()
+        _generacion += 1
+
+def indice_ruta(db: Session, ruta_id: int) -> Optional[IndiceSegmentos]:
+    """Índice de segmentos del trazado de la ruta; None si no tiene trazado"""
+    guardado = _indices.get(ruta_id)
+    if guardado is not None and time.monotonic() < guardado[1]:
+        return guardado[0]
+    generacion = _generacion
+    geometria = db.query(Route.geometria).filter(Route.id == ruta_id).scalar()
+    indice = IndiceSegmentos(geometria) if geometria and len(geometria) >= 2 else None
+    with _lock:
+        # Una invalidación durante la carga deja el índice sin guardar
+        if generacion == _generacion:
+            _indices[ruta_id] = (indice, time.monotonic() + INDICE_TTL_SEGUNDOS)
+    return indice
+
+# Evaluación ---------------------------------------------------------------
+
+def _distancia_trazado(indice: IndiceSegmentos, punto: Punto) -> Optional[float]:
+    """Distancia al trazado, o None si está a más de DESVIO_METROS_SALIDA"""
+    cercano = indice.mas_cercano(punto.lat, punto.lng, settings.DESVIO_METROS_SALIDA)
+    return cercano and cercano[1]
+
+def evaluar_desvio(db: Session, geocercas: IndiceGeocercas, trayecto: Journey,
+                   anterior: Optional[Punto], actual: Punto) -> List[Evento]:
+    """
+    Eventos de desvío del punto `actual` para un trayecto EN_CURSO. Crea o
+    completa la novedad en la sesión; el commit queda a cargo de quien llama.
+    """
+    if trayecto.estado != EstadoTrayecto.EN_CURSO:
+        return []
+    indice = indice_ruta(db, trayecto.ruta_id)
+    if indice is None:
+        return []
+    terminales = {(trayecto.ruta_id, ORIGEN), (trayecto.ruta_id, DESTINO)}
+    if terminales & geocercas.dentro(actual):
+        return []
+
+    distancia = _distancia_trazado(indice, actual)
+    if trayecto.desviado_desde is None:
+        if distancia is not None or anterior is None:
+            return []
+        # El punto anterior tiene que ser de este trayecto y también estar fuera
+        if trayecto.fecha_salida is None or anterior.timestamp < utc(trayecto.fecha_salida) \
+                or _distancia_trazado(indice, anterior) is not None:
+            return []
+        trayecto.desviado_desde = anterior.timestamp
+        db.add(Novedad(
+            trayecto_id=trayecto.id, conductor_id=trayecto.conductor_id, tipo=TipoNovedad.PROBLEMA_RUTA,
+            fecha_reporte=actual.timestamp,
+            notas=f"{NOTA_DESVIO}: a {indice.distancia(actual.lat, actual.lng):.0f} m del trazado "
+                  f"en ({actual.lat:.5f}, {actual.lng:.5f})."
+        ))
+        return [Evento(DESVIO, trayecto.id, True)]
+
+    if distancia is None or distancia >= settings.DESVIO_METROS_REGRESO:
+        return []
+    desde = utc(trayecto.desviado_desde)
+    trayecto.desviado_desde = None
+    novedad = db.query(Novedad).filter(
+        Novedad.trayecto_id == trayecto.id,
+        Novedad.tipo == TipoNovedad.PROBLEMA_RUTA,
+        Novedad.notas.like(f"{NOTA_DESVIO}%"),
+    ).order_by(Novedad.id.desc()).first()
+    if novedad is not None:
+        minutos = max(1, round((actual.timestamp - desde).total_seconds() / 60))
+        novedad.notas = f"{novedad.notas or ''} Regresó a la ruta tras {minutos} min.".strip()
+    return [Evento(REGRESO, trayecto.id, True)]
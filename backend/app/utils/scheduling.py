@@ -0,0 +1,175 @@
+"""
+Detección de doble reserva de conductores y vehículos.
+
+Los trayectos PROGRAMADO/EN_CURSO con horario ocupan el intervalo
+[inicio_programado, fin_programado); los EN_CURSO sin horario (creados antes
+de que el horario fuera obligatorio) ocupan [fecha_salida, fecha_salida +
+tiempo estimado de la ruta), igual que en el despacho. Como ningún trayecto
+puede durar más de `MAX_DURACION_TRAYECTO`, un cruce con [inicio, fin) solo
+puede venir de trayectos que empiezan en (inicio - MAX_DURACION_TRAYECTO,
+fin): ese rango acotado se resuelve con los índices (conductor_id,
+inicio_programado) y (vehiculo_id, inicio_programado) en O(log n + k).
+
+Los lotes se validan en una sola pasada: una consulta trae las reservas de
+todos los recursos del lote y luego se recorren ordenadas por recurso.
+
+Las horas sin zona (formularios, despacho por fecha + hora_salida) son hora
+de la operación, ZONA_HORARIA, y no la del servidor: el contenedor corre en
+UTC.
+"""
+from datetime import date, datetime, time, timedelta, timezone, tzinfo
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+from fastapi import HTTPException
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session
+
+from ..core.config import settings
+from ..models.journey import Journey, EstadoTrayecto
+from ..models.route import Route
+
+Intervalo = Tuple[datetime, datetime]
+
+MAX_DURACION_TRAYECTO = timedelta(hours=24)
+DURACION_POR_DEFECTO_MINUTOS = 60
+ESTADOS_RESERVA = (EstadoTrayecto.PROGRAMADO, EstadoTrayecto.EN_CURSO)
+
+@lru_cache()
+def zona_operacion() -> tzinfo:
+    return ZoneInfo(settings.ZONA_HORARIA)
+
+def a_utc(valor: datetime) -> datetime:
+    """Normaliza a UTC; un datetime sin zona se interpreta en ZONA_HORARIA"""
+    if valor.tzinfo is None:
+        valor = valor.replace(tzinfo=zona_operacion())
+    return valor.astimezone(timezone.utc)
+
+def hoy_operacion() -> date:
+    """Fecha de hoy en ZONA_HORARIA; date.today() es la del servidor (UTC)"""
+    return datetime.now(zona_operacion()).date()
+
+def inicio_dia(dia: date) -> datetime:
+    """Medianoche de `dia` en ZONA_HORARIA, en UTC"""
+    return a_utc(datetime.combine(dia, time.min))
+
+def a_utc_guardado(valor: datetime) -> datetime:
+    """Los datetime leídos sin zona (SQLite) están guardados en UTC"""
+    if valor.tzinfo is None:
+        return valor.replace(tzinfo=timezone.utc)
+    return valor.astimezone(timezone.utc)
+
+def normalizar_horario(inicio: Optional[datetime], fin: Optional[datetime],
+                       tiempo_estimado: Optional[int]) -> Intervalo:
+    """Completa el fin con la duración estimada de la ruta y valida el intervalo"""
+    if inicio is None:
+        raise HTTPException(status_code=400, detail="inicio_programado es obligatorio")
+    inicio = a_utc(inicio)
+    fin = a_utc(fin) if fin is not None else inicio + timedelta(minutes=tiempo_estimado or DURACION_POR_DEFECTO_MINUTOS)
+    if fin <= inicio:
+        raise HTTPException(status_code=400, detail="fin_programado debe ser posterior a inicio_programado")
+    if fin - inicio > MAX_DURACION_TRAYECTO:
+        raise HTTPException(status_code=400, detail="Un trayecto no puede durar más de 24 horas")
+    return inicio, fin
+
+def intervalo_reserva(inicio_programado: Optional[datetime], fin_programado: Optional[datetime],
+                      fecha_salida: Optional[datetime], tiempo_estimado: Optional[int]) -> Optional[Intervalo]:
+    """Intervalo ocupado por un trayecto: su horario o, sin horario, desde la salida real; None si no tiene ninguno"""
+    if inicio_programado is not None and fin_programado is not None:
+        return a_utc_guardado(inicio_programado), a_utc_guardado(fin_programado)
+    if fecha_salida is None:
+        return None
+    salida = a_utc_guardado(fecha_salida)
+    duracion = min(timedelta(minutes=tiempo_estimado or DURACION_POR_DEFECTO_MINUTOS), MAX_DURACION_TRAYECTO)
+    return salida, salida + duracion
+
+def _filtro_ventana(inicio: datetime, fin: datetime):
+    return (
+        Journey.estado.in_(ESTADOS_RESERVA),
+        or_(
+            and_(
+                Journey.inicio_programado > inicio - MAX_DURACION_TRAYECTO,
+                Journey.inicio_programado < fin,
+                Journey.fin_programado > inicio,
+            ),
+            and_(
+                Journey.inicio_programado == None,
+                Journey.estado == EstadoTrayecto.EN_CURSO,
+                Journey.fecha_salida > inicio - MAX_DURACION_TRAYECTO,
+                Journey.fecha_salida < fin,
+            ),
+        ),
+    )
+
+def reservas_ventana(db: Session, inicio: datetime, fin: datetime, *condiciones) -> List[Tuple[int, int, int, datetime, datetime]]:
+    """(id, conductor_id, vehiculo_id, inicio, fin) de las reservas que se cruzan con [inicio, fin)"""
+    filas = db.query(
+        Journey.id, Journey.conductor_id, Journey.vehiculo_id,
+        Journey.inicio_programado, Journey.fin_programado, Journey.fecha_salida, Route.tiempo_estimado
+    ).outerjoin(Route, Route.id == Journey.ruta_id).filter(*_filtro_ventana(inicio, fin), *condiciones).all()
+    reservas = []
+    for trayecto_id, conductor_id, vehiculo_id, *horario in filas:
+        intervalo = intervalo_reserva(*horario)
+        if intervalo is not None and intervalo[0] < fin and inicio < intervalo[1]:
+            reservas.append((trayecto_id, conductor_id, vehiculo_id) + intervalo)
+    return reservas
+
+def buscar_conflicto(db: Session, conductor_id: int, vehiculo_id: int, inicio: datetime, fin: datetime,
+                     excluir_id: Optional[int] = None) -> Optional[str]:
+    """Mensaje del primer cruce del conductor o del vehículo con otro trayecto, o None"""
+    condiciones = [or_(Journey.conductor_id == conductor_id, Journey.vehiculo_id == vehiculo_id)]
+    if excluir_id is not None:
+        condiciones.append(Journey.id != excluir_id)
+    reservas = sorted(reservas_ventana(db, inicio, fin, *condiciones))
+    for posicion, recurso_id, nombre in ((1, conductor_id, "El conductor"), (2, vehiculo_id, "El vehículo")):
+        conflicto = next((reserva for reserva in reservas if reserva[posicion] == recurso_id), None)
+        if conflicto:
+            return f"{nombre} ya tiene asignado el trayecto {conflicto[0]} en ese horario"
+    return None
+
+def verificar_disponibilidad(db: Session, conductor_id: int, vehiculo_id: int, inicio: Optional[datetime],
+                             fin: Optional[datetime], excluir_id: Optional[int] = None):
+    """Lanza 409 si el conductor o el vehículo ya están reservados en el intervalo"""
+    if inicio is None or fin is None:
+        return
+    mensaje = buscar_conflicto(db, conductor_id, vehiculo_id, inicio, fin, excluir_id)
+    if mensaje:
+        raise HTTPException(status_code=409, detail=mensaje)
+
+def conflictos_lote(db: Session, items: Iterable[Tuple[int, int, int, datetime, datetime]]) -> Dict[int, str]:
+    """
+    items: (indice, conductor_id, vehiculo_id, inicio, fin) ya normalizados a UTC.
+    Devuelve indice -> motivo para los elementos que se cruzan con reservas
+    existentes o con elementos anteriores del mismo lote.
+    """
+    items = [item for item in items if item[3] is not None]
+    if not items:
+        return {}
+    inicio_min = min(item[3] for item in items)
+    fin_max = max(item[4] for item in items)
+    conductores = {item[1] for item in items}
+    vehiculos = {item[2] for item in items}
+
+    existentes = reservas_ventana(
+        db, inicio_min, fin_max, or_(Journey.conductor_id.in_(conductores), Journey.vehiculo_id.in_(vehiculos))
+    )
+
+    # Intervalos por recurso: ("c", id) para conductores y ("v", id) para vehículos
+    reservas: Dict[Tuple[str, int], List[Tuple[datetime, datetime, str]]] = {}
+    for trayecto_id, conductor_id, vehiculo_id, inicio, fin in existentes:
+        intervalo = (inicio, fin, f"el trayecto {trayecto_id}")
+        reservas.setdefault(("c", conductor_id), []).append(intervalo)
+        reservas.setdefault(("v", vehiculo_id), []).append(intervalo)
+
+    conflictos: Dict[int, str] = {}
+    for indice, conductor_id, vehiculo_id, inicio, fin in sorted(items, key=lambda item: item[0]):
+        for clave, nombre in ((("c", conductor_id), "El conductor"), (("v", vehiculo_id), "El vehículo")):
+            cruce = next((origen for a, b, origen in reservas.get(clave, ()) if a < fin and inicio < b), None)
+            if cruce:
+                conflictos[indice] = f"{nombre} ya tiene asignado {cruce} en ese horario"
+                break
+        else:
+            for clave in (("c", conductor_id), ("v", vehiculo_id)):
+                reservas.setdefault(clave, []).append((inicio, fin, f"la fila {indice + 1} del lote"))
+    return conflictos
@@ -0,0 +1,219 @@
+"""
+Cargas masivas desde archivos CSV/XLSX procesadas por streaming.
+
+El endpoint copia el archivo a disco, crea un registro `CargaMasiva` y
+devuelve su id de inmediato; el procesamiento corre en segundo plano:
+
+- El archivo se lee fila a fila (csv.DictReader / openpyxl en modo
+  read_only), nunca completo en memoria.
+- Cada `TAMANO_LOTE` filas válidas se escriben y se hace commit, y se
+  actualiza el progreso de la carga para que la UI lo consulte en
+  GET /cargas/{id}.
+- Solo se conservan las primeras `MAX_ERRORES_DETALLE` filas con error.
+"""
+import csv
+import io
+import logging
+import os
+import shutil
+import tempfile
+import traceback
+from datetime import datetime, timezone
+from typing import Callable, Iterator, List, Optional, Tuple, Type
+
+from fastapi import BackgroundTasks, HTTPException, UploadFile
+from pydantic import BaseModel, ValidationError
+from sqlalchemy.orm import Session
+
+from ..database import SessionLocal, get_engine
+from ..models.carga import CargaMasiva, EstadoCarga
+from .bulk import importar, PoliticaConflicto, ErrorImportacion
+
+logger = logging.getLogger(__name__)
+
+TAMANO_LOTE = 1000
+MAX_ERRORES_DETALLE = 500
+FORMATOS = {".csv": "csv", ".xlsx": "xlsx"}
+
+# escribir_lote(db, [(fila, datos_validados)]) -> reporte por fila como en utils.bulk
+EscribirLote = Callable[[Session, List[Tuple[int, dict]]], List[dict]]
+
+def detectar_formato(nombre: Optional[str]) -> str:
+    extension = os.path.splitext(nombre or "")[1].lower()
+    if extension not in FORMATOS:
+        raise HTTPException(status_code=400, detail="Formato no soportado: use un archivo .csv o .xlsx")
+    return FORMATOS[extension]
+
+def guardar_temporal(archivo: UploadFile, formato: str) -> str:
+    """Copia la subida a un archivo temporal en bloques (sin cargarla completa en memoria)"""
+    fd, ruta = tempfile.mkstemp(suffix=f".{formato}", prefix="carga_")
+    with os.fdopen(fd, "wb") as destino:
+        shutil.copyfileobj(archivo.file, destino, length=1024 * 1024)
+    return ruta
+
+def crear_carga(db: Session, entidad: str, archivo: UploadFile, politica: Optional[str] = None) -> CargaMasiva:
+    carga = CargaMasiva(
+        entidad=entidad,
+        archivo=archivo.filename,
+        politica=politica,
+        estado=EstadoCarga.PENDIENTE.value,
+        filas_procesadas=0, creados=0, actualizados=0, omitidos=0, errores=0,
+        errores_detalle=[]
+    )
+    db.add(carga)
+    db.commit()
+    db.refresh(carga)
+    return carga
+
+def _limpiar(valor):
+    if isinstance(valor, str):
+        valor = valor.strip()
+        return valor or None
+    return valor
+
+def _celda_xlsx(valor):
+    # Los números de Excel llegan como int/float y pydantic no los acepta en
+    # campos str (cédulas, contraseñas, placas solo con dígitos); como texto
+    # los campos numéricos los siguen validando igual. 123.0 → "123"
+    if isinstance(valor, bool):
+        return str(valor).lower()
+    if isinstance(valor, float) and valor.is_integer():
+        return str(int(valor))
+    if isinstance(valor, (int, float)):
+        return str(valor)
+    return _limpiar(valor)
+
+def leer_csv(ruta: str) -> Iterator[Tuple[dict, Optional[float]]]:
+    """Filas del CSV como dicts, con el avance aproximado según los bytes leídos"""
+    total = os.path.getsize(ruta) or 1
+    with open(ruta, "rb") as binario:
+        texto = io.TextIOWrapper(binario, encoding="utf-8-sig", newline="")
+        for fila in csv.DictReader(texto):
+            yield {(k or "").strip(): _limpiar(v) for k, v in fila.items()}, min(binario.tell() / total, 1.0)
+
+def leer_xlsx(ruta: str) -> Iterator[Tuple[dict, Optional[float]]]:
+    """Filas de la primera hoja; la primera fila son los encabezados"""
+    # openpyxl solo se importa al procesar una carga, no al arrancar la app
+    from openpyxl import load_workbook
+
+    libro = load_workbook(ruta, read_only=True, data_only=True)
+    try:
+        hoja = libro.worksheets[0]
+        total = hoja.max_row or None
+        filas = hoja.iter_rows(values_only=True)
+        encabezados = [str(c).strip() if c is not None else "" for c in next(filas, ())]
+        for numero, valores in enumerate(filas, start=2):
+            if valores is None or all(v is None for v in valores):
+                continue
+            yield (
+                {k: _celda_xlsx(v) for k, v in zip(encabezados, valores) if k},
+                min(numero / total, 1.0) if total else None
+            )
+    finally:
+        libro.close()
+
+def _acumular(carga: CargaMasiva, reporte: List[dict]):
+    conteo = {"creado": 0, "actualizado": 0, "omitido": 0, "error": 0}
+    for fila in reporte:
+        conteo[fila["estado"]] += 1
+    carga.creados += conteo["creado"]
+    carga.actualizados += conteo["actualizado"]
+    carga.omitidos += conteo["omitido"]
+    carga.errores += conteo["error"]
+    detalle = list(carga.errores_detalle or [])
+    if len(detalle) < MAX_ERRORES_DETALLE:
+        detalle += [f for f in reporte if f["estado"] == "error"][:MAX_ERRORES_DETALLE - len(detalle)]
+        carga.errores_detalle = detalle
+
+def procesar_carga(carga_id: int, ruta: str, formato: str, esquema: Type[BaseModel],
+                   escribir_lote: EscribirLote, tamano_lote: int = TAMANO_LOTE,
+                   al_confirmar: Optional[Callable[[], None]] = None):
+    """
+    Tarea de segundo plano: valida y escribe el archivo por lotes con commit por lote.
+    `al_confirmar` se llama después de cada commit (p. ej. para invalidar cachés).
+    """
+    get_engine()
+    db = SessionLocal()
+    carga = db.query(CargaMasiva).filter(CargaMasiva.id == carga_id).first()
+    try:
+        carga.estado = EstadoCarga.PROCESANDO.value
+        db.commit()
+
+        lector = leer_csv if formato == "csv" else leer_xlsx
+        lote: List[Tuple[int, dict]] = []
+        invalidas: List[dict] = []
+        avance: Optional[float] = None
+
+        def volcar():
+            reporte = list(invalidas)
+            if lote:
+                reporte += escribir_lote(db, lote)
+            _acumular(carga, reporte)
+            carga.filas_procesadas += len(lote) + len(invalidas)
+            carga.porcentaje = round(avance * 100, 1) if avance is not None else None
+            db.commit()
+            if al_confirmar and lote:
+                al_confirmar()
+            lote.clear()
+            invalidas.clear()
+
+        for numero, (datos, avance) in enumerate(lector(ruta), start=1):
+            try:
+                lote.append((numero, esquema(**datos).dict()))
+            except ValidationError as e:
+                mensaje = "; ".join(f"{'.'.join(str(p) for p in err['loc'])}: {err['msg']}" for err in e.errors())
+                invalidas.append({"fila": numero, "estado": "error", "id": None, "clave": None, "detalle": mensaje})
+            if len(lote) + len(invalidas) >= tamano_lote:
+                volcar()
+        avance = 1.0
+        volcar()
+
+        carga.estado = EstadoCarga.COMPLETADA.value
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error procesando la carga {carga_id}: {str(e)}")
+        logger.error(traceback.format_exc())
+        carga = db.query(CargaMasiva).filter(CargaMasiva.id == carga_id).first()
+        if isinstance(e, ErrorImportacion):
+            # Política "fallar": los lotes anteriores ya quedaron guardados
+            _acumular(carga, [f for f in e.resultado["filas"] if f["estado"] == "error"])
+        carga.estado = EstadoCarga.FALLIDA.value
+        carga.mensaje = str(getattr(e, "detail", e))[:500]
+    finally:
+        carga.finalizado_en = datetime.now(timezone.utc)
+        db.commit()
+        db.close()
+        os.remove(ruta)
+
+def con_filas(reporte: List[dict], lote: List[Tuple[int, dict]]) -> List[dict]:
+    """Traduce la numeración de `utils.bulk` (posición en el lote) al número de fila del archivo"""
+    for fila in reporte:
+        fila["fila"] = lote[fila["fila"] - 1][0]
+    return reporte
+
+def escritor_importacion(modelo, claves: Tuple[str, ...], politica: PoliticaConflicto,
+                         claves_unicas: bool = True,
+                         preparar: Optional[Callable[[dict], dict]] = None) -> EscribirLote:
+    """Escritor de lotes basado en `utils.bulk.importar`; el commit lo hace `procesar_carga`"""
+    def escribir(db: Session, lote: List[Tuple[int, dict]]) -> List[dict]:
+        registros = [preparar(datos) if preparar else datos for _, datos in lote]
+        try:
+            resultado = importar(db, modelo, registros, claves, politica,
+                                 claves_unicas=claves_unicas, tamano_lote=len(lote), commit=False)
+        except ErrorImportacion as e:
+            con_filas(e.resultado["filas"], lote)
+            raise
+        return con_filas(resultado["filas"], lote)
+    return escribir
+
+def iniciar_carga(db: Session, background_tasks: BackgroundTasks, archivo: UploadFile, entidad: str,
+                  esquema: Type[BaseModel], escribir_lote: EscribirLote,
+                  politica: Optional[str] = None,
+                  al_confirmar: Optional[Callable[[], None]] = None) -> CargaMasiva:
+    """Guarda el archivo, registra la carga y agenda su procesamiento; responde sin esperar"""
+    formato = detectar_formato(archivo.filename)
+    ruta = guardar_temporal(archivo, formato)
+    carga = crear_carga(db, entidad, archivo, politica)
+    background_tasks.add_task(procesar_carga, carga.id, ruta, formato, esquema, escribir_lote,
+                              al_confirmar=al_confirmar)
+    return carga
@@ -0,0 +1,88 @@
+"""
+Negociación de formato para los feeds en vivo (posiciones de la flota).
+
+Un registro JSON de ubicación repite los nombres de los campos y una fecha
+ISO de 26 caracteres; con la flota completa consultada cada 5 segundos desde
+datos móviles, esos bytes dominan. Según el encabezado `Accept`:
+
+- `application/json` (por defecto): lista de objetos, igual que siempre.
+- `application/msgpack`: la misma lista de objetos en MessagePack.
+- `application/vnd.ludial.columnar+json` / `+msgpack`: arreglos paralelos
+  por columna, {"n": 3, "columnas": {"lat": [...], "lng": [...], ...}}.
+
+En los formatos compactos las fechas viajan como milisegundos desde la época
+(UTC) en vez de texto ISO.
+"""
+from datetime import datetime, timezone
+from typing import Iterable, List, Optional, Sequence
+
+from fastapi import Request, Response
+
+from .fast_json import dumps, respuesta_filas
+
+JSON = "application/json"
+MSGPACK = "application/msgpack"
+COLUMNAR_JSON = "application/vnd.ludial.columnar+json"
+COLUMNAR_MSGPACK = "application/vnd.ludial.columnar+msgpack"
+ALIAS = {"application/x-msgpack": MSGPACK}
+SOPORTADOS = (JSON, MSGPACK, COLUMNAR_JSON, COLUMNAR_MSGPACK)
+
+def negociar(accept: Optional[str]) -> str:
+    """Formato soportado con mayor `q` en el encabezado Accept; JSON si no hay ninguno"""
+    mejor, mejor_q = JSON, 0.0
+    for posicion, parte in enumerate((accept or "").split(",")):
+        tipo, *parametros = [p.strip() for p in parte.split(";")]
+        tipo = ALIAS.get(tipo.lower(), tipo.lower())
+        if tipo not in SOPORTADOS:
+            continue
+        q = 1.0
+        for parametro in parametros:
+            if parametro.startswith("q="):
+                try:
+                    q = float(parametro[2:])
+                except ValueError:
+                    q = 0.0
+        # Ante el mismo q gana el primero listado
+        if q > mejor_q:
+            mejor, mejor_q = tipo, q
+    return mejor
+
+def epoch_ms(valor: Optional[datetime]) -> Optional[int]:
+    """Milisegundos desde la época; los datetime sin zona están guardados en UTC"""
+    if valor is None:
+        return None
+    if valor.tzinfo is None:
+        valor = valor.replace(tzinfo=timezone.utc)
+    return int(valor.timestamp() * 1000)
+
+def _msgpack(contenido) -> bytes:
+    # msgpack solo se importa si un cliente lo pide
+    import msgpack
+    return msgpack.packb(contenido, use_bin_type=True)
+
+def respuesta_feed(request: Request, columnas: Sequence[str], filas: Iterable[Sequence],
+                   columnas_fecha: Sequence[str] = ()) -> Response:
+    """Codifica las filas de un feed en el formato negociado con el cliente"""
+    formato = negociar(request.headers.get("accept"))
+    cabeceras = {"Vary": "Accept"}
+    if formato == JSON:
+        respuesta = respuesta_filas(columnas, filas)
+        respuesta.headers.update(cabeceras)
+        return respuesta
+
+    filas = list(filas)
+    fechas = {columnas.index(c) for c in columnas_fecha}
+    if fechas:
+        filas = [
+            tuple(epoch_ms(v) if i in fechas else v for i, v in enumerate(fila))
+            for fila in filas
+        ]
+
+    if formato in (COLUMNAR_JSON, COLUMNAR_MSGPACK):
+        arreglos: List[list] = [list(columna) for columna in zip(*filas)] if filas else [[] for _ in columnas]
+        contenido = {"n": len(filas), "columnas": dict(zip(columnas, arreglos))}
+    else:
+        contenido = [dict(zip(columnas, fila)) for fila in filas]
+
+    cuerpo = dumps(contenido) if formato == COLUMNAR_JSON else _msgpack(contenido)
+    return Response(content=cuerpo, media_type=formato, headers=cabeceras)
@@ -0,0 +1,413 @@
+"""
+Generador de datos sintéticos con varios años de historia.
+
+Llena `usuarios`, `vehiculos`, `rutas`, `trayectos`, `novedades` y
+`ubicaciones` con datos coherentes entre sí:
+
+- los trayectos se reparten día a día en turnos fijos por conductor, así que
+  ningún conductor ni vehículo tiene dos trayectos que se crucen;
+- los del pasado toman su estado de `--estados` (COMPLETADO con salida,
+  llegada, duración y pasajeros; CANCELADO con llegada anticipada; ...),
+  los que están ocurriendo ahora quedan EN_CURSO con su ubicación reciente y
+  los futuros quedan PROGRAMADO;
+- una fracción de los trayectos iniciados tiene novedades.
+
+Los id se asignan aquí (la base debe estar vacía, o usar `--reiniciar`) y las
+filas se escriben por lotes: COPY FROM STDIN en PostgreSQL/psycopg2 y un
+executemany en los demás motores. Los índices de `trayectos` y `novedades`
+se quitan durante la carga y se crean al final.
+
+Uso (desde backend/):
+    python -m benchmarks.datos_sinteticos --database-url sqlite:////tmp/historia.db --trayectos 1000000
+    python -m benchmarks.datos_sinteticos --database-url postgresql://.../historia --trayectos 10000000 --anios 3
+
+Desde un benchmark:
+    from benchmarks.datos_sinteticos import Escala, base_temporal
+    url = base_temporal(Escala(trayectos=50_000))
+"""
+import argparse
+import itertools
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta, timezone
+from enum import Enum
+from typing import Dict, Iterator, List, Optional
+
+from sqlalchemy import Table, create_engine, event, func, insert, select
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+ESTADOS_POR_DEFECTO = {"COMPLETADO": 0.93, "CANCELADO": 0.05, "PENDIENTE": 0.02}
+TIPOS_NOVEDAD = {"TRAFICO": 0.5, "AVERIA_MECANICA": 0.2, "PROBLEMA_RUTA": 0.15, "ACCIDENTE": 0.05, "OTRO": 0.1}
+BARRIOS = (
+    "Centro", "Laureles", "Belén", "Envigado", "Itagüí", "Bello", "Robledo", "Castilla", "Manrique", "Aranjuez",
+    "Buenos Aires", "La América", "San Javier", "El Poblado", "Sabaneta", "La Estrella", "Copacabana", "Guayabal",
+)
+NOMBRES = ("Juan", "Carlos", "Andrés", "Luis", "Jorge", "Diana", "Paula", "Sandra", "Camilo", "Felipe", "Marta", "Óscar")
+APELLIDOS = ("Gómez", "Restrepo", "Zapata", "Álvarez", "Muñoz", "Ospina", "Londoño", "Castaño", "Arango", "Mejía")
+LETRAS = "ABCDEFGHJKLMNPRSTUVWXYZ"
+PRIMERA_HORA = 5
+HORAS_SERVICIO = 17
+MAX_TURNOS = 4
+LAT, LNG = 6.2442, -75.5812
+DOMINIO = "sintetico.ludial.co"
+PASSWORD = "sintetico"
+
+@dataclass
+class Escala:
+    trayectos: int = 100_000
+    conductores: Optional[int] = None  # por defecto: los necesarios para `turnos` trayectos por día
+    vehiculos: Optional[int] = None  # por defecto: uno por conductor
+    rutas: int = 40
+    turnos: int = 4  # trayectos por conductor por día
+    anios: float = 3.0
+    dias_futuros: int = 7
+    estados: Dict[str, float] = field(default_factory=lambda: dict(ESTADOS_POR_DEFECTO))
+    prob_novedad: float = 0.04
+    lote: int = 20_000
+    semilla: int = 1
+    ahora: datetime = field(default_factory=lambda: datetime.now(timezone.utc).replace(microsecond=0))
+
+    @property
+    def dias(self) -> int:
+        return max(int(self.anios * 365), 1) + self.dias_futuros
+
+    @property
+    def por_dia(self) -> int:
+        return -(-self.trayectos // self.dias)
+
+    def completar(self):
+        if not 1 <= self.turnos <= MAX_TURNOS:
+            # Con más turnos la franja es más corta que el trayecto más largo y se cruzarían
+            raise ValueError(f"turnos debe estar entre 1 y {MAX_TURNOS}")
+        if self.conductores is None:
+            self.conductores = max(-(-self.por_dia // self.turnos), 1)
+        if self.vehiculos is None:
+            self.vehiculos = self.conductores
+        if self.por_dia > self.conductores * self.turnos:
+            raise ValueError(f"{self.conductores} conductores con {self.turnos} turnos no alcanzan "
+                             f"para {self.por_dia} trayectos por día")
+        return self
+
+def leer_estados(texto: str) -> Dict[str, float]:
+    """'COMPLETADO=0.9,CANCELADO=0.1' → {"COMPLETADO": 0.9, "CANCELADO": 0.1}"""
+    from app.models.journey import EstadoTrayecto
+
+    estados = {}
+    for parte in texto.split(","):
+        nombre, _, peso = parte.partition("=")
+        nombre = nombre.strip().upper()
+        if nombre not in EstadoTrayecto.__members__:
+            raise argparse.ArgumentTypeError(f"Estado desconocido: {nombre}")
+        estados[nombre] = float(peso)
+    return estados
+
+def placa(indice: int) -> str:
+    """Placa única por índice: tres letras y tres dígitos"""
+    numero, letras = indice % 1000, indice // 1000
+    texto = ""
+    for _ in range(3):
+        letras, resto = divmod(letras, len(LETRAS))
+        texto = LETRAS[resto] + texto
+    return f"{texto}{numero:03d}"
+
+def generar_rutas(escala: Escala, azar: random.Random) -> List[dict]:
+    rutas = []
+    for i in range(escala.rutas):
+        origen, destino = azar.sample(BARRIOS, 2)
+        distancia = round(azar.uniform(4, 35), 1)
+        rutas.append({
+            "id": i + 1, "nombre": f"Ruta {i + 1} {origen} - {destino}", "origen": origen, "destino": destino,
+            "distancia": distancia, "tiempo_estimado": int(distancia * azar.uniform(2.5, 3.5)) + 10, "activa": True,
+            # Sin trazado ni geocercas
+            **dict.fromkeys(("geometria", "origen_lat", "origen_lng", "destino_lat", "destino_lng", "radio_geocerca")),
+        })
+    return rutas
+
+def generar_usuarios(escala: Escala, azar: random.Random) -> Iterator[dict]:
+    from app.routers.auth import get_password_hash
+
+    # Un solo hash para todos: bcrypt por usuario tomaría horas
+    clave = get_password_hash(PASSWORD)
+    fijos = [("admin", "administrador"), ("operador", "operador"), ("supervisor", "supervisor")]
+    for i, (nombre, rol) in enumerate(fijos):
+        yield {"id": i + 1, "username": f"{nombre}_sintetico", "email": f"{nombre}@{DOMINIO}",
+               "nombre_completo": f"{nombre.capitalize()} sintético", "hashed_password": clave, "rol": rol, "activo": True}
+    for i in range(escala.conductores):
+        yield {"id": len(fijos) + i + 1, "username": f"conductor{i}", "email": f"conductor{i}@{DOMINIO}",
+               "nombre_completo": f"{azar.choice(NOMBRES)} {azar.choice(APELLIDOS)} {azar.choice(APELLIDOS)}",
+               "hashed_password": clave, "rol": "conductor", "activo": azar.random() > 0.02}
+
+def primer_conductor() -> int:
+    return 4  # después de los tres usuarios fijos
+
+def generar_vehiculos(escala: Escala, azar: random.Random) -> Iterator[dict]:
+    hoy = escala.ahora.date()
+    for i in range(escala.vehiculos):
+        yield {
+            "id": i + 1, "placa": placa(i), "modelo": azar.choice(("Buseta", "Bus", "Microbús", "Van")),
+            "capacidad": azar.choice((19, 25, 32, 40, 45)),
+            "soat_vencimiento": hoy + timedelta(days=azar.randint(-30, 365)),
+            "tecnomecanica_vencimiento": hoy + timedelta(days=azar.randint(-30, 365)),
+            "kit_vencimiento": hoy + timedelta(days=azar.randint(-30, 365)),
+            "pico_placa": None, "activo": azar.random() > 0.03,
+        }
+
+def generar_trayectos(escala: Escala, rutas: List[dict], azar: random.Random) -> Iterator[dict]:
+    """Trayectos en orden cronológico; cada conductor tiene un turno fijo por franja"""
+    from app.models.journey import EstadoTrayecto
+
+    estados = [EstadoTrayecto[nombre] for nombre in escala.estados]
+    acumulados = list(itertools.accumulate(escala.estados.values()))
+    franja = timedelta(hours=HORAS_SERVICIO / escala.turnos)
+    primer_dia = (escala.ahora - timedelta(days=escala.dias - escala.dias_futuros)).replace(
+        hour=PRIMERA_HORA, minute=0, second=0)
+    base_conductor = primer_conductor()
+    ahora = escala.ahora
+    # timedelta precalculados: el generador corre millones de veces
+    minutos = [timedelta(minutes=m) for m in range(max(r["tiempo_estimado"] for r in rutas) * 2)]
+    aleatorio = azar.random
+
+    for k in range(escala.trayectos):
+        dia, j = divmod(k, escala.por_dia)
+        turno, conductor = divmod(j, escala.conductores)
+        ruta = rutas[(k * 7 + conductor) % len(rutas)]
+        estimado = ruta["tiempo_estimado"]
+        inicio = primer_dia + timedelta(days=dia) + turno * franja + minutos[int(aleatorio() * 21)]
+        fila = {
+            "id": k + 1, "ruta_id": ruta["id"], "conductor_id": base_conductor + conductor,
+            "vehiculo_id": conductor % escala.vehiculos + 1, "inicio_programado": inicio,
+            "fin_programado": inicio + minutos[estimado], "fecha_salida": None, "fecha_llegada": None,
+            "cantidad_pasajeros": None, "duracion_minutos": None, "duracion_actual": None,
+            "salio_origen": False, "desviado_desde": None,
+        }
+        if inicio > ahora:
+            fila["estado"] = EstadoTrayecto.PROGRAMADO
+            yield fila
+            continue
+
+        salida = inicio + timedelta(minutes=int(aleatorio() * 21) - 5)
+        duracion = int(estimado * (0.8 + aleatorio() * 0.6))
+        if salida + minutos[duracion] > ahora:
+            fila.update(estado=EstadoTrayecto.EN_CURSO, fecha_salida=min(salida, ahora))
+            yield fila
+            continue
+
+        estado = azar.choices(estados, cum_weights=acumulados)[0]
+        fila["estado"] = estado
+        if estado == EstadoTrayecto.COMPLETADO:
+            fila.update(fecha_salida=salida, fecha_llegada=salida + minutos[duracion],
+                        duracion_minutos=duracion, cantidad_pasajeros=3 + int(aleatorio() * 43))
+        elif estado == EstadoTrayecto.CANCELADO:
+            parcial = 1 + int(aleatorio() * duracion)
+            fila.update(fecha_salida=salida, fecha_llegada=salida + minutos[parcial], duracion_minutos=parcial)
+        yield fila
+
+def generar_novedades(escala: Escala, trayectos: List[dict], contador: List[int], azar: random.Random) -> List[dict]:
+    from app.models.novedad import TipoNovedad
+
+    tipos = [TipoNovedad[nombre] for nombre in TIPOS_NOVEDAD]
+    pesos = list(TIPOS_NOVEDAD.values())
+    novedades = []
+    for trayecto in trayectos:
+        salida = trayecto["fecha_salida"]
+        if salida is None or azar.random() >= escala.prob_novedad:
+            continue
+        llegada = trayecto["fecha_llegada"] or escala.ahora
+        segundos = max(int((llegada - salida).total_seconds()), 1)
+        contador[0] += 1
+        novedades.append({
+            "id": contador[0], "trayecto_id": trayecto["id"], "conductor_id": trayecto["conductor_id"],
+            "tipo": azar.choices(tipos, pesos)[0], "notas": "Novedad sintética",
+            "fecha_reporte": salida + timedelta(seconds=azar.randint(0, segundos)),
+        })
+    return novedades
+
+def generar_ubicaciones(escala: Escala, en_curso: Dict[int, datetime], azar: random.Random) -> Iterator[dict]:
+    """Última posición de cada conductor; reciente para los que están en curso"""
+    for i in range(escala.conductores):
+        conductor_id = primer_conductor() + i
+        if conductor_id in en_curso:
+            momento = escala.ahora - timedelta(seconds=azar.randint(0, 30))
+        else:
+            momento = escala.ahora - timedelta(minutes=azar.randint(30, 60 * 24))
+        yield {"id": i + 1, "conductor_id": conductor_id, "lat": LAT + azar.uniform(-0.08, 0.08),
+               "lng": LNG + azar.uniform(-0.08, 0.08), "timestamp": momento}
+
+def _por_lotes(filas, tamano: int) -> Iterator[List[dict]]:
+    lote = []
+    for fila in filas:
+        lote.append(fila)
+        if len(lote) >= tamano:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+def _valor_sqlite(valor):
+    """Valor en el formato en que SQLAlchemy lo guarda en SQLite (fechas UTC sin zona, Enum por nombre)"""
+    if isinstance(valor, datetime):
+        return valor.astimezone(timezone.utc).replace(tzinfo=None).isoformat(" ", "microseconds")
+    if isinstance(valor, Enum):
+        return valor.name
+    if isinstance(valor, date):
+        return valor.isoformat()
+    return valor
+
+class Escritor:
+    """Escribe lotes con COPY (PostgreSQL/psycopg2), executemany directo (SQLite) o insert de SQLAlchemy"""
+
+    def __init__(self, engine: Engine):
+        from app.migrations.migrate_to_postgres import _copy_disponible
+        self.engine = engine
+        self.copy = _copy_disponible(engine)
+        self.sqlite = engine.dialect.name == "sqlite"
+        self.filas: Dict[str, int] = {}
+
+    def escribir(self, tabla: Table, filas: List[dict]):
+        from app.migrations.migrate_to_postgres import _copiar_lote
+
+        columnas = [c.name for c in tabla.columns]
+        with self.engine.begin() as conexion:
+            if self.copy:
+                _copiar_lote(conexion, tabla, list(tabla.columns), filas)
+            elif self.sqlite:
+                # Sin los procesadores de tipos de SQLAlchemy, que dominan el tiempo con millones de filas
+                sentencia = (f'INSERT INTO "{tabla.name}" ({", ".join(columnas)}) '
+                             f'VALUES ({", ".join("?" for _ in columnas)})')
+                conexion.exec_driver_sql(sentencia, [tuple(_valor_sqlite(f[c]) for c in columnas) for f in filas])
+            else:
+                conexion.execute(insert(tabla), filas)
+        self.filas[tabla.name] = self.filas.get(tabla.name, 0) + len(filas)
+
+def _acelerar_sqlite(engine: Engine):
+    """Sin fsync ni journal en disco: la base es desechable mientras se genera"""
+    @event.listens_for(engine, "connect")
+    def _pragmas(conexion_dbapi, _):
+        cursor = conexion_dbapi.cursor()
+        cursor.execute("PRAGMA synchronous=OFF")
+        cursor.execute("PRAGMA journal_mode=MEMORY")
+        cursor.close()
+
+def preparar_esquema(engine: Engine, reiniciar: bool):
+    from app.database import Base
+    # Registrar todos los modelos en Base.metadata, como create_schema
+    from app import models  # noqa: F401
+    from app.models.journey import Location  # noqa: F401
+    from app.models.vehicle import PicoYPlacaConfig  # noqa: F401
+
+    if reiniciar:
+        Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    with engine.connect() as conexion:
+        for nombre in ("usuarios", "vehiculos", "rutas", "trayectos", "novedades", "ubicaciones"):
+            if conexion.execute(select(func.count()).select_from(Base.metadata.tables[nombre])).scalar():
+                raise SystemExit(f"La tabla {nombre} ya tiene datos: use una base vacía o --reiniciar")
+
+def generar(engine: Engine, escala: Escala, reiniciar: bool = False) -> Dict[str, int]:
+    """Genera el conjunto completo en la base del engine; devuelve las filas por tabla"""
+    from app.database import Base
+    from app.migrations.migrate_to_postgres import reiniciar_secuencias
+    from app.models.journey import EstadoTrayecto
+
+    escala.completar()
+    preparar_esquema(engine, reiniciar)
+    tablas = Base.metadata.tables
+    azar = random.Random(escala.semilla)
+    escritor = Escritor(engine)
+    inicio = time.perf_counter()
+
+    rutas = generar_rutas(escala, azar)
+    escritor.escribir(tablas["rutas"], rutas)
+    for lote in _por_lotes(generar_usuarios(escala, azar), escala.lote):
+        escritor.escribir(tablas["usuarios"], lote)
+    for lote in _por_lotes(generar_vehiculos(escala, azar), escala.lote):
+        escritor.escribir(tablas["vehiculos"], lote)
+
+    # Los índices se construyen una vez al final, no fila por fila
+    indices = list(tablas["trayectos"].indexes) + list(tablas["novedades"].indexes)
+    for indice in indices:
+        indice.drop(engine)
+
+    en_curso: Dict[int, datetime] = {}
+    novedades_generadas = [0]
+    for numero, lote in enumerate(_por_lotes(generar_trayectos(escala, rutas, azar), escala.lote), 1):
+        escritor.escribir(tablas["trayectos"], lote)
+        novedades = generar_novedades(escala, lote, novedades_generadas, azar)
+        if novedades:
+            escritor.escribir(tablas["novedades"], novedades)
+        for fila in lote:
+            if fila["estado"] == EstadoTrayecto.EN_CURSO:
+                en_curso[fila["conductor_id"]] = fila["fecha_salida"]
+        if numero % 25 == 0:
+            hechos = escritor.filas["trayectos"]
+            logger.info(f"{hechos:,} / {escala.trayectos:,} trayectos ({hechos / (time.perf_counter() - inicio):,.0f}/s)")
+
+    for lote in _por_lotes(generar_ubicaciones(escala, en_curso, azar), escala.lote):
+        escritor.escribir(tablas["ubicaciones"], lote)
+
+    logger.info("Creando índices...")
+    for indice in indices:
+        indice.create(engine)
+    reiniciar_secuencias(engine, [tablas[n] for n in escritor.filas])
+    logger.info(f"Datos generados en {time.perf_counter() - inicio:.1f} s: {escritor.filas}")
+    return escritor.filas
+
+def crear_engine(url: str) -> Engine:
+    if url.startswith("postgres://"):
+        url = url.replace("postgres://", "postgresql://", 1)
+    engine = create_engine(url)
+    if engine.dialect.name == "sqlite":
+        _acelerar_sqlite(engine)
+    return engine
+
+def base_temporal(escala: Escala) -> str:
+    """Crea una base SQLite temporal con los datos de la escala y devuelve su URL"""
+    directorio = tempfile.mkdtemp(prefix="ludial_sintetico_")
+    url = f"sqlite:///{os.path.join(directorio, 'sintetico.db')}"
+    engine = crear_engine(url)
+    try:
+        generar(engine, escala)
+    finally:
+        engine.dispose()
+    return url
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Genera datos sintéticos con varios años de historia")
+    parser.add_argument("--database-url", required=True, help="base de destino (vacía, o usar --reiniciar)")
+    parser.add_argument("--reiniciar", action="store_true", help="borra y recrea todas las tablas antes de generar")
+    parser.add_argument("--trayectos", type=int, default=Escala.trayectos)
+    parser.add_argument("--conductores", type=int)
+    parser.add_argument("--vehiculos", type=int)
+    parser.add_argument("--rutas", type=int, default=Escala.rutas)
+    parser.add_argument("--turnos", type=int, default=Escala.turnos, help="trayectos por conductor por día")
+    parser.add_argument("--anios", type=float, default=Escala.anios, help="años de historia hacia atrás")
+    parser.add_argument("--dias-futuros", type=int, default=Escala.dias_futuros, help="días programados hacia adelante")
+    parser.add_argument("--estados", type=leer_estados, default=dict(ESTADOS_POR_DEFECTO),
+                        help="pesos de los estados de los trayectos pasados, p. ej. COMPLETADO=0.9,CANCELADO=0.1")
+    parser.add_argument("--prob-novedad", type=float, default=Escala.prob_novedad)
+    parser.add_argument("--lote", type=int, default=Escala.lote)
+    parser.add_argument("--semilla", type=int, default=Escala.semilla)
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    escala = Escala(
+        trayectos=args.trayectos, conductores=args.conductores, vehiculos=args.vehiculos, rutas=args.rutas,
+        turnos=args.turnos, anios=args.anios, dias_futuros=args.dias_futuros, estados=args.estados,
+        prob_novedad=args.prob_novedad, lote=args.lote, semilla=args.semilla,
+    )
+    try:
+        escala.completar()
+    except ValueError as e:
+        parser.error(str(e))
+    generar(crear_engine(args.database_url), escala, args.reiniciar)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
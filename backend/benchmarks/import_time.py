@@ -0,0 +1,60 @@
+"""
+Presupuesto de tiempo de arranque en frío de la API.
+
+Importa `app.main` en un intérprete nuevo varias veces, toma la mediana y
+falla (exit 1) si supera el presupuesto o si la importación creó el engine
+de base de datos.
+
+Uso (desde backend/):
+    python -m benchmarks.import_time [--budget-ms 1500] [--runs 5]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = """
+import json, time
+inicio = time.perf_counter()
+import app.main
+transcurrido = (time.perf_counter() - inicio) * 1000
+import app.database as database
+print(json.dumps({"ms": transcurrido, "engine_creado": database._engine is not None}))
+"""
+
+def medir_importacion() -> dict:
+    salida = subprocess.run(
+        [sys.executable, "-c", PROBE],
+        cwd=BACKEND_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(salida.stdout.strip().splitlines()[-1])
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Mide el tiempo de importación de app.main")
+    parser.add_argument("--budget-ms", type=float, default=float(os.getenv("IMPORT_BUDGET_MS", "1500")))
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    mediciones = [medir_importacion() for _ in range(args.runs)]
+    tiempos = [m["ms"] for m in mediciones]
+    mediana = statistics.median(tiempos)
+    print(f"import app.main: mediana {mediana:.1f} ms, min {min(tiempos):.1f} ms, max {max(tiempos):.1f} ms "
+          f"(presupuesto {args.budget_ms:.0f} ms)")
+
+    if any(m["engine_creado"] for m in mediciones):
+        print("ERROR: importar app.main creó el engine de base de datos")
+        return 1
+    if mediana > args.budget_ms:
+        print("ERROR: el arranque en frío supera el presupuesto")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,244 @@
+"""
+Micro-benchmarks de los caminos calientes con líneas base y comparación.
+
+Para cada tamaño de historia (`--tamanos`, en trayectos) genera una base con
+`datos_sinteticos` y, en un proceso aparte, mide contra la app en proceso
+(TestClient, sin red):
+
+- prepare_journey_response: 20 trayectos recientes, llamada directa
+- listar_trayectos:         GET /trayectos
+- obtener_ubicaciones:      GET /trayectos/ubicaciones
+- obtener_novedades:        GET /novedades/
+- get_current_user:         dependencia directa con un token de administrador
+- crear_trayectos_bulk:     POST /trayectos/bulk con 50 trayectos futuros
+
+De cada camino guarda la mediana en ms, las consultas SQL por llamada (del
+Server-Timing de utils/query_stats.py o de `contar_consultas`) y el
+exponente de crecimiento entre el tamaño menor y el mayor (≈0 constante,
+≈1 lineal, ≥2 cuadrático).
+
+Uso (desde backend/):
+    python -m benchmarks.micro correr --guardar lineas_base.json
+    python -m benchmarks.micro correr --comparar lineas_base.json [--umbral 0.25]
+    python -m benchmarks.micro comparar actual.json lineas_base.json
+
+`comparar` sale con código 1 si algún camino es más lento que la línea base
+por encima del umbral, hace más consultas (típico de un N+1) o su exponente
+de crecimiento sube más de `--umbral-exponente` (típico de un O(n²)). Las
+líneas base dependen de la máquina: genérelas en la misma donde se compara.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import re
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, Optional
+
+DIRECTORIO_BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TAMANOS = (1_000, 10_000, 50_000)
+_CONSULTAS = re.compile(r'desc="(\d+) consultas"')
+
+def _consultas_respuesta(respuesta) -> Optional[int]:
+    if respuesta.status_code >= 400:
+        raise RuntimeError(f"{respuesta.request.method} {respuesta.request.url}: {respuesta.status_code} {respuesta.text[:200]}")
+    coincidencia = _CONSULTAS.search(respuesta.headers.get("server-timing", ""))
+    return int(coincidencia.group(1)) if coincidencia else None
+
+def caminos(cliente, token: str) -> Dict[str, Callable[[int], Optional[int]]]:
+    """Cada camino recibe el número de repetición y devuelve las consultas SQL que hizo"""
+    from app.database import SessionLocal
+    from app.models import Journey, User
+    from app.routers.auth import get_current_user
+    from app.routers.journeys import prepare_journey_response
+    from app.utils.query_stats import contar_consultas
+
+    db = SessionLocal()
+    bucle = asyncio.new_event_loop()
+    recientes = db.query(Journey).order_by(Journey.id.desc()).limit(20).all()
+    conductores = [u.id for u in db.query(User.id).filter(User.rol == "conductor").all()]
+    ruta_id = recientes[0].ruta_id
+    db.expunge_all()
+
+    def preparar(_):
+        with contar_consultas() as estadisticas:
+            for trayecto in recientes:
+                prepare_journey_response(db.merge(trayecto, load=False), db)
+        return estadisticas.consultas
+
+    def usuario_actual(_):
+        with contar_consultas() as estadisticas:
+            bucle.run_until_complete(get_current_user(token, db))
+        return estadisticas.consultas
+
+    def bulk(repeticion):
+        # Lejos en el futuro y en franjas de 3 h: nunca se cruzan con la historia ni entre sí
+        base = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0) + timedelta(days=400 + 20 * repeticion)
+        lote = [
+            {"conductor_id": conductores[i % len(conductores)], "vehiculo_id": i % len(conductores) + 1,
+             "ruta_id": ruta_id, "inicio_programado": (base + timedelta(hours=3 * i)).isoformat()}
+            for i in range(50)
+        ]
+        return _consultas_respuesta(cliente.post("/trayectos/bulk", json=lote))
+
+    return {
+        "prepare_journey_response": preparar,
+        "listar_trayectos": lambda _: _consultas_respuesta(cliente.get("/trayectos")),
+        "obtener_ubicaciones": lambda _: _consultas_respuesta(cliente.get("/trayectos/ubicaciones")),
+        "obtener_novedades": lambda _: _consultas_respuesta(cliente.get("/novedades/")),
+        "get_current_user": usuario_actual,
+        "crear_trayectos_bulk": bulk,
+    }
+
+def medir_tamano(repeticiones: int) -> Dict[str, dict]:
+    """Mide todos los caminos contra la base de DATABASE_URL (se ejecuta en su propio proceso)"""
+    import logging
+    from fastapi.testclient import TestClient
+    from app.main import app
+    from benchmarks.datos_sinteticos import DOMINIO, PASSWORD
+
+    logging.disable(logging.WARNING)
+    cliente = TestClient(app)
+    token = cliente.post("/auth/token", data={"username": f"admin@{DOMINIO}", "password": PASSWORD}).json()["access_token"]
+    cliente.headers["Authorization"] = f"Bearer {token}"
+
+    resultados = {}
+    for nombre, camino in caminos(cliente, token).items():
+        camino(-1)  # calentamiento
+        tiempos, consultas = [], None
+        for repeticion in range(repeticiones):
+            inicio = time.perf_counter()
+            consultas = camino(repeticion)
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+        resultados[nombre] = {"ms": round(statistics.median(tiempos), 3), "consultas": consultas}
+    return resultados
+
+def exponente(por_tamano: Dict[str, dict]) -> Optional[float]:
+    """Pendiente log-log del tiempo entre el tamaño menor y el mayor"""
+    tamanos = sorted(int(t) for t in por_tamano)
+    if len(tamanos) < 2:
+        return None
+    menor, mayor = por_tamano[str(tamanos[0])]["ms"], por_tamano[str(tamanos[-1])]["ms"]
+    if menor <= 0 or mayor <= 0:
+        return None
+    return round(math.log(mayor / menor) / math.log(tamanos[-1] / tamanos[0]), 2)
+
+def correr(tamanos: List[int], repeticiones: int) -> dict:
+    from benchmarks.datos_sinteticos import Escala, base_temporal
+
+    caminos_medidos: Dict[str, dict] = {}
+    for tamano in tamanos:
+        print(f"Generando {tamano:,} trayectos...", flush=True)
+        url = base_temporal(Escala(trayectos=tamano))
+        salida = subprocess.run(
+            [sys.executable, "-m", "benchmarks.micro", "_medir", "--repeticiones", str(repeticiones)],
+            cwd=DIRECTORIO_BACKEND, env=dict(os.environ, DATABASE_URL=url),
+            capture_output=True, text=True,
+        )
+        if salida.returncode != 0:
+            raise SystemExit(f"Falló la medición con {tamano} trayectos:\n{salida.stderr[-3000:]}")
+        for nombre, medicion in json.loads(salida.stdout.strip().splitlines()[-1]).items():
+            caminos_medidos.setdefault(nombre, {"por_tamano": {}})["por_tamano"][str(tamano)] = medicion
+
+    for medicion in caminos_medidos.values():
+        medicion["exponente"] = exponente(medicion["por_tamano"])
+    return {
+        "generado_en": datetime.now(timezone.utc).isoformat(),
+        "maquina": f"{platform.node()} {platform.machine()} Python {platform.python_version()}",
+        "repeticiones": repeticiones,
+        "caminos": caminos_medidos,
+    }
+
+def imprimir(resultado: dict):
+    print(f"{'camino':<28}{'tamaño':>9}{'ms':>11}{'consultas':>11}{'exponente':>11}")
+    for nombre, medicion in resultado["caminos"].items():
+        for tamano, valores in medicion["por_tamano"].items():
+            consultas = "-" if valores["consultas"] is None else valores["consultas"]
+            print(f"{nombre:<28}{int(tamano):>9,}{valores['ms']:>11.2f}{consultas:>11}"
+                  f"{'' if medicion['exponente'] is None else medicion['exponente']:>11}")
+
+def comparar(actual: dict, base: dict, umbral: float, umbral_exponente: float, minimo_ms: float) -> List[str]:
+    """Regresiones del resultado actual frente a la línea base"""
+    regresiones = []
+    for nombre, medicion in actual["caminos"].items():
+        referencia = base["caminos"].get(nombre)
+        if referencia is None:
+            continue
+        for tamano, valores in medicion["por_tamano"].items():
+            previo = referencia["por_tamano"].get(tamano)
+            if previo is None:
+                continue
+            # Diferencias de décimas de ms son ruido, no regresiones
+            if valores["ms"] > previo["ms"] * (1 + umbral) and valores["ms"] - previo["ms"] > minimo_ms:
+                regresiones.append(f"{nombre} ({tamano}): {previo['ms']:.2f} → {valores['ms']:.2f} ms "
+                                   f"(+{(valores['ms'] / previo['ms'] - 1) * 100:.0f}%)")
+            if None not in (valores["consultas"], previo["consultas"]) and valores["consultas"] > previo["consultas"]:
+                regresiones.append(f"{nombre} ({tamano}): {previo['consultas']} → {valores['consultas']} consultas")
+        if None not in (medicion["exponente"], referencia["exponente"]) \
+                and medicion["exponente"] - referencia["exponente"] > umbral_exponente:
+            regresiones.append(f"{nombre}: crecimiento n^{referencia['exponente']} → n^{medicion['exponente']}")
+    return regresiones
+
+def _informar(regresiones: List[str]) -> int:
+    if not regresiones:
+        print("Sin regresiones frente a la línea base")
+        return 0
+    print("REGRESIONES:")
+    for regresion in regresiones:
+        print(f"  - {regresion}")
+    return 1
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Micro-benchmarks de los caminos calientes")
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    p_correr = sub.add_parser("correr", help="mide todos los caminos en cada tamaño")
+    p_correr.add_argument("--tamanos", default=",".join(str(t) for t in TAMANOS),
+                          type=lambda v: sorted(int(t) for t in v.split(",")))
+    p_correr.add_argument("--repeticiones", type=int, default=7)
+    p_correr.add_argument("--guardar", help="archivo JSON donde guardar el resultado (línea base)")
+    p_correr.add_argument("--comparar", help="línea base JSON contra la cual comparar")
+
+    p_comparar = sub.add_parser("comparar", help="compara dos resultados guardados")
+    p_comparar.add_argument("actual")
+    p_comparar.add_argument("base")
+
+    for p in (p_correr, p_comparar):
+        p.add_argument("--umbral", type=float, default=0.25, help="aumento de tiempo tolerado (0.25 = 25%%)")
+        p.add_argument("--umbral-exponente", type=float, default=0.3)
+        p.add_argument("--minimo-ms", type=float, default=0.5, help="diferencia mínima en ms para contar como regresión")
+
+    p_medir = sub.add_parser("_medir")
+    p_medir.add_argument("--repeticiones", type=int, default=7)
+    args = parser.parse_args(argv)
+
+    if args.comando == "_medir":
+        print(json.dumps(medir_tamano(args.repeticiones)))
+        return 0
+
+    if args.comando == "comparar":
+        with open(args.actual, encoding="utf-8") as a, open(args.base, encoding="utf-8") as b:
+            actual, base = json.load(a), json.load(b)
+        imprimir(actual)
+        return _informar(comparar(actual, base, args.umbral, args.umbral_exponente, args.minimo_ms))
+
+    resultado = correr(args.tamanos, args.repeticiones)
+    imprimir(resultado)
+    if args.guardar:
+        with open(args.guardar, "w", encoding="utf-8") as archivo:
+            json.dump(resultado, archivo, ensure_ascii=False, indent=2)
+        print(f"Resultado guardado en {args.guardar}")
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as archivo:
+            base = json.load(archivo)
+        return _informar(comparar(resultado, base, args.umbral, args.umbral_exponente, args.minimo_ms))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,143 @@
+"""
+Verifica que las consultas críticas usen índices (sin recorridos completos).
+
+Para cada sentencia de CONSULTAS obtiene el plan del motor:
+
+- SQLite: `EXPLAIN QUERY PLAN`; falla si alguna tabla aparece como
+  `SCAN <tabla>` sin índice.
+- PostgreSQL: `EXPLAIN (FORMAT JSON)` con `enable_seqscan = off` (en tablas
+  pequeñas el planificador prefiere un Seq Scan aunque exista el índice; así
+  solo queda el Seq Scan cuando no hay índice utilizable); falla si aparece un
+  nodo `Seq Scan`.
+
+Las sentencias replican las de los endpoints: si cambia una consulta de la
+lista, actualícela aquí también.
+
+Uso (desde backend/):
+    python -m benchmarks.planes_consulta                   # SQLite temporal con el esquema de los modelos
+    python -m benchmarks.planes_consulta --database-url postgresql://.../ludial   # p. ej. tras alembic upgrade head
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+from datetime import datetime, time, timedelta, timezone
+from typing import Callable, Dict, List
+
+from sqlalchemy import event, func, select
+from sqlalchemy.engine import Connection, Engine
+
+def consultas() -> Dict[str, Callable]:
+    from app.models import Journey, Novedad, Route, User, Vehicle, EstadoTrayecto
+    from app.models.journey import Location
+
+    inicio_hoy = datetime.combine(datetime.now().date(), time.min, tzinfo=timezone.utc)
+    return {
+        # journeys.actualizar_ubicacion: trayecto activo del conductor
+        "trayecto_activo_del_conductor": select(Journey).where(
+            Journey.conductor_id == 1, Journey.estado == EstadoTrayecto.EN_CURSO
+        ).limit(1),
+        # dispatch / monitoreo: trayectos por estado
+        "trayectos_por_estado": select(Journey).where(Journey.estado == EstadoTrayecto.EN_CURSO),
+        # historial de un conductor
+        "trayectos_por_conductor": select(Journey).where(Journey.conductor_id == 1).order_by(Journey.inicio_programado),
+        # journeys.obtener_ubicaciones: feed de posiciones en vivo
+        "feed_ubicaciones": select(
+            Location.conductor_id, Location.lat, Location.lng, Location.timestamp,
+            Vehicle.placa, User.nombre_completo, Route.nombre, Vehicle.id, Route.id
+        ).select_from(Location).join(
+            Journey, Location.conductor_id == Journey.conductor_id
+        ).join(Vehicle, Journey.vehiculo_id == Vehicle.id).join(
+            User, Journey.conductor_id == User.id
+        ).join(Route, Journey.ruta_id == Route.id).where(Journey.estado == EstadoTrayecto.EN_CURSO),
+        # novedades.obtener_estadisticas_novedades: novedades del día
+        "novedades_por_fecha": select(func.count(Novedad.id)).where(
+            Novedad.fecha_reporte >= inicio_hoy, Novedad.fecha_reporte < inicio_hoy + timedelta(days=1)
+        ),
+        # auth.get_current_user: usuario del token
+        "usuario_por_username": select(User).where(User.username == "admin").limit(1),
+    }
+
+class _Capturada(Exception):
+    pass
+
+def sql_compilado(conexion: Connection, consulta):
+    """SQL y parámetros tal como SQLAlchemy los enviaría al driver, sin ejecutarlos"""
+    capturas = []
+
+    def _capturar(conn, cursor, statement, parameters, context, executemany):
+        capturas.append((statement, parameters))
+        raise _Capturada()
+
+    event.listen(conexion, "before_cursor_execute", _capturar)
+    try:
+        conexion.execute(consulta)
+    except _Capturada:
+        pass
+    finally:
+        event.remove(conexion, "before_cursor_execute", _capturar)
+    return capturas[0]
+
+def recorridos_sqlite(conexion: Connection, sentencia: str, parametros) -> (List[str], List[str]):
+    filas = conexion.exec_driver_sql(f"EXPLAIN QUERY PLAN {sentencia}", parametros).fetchall()
+    plan = [fila[-1] for fila in filas]
+    completos = [
+        detalle for detalle in plan
+        if detalle.startswith("SCAN ") and " USING " not in detalle and "CONSTANT ROW" not in detalle
+    ]
+    return plan, completos
+
+def _nodos(plan: dict):
+    yield plan
+    for hijo in plan.get("Plans", []):
+        yield from _nodos(hijo)
+
+def recorridos_postgres(conexion: Connection, sentencia: str, parametros) -> (List[str], List[str]):
+    with conexion.begin():
+        conexion.exec_driver_sql("SET LOCAL enable_seqscan = off")
+        resultado = conexion.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {sentencia}", parametros).scalar()
+    raiz = (resultado if isinstance(resultado, list) else json.loads(resultado))[0]["Plan"]
+    plan = [f"{n['Node Type']} {n.get('Relation Name', '')} {n.get('Index Name', '')}".strip() for n in _nodos(raiz)]
+    completos = [f"Seq Scan {n.get('Relation Name')}" for n in _nodos(raiz) if n["Node Type"] == "Seq Scan"]
+    return plan, completos
+
+def verificar(engine: Engine, detallado: bool = False) -> List[str]:
+    """Nombres de las consultas con recorridos completos"""
+    recorridos = recorridos_postgres if engine.dialect.name == "postgresql" else recorridos_sqlite
+    fallidas = []
+    with engine.connect() as conexion:
+        for nombre, consulta in consultas().items():
+            sentencia, parametros = sql_compilado(conexion, consulta)
+            conexion.rollback()
+            plan, completos = recorridos(conexion, sentencia, parametros)
+            print(f"{'FALLA' if completos else 'ok':<6}{nombre}")
+            if completos or detallado:
+                for paso in plan:
+                    print(f"        {paso}")
+            if completos:
+                fallidas.append(nombre)
+    return fallidas
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Verifica que las consultas críticas usen índices")
+    parser.add_argument("--database-url", help="base a verificar; por defecto una SQLite temporal con el esquema de los modelos")
+    parser.add_argument("--detallado", action="store_true", help="imprime el plan de todas las consultas")
+    args = parser.parse_args(argv)
+
+    url = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='planes_'), 'planes.db')}"
+    os.environ["DATABASE_URL"] = url
+    from app.database import get_engine
+    from app.migrations.create_schema import create_schema
+
+    if args.database_url is None:
+        create_schema()
+    fallidas = verificar(get_engine(), args.detallado)
+    if fallidas:
+        print(f"{len(fallidas)} consulta(s) con recorrido completo: {', '.join(fallidas)}")
+        return 1
+    print("Todas las consultas críticas usan índices")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,129 @@
+"""
+Compara el listado de trayectos por el camino anterior y por el camino rápido.
+
+- anterior: `prepare_journey_response` por trayecto (4 consultas por fila) →
+  validación con `List[JourneyResponse]` → `jsonable_encoder` → `json.dumps`,
+  que es lo que hace FastAPI con un `response_model`.
+- rápido: `filas_trayectos` (2 consultas de proyección) → orjson.
+
+SQLite devuelve las fechas sin zona; la comparación se repite con las fechas
+de las filas convertidas a UTC con zona, como las devuelve PostgreSQL
+(timestamptz), para que el formato del sufijo ("Z") también quede cubierto.
+
+Crea una base SQLite temporal con datos sintéticos; no toca la de desarrollo.
+
+Uso (desde backend/):
+    python -m benchmarks.serializacion_trayectos [--trayectos 2000] [--repeticiones 5]
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+def preparar_base(trayectos: int):
+    """Apunta DATABASE_URL a una base temporal y la llena con datos sintéticos"""
+    directorio = tempfile.mkdtemp(prefix="bench_trayectos_")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(directorio, 'bench.db')}"
+
+    from sqlalchemy import insert
+    from app.database import SessionLocal, get_engine
+    from app.migrations.create_schema import create_schema
+    from app.models import User, Vehicle, Route, Journey, EstadoTrayecto, Novedad
+    from app.models.novedad import TipoNovedad
+
+    create_schema()
+    get_engine()
+    db = SessionLocal()
+    conductores = max(trayectos // 20, 1)
+    db.execute(insert(User), [
+        {"username": f"c{i}", "email": f"c{i}@bench.co", "nombre_completo": f"Conductor {i}",
+         "hashed_password": "x", "rol": "conductor", "activo": True}
+        for i in range(conductores)
+    ])
+    db.execute(insert(Vehicle), [
+        {"placa": f"BEN{i:03d}", "modelo": "bus", "capacidad": 40, "activo": True} for i in range(conductores)
+    ])
+    db.execute(insert(Route), [
+        {"nombre": f"Ruta {i}", "origen": "A", "destino": "B", "tiempo_estimado": 60, "activa": True} for i in range(20)
+    ])
+    inicio = datetime(2024, 1, 1, 6, tzinfo=timezone.utc)
+    db.execute(insert(Journey), [
+        {"conductor_id": i % conductores + 1, "vehiculo_id": i % conductores + 1, "ruta_id": i % 20 + 1,
+         "estado": EstadoTrayecto.COMPLETADO, "fecha_salida": inicio + timedelta(hours=i),
+         "fecha_llegada": inicio + timedelta(hours=i, minutes=55 + i % 20), "cantidad_pasajeros": 30}
+        for i in range(trayectos)
+    ])
+    db.execute(insert(Novedad), [
+        {"trayecto_id": i + 1, "conductor_id": i % conductores + 1, "tipo": TipoNovedad.TRAFICO, "notas": "demora"}
+        for i in range(0, trayectos, 10)
+    ])
+    db.commit()
+    db.close()
+
+def con_zona(fila: dict) -> dict:
+    """Fechas de la fila en UTC con zona, como las devuelve PostgreSQL"""
+    return {k: v.replace(tzinfo=timezone.utc) if isinstance(v, datetime) and v.tzinfo is None else v
+            for k, v in fila.items()}
+
+def camino_anterior(db, convertir=None) -> bytes:
+    from typing import List
+    from fastapi.encoders import jsonable_encoder
+    from pydantic import TypeAdapter
+    from app.models import Journey
+    from app.routers.journeys import JourneyResponse, prepare_journey_response
+
+    filas = [prepare_journey_response(t, db) for t in db.query(Journey).filter(Journey.vehiculo_id != None).all()]
+    if convertir:
+        filas = [convertir(f) for f in filas]
+    validadas = TypeAdapter(List[JourneyResponse]).validate_python(filas)
+    return json.dumps(jsonable_encoder(validadas), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def camino_rapido(db, convertir=None) -> bytes:
+    from app.routers.journeys import filas_trayectos
+    from app.utils.fast_json import dumps
+
+    filas = filas_trayectos(db)
+    return dumps([convertir(f) for f in filas] if convertir else filas)
+
+def medir(funcion, repeticiones: int):
+    from app.database import SessionLocal
+
+    tiempos = []
+    cuerpo = b""
+    for _ in range(repeticiones):
+        db = SessionLocal()
+        inicio = time.perf_counter()
+        cuerpo = funcion(db)
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+        db.close()
+    return statistics.median(tiempos), cuerpo
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark del listado de trayectos")
+    parser.add_argument("--trayectos", type=int, default=2000)
+    parser.add_argument("--repeticiones", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    preparar_base(args.trayectos)
+    anterior_ms, anterior = medir(camino_anterior, args.repeticiones)
+    rapido_ms, rapido = medir(camino_rapido, args.repeticiones)
+
+    if json.loads(anterior) != json.loads(rapido):
+        print("ERROR: los dos caminos no producen el mismo JSON")
+        return 1
+    _, anterior_zona = medir(lambda db: camino_anterior(db, con_zona), 1)
+    _, rapido_zona = medir(lambda db: camino_rapido(db, con_zona), 1)
+    if json.loads(anterior_zona) != json.loads(rapido_zona):
+        print("ERROR: con fechas con zona los dos caminos no producen el mismo JSON")
+        return 1
+    print(f"{args.trayectos} trayectos ({len(rapido) / 1024:.0f} KiB)")
+    print(f"  prepare_journey_response → JourneyResponse: {anterior_ms:8.1f} ms")
+    print(f"  filas_trayectos → orjson:                   {rapido_ms:8.1f} ms  ({anterior_ms / rapido_ms:.1f}x)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
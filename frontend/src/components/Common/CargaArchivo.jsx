@@ -0,0 +1,99 @@
+import React, { useCallback, useEffect, useRef, useState } from 'react';
+import { Alert, Box, LinearProgress, Typography } from '@mui/material';
+import { api } from '../../services/api';
+import ResultadoImportacion from './ResultadoImportacion';
+
+const INTERVALO_CONSULTA_MS = 1000;
+const TERMINADAS = ['COMPLETADA', 'FALLIDA'];
+
+export const esArchivoCarga = (archivo) => /\.(csv|xlsx)$/i.test(archivo?.name || '');
+
+// Sube un CSV/XLSX a POST /{entidad}/carga y consulta GET /cargas/{id} hasta que termina
+export const useCargaArchivo = (entidad, onTerminada) => {
+  const [carga, setCarga] = useState(null);
+  const [error, setError] = useState(null);
+  const temporizador = useRef(null);
+  const alTerminar = useRef(onTerminada);
+  alTerminar.current = onTerminada;
+
+  const detener = useCallback(() => {
+    clearTimeout(temporizador.current);
+    temporizador.current = null;
+  }, []);
+
+  useEffect(() => detener, [detener]);
+
+  const consultar = useCallback(async (id) => {
+    try {
+      const { data } = await api.getCarga(id);
+      setCarga(data);
+      if (TERMINADAS.includes(data.estado)) {
+        if (alTerminar.current) alTerminar.current(data);
+        return;
+      }
+      temporizador.current = setTimeout(() => consultar(id), INTERVALO_CONSULTA_MS);
+    } catch (e) {
+      setError('No se pudo consultar el avance de la carga: ' + (e.response?.data?.detail || e.message));
+    }
+  }, []);
+
+  const subir = useCallback(async (archivo, politica) => {
+    detener();
+    setError(null);
+    setCarga(null);
+    try {
+      const { data } = await api.subirCarga(entidad, archivo, politica);
+      setCarga(data);
+      temporizador.current = setTimeout(() => consultar(data.id), INTERVALO_CONSULTA_MS);
+    } catch (e) {
+      setError('Error al subir el archivo: ' + (e.response?.data?.detail || 'Error desconocido'));
+    }
+  }, [entidad, consultar, detener]);
+
+  const reiniciar = useCallback(() => {
+    detener();
+    setCarga(null);
+    setError(null);
+  }, [detener]);
+
+  return { carga, error, subir, reiniciar, enCurso: Boolean(carga) && !TERMINADAS.includes(carga.estado) };
+};
+
+// Avance de una carga en segundo plano y, al terminar, su resultado por fila
+const ProgresoCarga = ({ carga, error }) => {
+  if (error) {
+    return <Alert severity="error" sx={{ mt: 2 }}>{error}</Alert>;
+  }
+  if (!carga) return null;
+
+  if (!TERMINADAS.includes(carga.estado)) {
+    return (
+      <Box sx={{ mt: 2, textAlign: 'left' }}>
+        <LinearProgress
+          variant={carga.porcentaje != null ? 'determinate' : 'indeterminate'}
+          value={carga.porcentaje || 0}
+        />
+        <Typography variant="body2" color="text.secondary" sx={{ mt: 1 }}>
+          {carga.estado === 'PENDIENTE' ? 'En cola' : 'Procesando'}: {carga.filas_procesadas} filas
+          {carga.porcentaje != null && ` (${carga.porcentaje}%)`}
+        </Typography>
+      </Box>
+    );
+  }
+
+  return (
+    <>
+      {carga.estado === 'FALLIDA' && (
+        <Alert severity="error" sx={{ mt: 2 }}>
+          La carga falló tras procesar {carga.filas_procesadas} filas: {carga.mensaje || 'Error desconocido'}
+        </Alert>
+      )}
+      <ResultadoImportacion
+        resultado={{ ...carga, total: carga.filas_procesadas }}
+        filas={carga.errores_detalle || []}
+      />
+    </>
+  );
+};
+
+export default ProgresoCarga;
@@ -0,0 +1,65 @@
+import React from 'react';
+import {
+  Alert,
+  Box,
+  Chip,
+  Table,
+  TableBody,
+  TableCell,
+  TableContainer,
+  TableHead,
+  TableRow,
+  Typography
+} from '@mui/material';
+
+const COLORES_ESTADO = { error: 'error', omitido: 'warning' };
+
+// Resumen de una importación masiva (POST /{entidad}/bulk o GET /cargas/{id})
+// con el detalle de las filas que no se guardaron
+const ResultadoImportacion = ({ resultado, filas = [] }) => {
+  if (!resultado) return null;
+  const { total, creados = 0, actualizados = 0, omitidos = 0, errores = 0 } = resultado;
+  const problemas = filas.filter(f => f.estado === 'error' || f.estado === 'omitido');
+
+  return (
+    <Box sx={{ mt: 2, textAlign: 'left' }}>
+      <Alert severity={errores ? 'error' : omitidos ? 'warning' : 'success'}>
+        {total !== undefined && `${total} filas: `}
+        {creados} creadas, {actualizados} actualizadas, {omitidos} omitidas, {errores} con error
+      </Alert>
+      {problemas.length > 0 && (
+        <TableContainer sx={{ maxHeight: 240, mt: 1 }}>
+          <Table size="small" stickyHeader>
+            <TableHead>
+              <TableRow>
+                <TableCell>Fila</TableCell>
+                <TableCell>Estado</TableCell>
+                <TableCell>Clave</TableCell>
+                <TableCell>Detalle</TableCell>
+              </TableRow>
+            </TableHead>
+            <TableBody>
+              {problemas.map(f => (
+                <TableRow key={`${f.fila}-${f.estado}`}>
+                  <TableCell>{f.fila}</TableCell>
+                  <TableCell>
+                    <Chip label={f.estado} color={COLORES_ESTADO[f.estado]} size="small" />
+                  </TableCell>
+                  <TableCell>{f.clave || '-'}</TableCell>
+                  <TableCell>{f.detalle || '-'}</TableCell>
+                </TableRow>
+              ))}
+            </TableBody>
+          </Table>
+        </TableContainer>
+      )}
+      {errores > problemas.filter(f => f.estado === 'error').length && (
+        <Typography variant="caption" color="text.secondary">
+          Solo se muestra el detalle de las primeras filas con error.
+        </Typography>
+      )}
+    </Box>
+  );
+};
+
+export default ResultadoImportacion;
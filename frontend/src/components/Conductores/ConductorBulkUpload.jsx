@@ -1,4 +1,4 @@
-import React, { useState } from 'react';
+import React, { useEffect, useState } from 'react';
 import {
   Dialog,
   DialogTitle,
@@ -12,9 +12,26 @@ import {
   Link
 } from '@mui/material';
 import { CloudUpload, Download } from '@mui/icons-material';
+import ResultadoImportacion from '../Common/ResultadoImportacion';
 
 const ConductorBulkUpload = ({ open, onClose, onUpload }) => {
   const [error, setError] = useState(null);
+  const [resultado, setResultado] = useState(null);
+
+  useEffect(() => {
+    if (open) {
+      setError(null);
+      setResultado(null);
+    }
+  }, [open]);
+
+  // onUpload devuelve el ResultadoImportacion; el diálogo queda abierto si hubo filas omitidas o con error
+  const enviar = async (registros) => {
+    setError(null);
+    setResultado(null);
+    const respuesta = await onUpload(registros);
+    if (respuesta) setResultado(respuesta);
+  };
 
   const handleFileUpload = (event) => {
     const file = event.target.files[0];
@@ -78,8 +95,7 @@ const ConductorBulkUpload = ({ open, onClose, onUpload }) => {
       return;
     }
 
-    onUpload(conductores);
-    setError(null);
+    enviar(conductores);
   };
 
   const processJsonFile = (content) => {
@@ -93,8 +109,7 @@ const ConductorBulkUpload = ({ open, onClose, onUpload }) => {
       return;
     }
 
-    onUpload(conductores);
-    setError(null);
+    enviar(conductores);
   };
 
   const validateConductores = (conductores) => {
@@ -205,6 +220,7 @@ const ConductorBulkUpload = ({ open, onClose, onUpload }) => {
                 {error}
               </Alert>
             )}
+            <ResultadoImportacion resultado={resultado} filas={resultado?.filas} />
           </Box>
         </Box>
       </DialogContent>
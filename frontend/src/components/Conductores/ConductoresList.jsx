@@ -98,9 +98,11 @@ const ConductoresList = () => {
 
   const handleBulkUpload = async (conductores) => {
     try {
-      await api.createConductoresBulk({ conductores });
-      setBulkUploadOpen(false);
+      const { data } = await api.createConductoresBulk({ conductores });
       loadConductores();
+      // Con filas omitidas o con error el diálogo queda abierto mostrando el reporte
+      if (!data?.omitidos && !data?.errores) setBulkUploadOpen(false);
+      return data;
     } catch (error) {
       console.error('Error al cargar conductores masivamente:', error);
       alert('Error al cargar conductores: ' + (error.response?.data?.detail || 'Error desconocido'));
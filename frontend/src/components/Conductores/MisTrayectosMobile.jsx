@@ -93,34 +93,68 @@ const MisTrayectosMobile = () => {
     .sort((a, b) => new Date(b.fecha_llegada) - new Date(a.fecha_llegada))
     .slice(0, 5);
 
-  // Enviar ubicación en tiempo real cuando hay trayecto en curso
+  // Eventos de las geocercas de la ruta que devuelve el backend con cada ubicación
+  const manejarEventosGeocerca = (eventos = []) => {
+    eventos.forEach((evento) => {
+      if (evento.tipo === 'desvio') {
+        setSnackbar({ open: true, message: 'Te saliste del recorrido de la ruta: se reportó una novedad', severity: 'warning' });
+      } else if (evento.tipo === 'regreso') {
+        setSnackbar({ open: true, message: 'De vuelta en el recorrido de la ruta', severity: 'success' });
+      } else if (evento.aplicado) {
+        const message = evento.tipo === 'inicio'
+          ? 'Trayecto iniciado al salir del origen'
+          : 'Trayecto finalizado al llegar al destino';
+        setSnackbar({ open: true, message, severity: 'success' });
+        fetchTrayectos();
+      } else if (evento.tipo === 'inicio') {
+        setSnackbar({ open: true, message: 'Saliste del origen: inicia el trayecto', severity: 'info' });
+      } else if (evento.tipo === 'llegada' || evento.tipo === 'fin') {
+        setSnackbar({ open: true, message: 'Llegaste al destino: finaliza el trayecto', severity: 'info' });
+      }
+    });
+  };
+
+  // Enviar ubicación en tiempo real cuando hay trayecto en curso o uno programado
+  // por empezar (el backend lo inicia al salir de la geocerca de origen)
   useEffect(() => {
     let watchId;
-    if (trayectoEnCurso) {
-      // Polling cada 10s
-      if (intervalRef.current) clearInterval(intervalRef.current);
-      intervalRef.current = setInterval(() => {
+    let cancelado = false;
+    if (trayectoEnCurso || proximoTrayecto) {
+      // Polling con el intervalo que recomienda el backend: más espaciado si el bus está detenido
+      if (intervalRef.current) clearTimeout(intervalRef.current);
+      const reportar = () => {
+        if (cancelado) return;
         if (navigator.geolocation) {
           navigator.geolocation.getCurrentPosition(
-            (pos) => {
+            async (pos) => {
               setGeoStatus('active');
               setGeoError('');
-              api.enviarUbicacion({
-                conductor_id: userId,
-                lat: pos.coords.latitude,
-                lng: pos.coords.longitude,
-              });
+              let siguiente = 10;
+              try {
+                const response = await api.enviarUbicacion({
+                  conductor_id: userId,
+                  lat: pos.coords.latitude,
+                  lng: pos.coords.longitude,
+                });
+                siguiente = response.data?.intervalo_recomendado_s || siguiente;
+                manejarEventosGeocerca(response.data?.eventos);
+              } catch (error) {
+                // Se reintenta con el intervalo por defecto
+              }
+              if (!cancelado) intervalRef.current = setTimeout(reportar, siguiente * 1000);
             },
             (err) => {
               setGeoStatus('denied');
               setGeoError('Debes permitir el acceso a la ubicación para ser monitoreado.');
+              if (!cancelado) intervalRef.current = setTimeout(reportar, 10000);
             }
           );
         } else {
           setGeoStatus('error');
           setGeoError('Tu dispositivo no soporta geolocalización.');
         }
-      }, 10000);
+      };
+      intervalRef.current = setTimeout(reportar, 10000);
       // Watcher
       if (geoWatcher) navigator.geolocation.clearWatch(geoWatcher);
       if (navigator.geolocation) {
@@ -132,7 +166,9 @@ const MisTrayectosMobile = () => {
               conductor_id: userId,
               lat: position.coords.latitude,
               lng: position.coords.longitude,
-            });
+            })
+              .then((response) => manejarEventosGeocerca(response.data?.eventos))
+              .catch(() => {});
           },
           (error) => {
             setGeoStatus('denied');
@@ -146,14 +182,15 @@ const MisTrayectosMobile = () => {
         setGeoError('Tu dispositivo no soporta geolocalización.');
       }
     } else {
-      if (intervalRef.current) clearInterval(intervalRef.current);
+      if (intervalRef.current) clearTimeout(intervalRef.current);
       if (geoWatcher) navigator.geolocation.clearWatch(geoWatcher);
     }
     return () => {
-      if (intervalRef.current) clearInterval(intervalRef.current);
+      cancelado = true;
+      if (intervalRef.current) clearTimeout(intervalRef.current);
       if (geoWatcher) navigator.geolocation.clearWatch(geoWatcher);
     };
-  }, [trayectoEnCurso, userId]);
+  }, [trayectoEnCurso, proximoTrayecto, userId]);
 
   // Acciones trayecto
   const handleIniciarTrayecto = async (id) => {
@@ -1,4 +1,4 @@
-import React, { useState } from 'react';
+import React, { useEffect, useState } from 'react';
 import {
   Dialog,
   DialogTitle,
@@ -11,25 +11,53 @@ import {
   Divider
 } from '@mui/material';
 import { CloudUpload, Download } from '@mui/icons-material';
+import ResultadoImportacion from '../Common/ResultadoImportacion';
+import ProgresoCarga, { esArchivoCarga, useCargaArchivo } from '../Common/CargaArchivo';
 
-const RutaBulkUpload = ({ open, onClose, onUpload }) => {
+const RutaBulkUpload = ({ open, onClose, onUpload, onCargaTerminada }) => {
   const [error, setError] = useState(null);
+  const [resultado, setResultado] = useState(null);
+  const { carga, error: errorCarga, subir, reiniciar, enCurso } = useCargaArchivo('rutas', onCargaTerminada);
+
+  useEffect(() => {
+    if (open) {
+      setError(null);
+      setResultado(null);
+      reiniciar();
+    }
+  }, [open, reiniciar]);
+
+  // onUpload devuelve el ResultadoImportacion; el diálogo queda abierto si hubo filas omitidas o con error
+  const enviar = async (registros) => {
+    setError(null);
+    setResultado(null);
+    const respuesta = await onUpload(registros);
+    if (respuesta) setResultado(respuesta);
+  };
 
   const handleFileUpload = (event) => {
     const file = event.target.files[0];
     if (!file) return;
+    event.target.value = '';
+    setError(null);
+    setResultado(null);
+
+    // CSV y XLSX se procesan en el servidor en segundo plano; JSON se envía a /bulk
+    if (esArchivoCarga(file)) {
+      subir(file);
+      return;
+    }
+    reiniciar();
 
     const fileExtension = file.name.split('.').pop().toLowerCase();
     const reader = new FileReader();
 
     reader.onload = (e) => {
       try {
-        if (fileExtension === 'csv') {
-          processCsvFile(e.target.result);
-        } else if (fileExtension === 'json') {
+        if (fileExtension === 'json') {
           processJsonFile(e.target.result);
         } else {
-          setError('Formato de archivo no soportado. Use CSV o JSON');
+          setError('Formato de archivo no soportado. Use CSV, XLSX o JSON');
         }
       } catch (error) {
         setError('Error al procesar el archivo. Verifique el formato');
@@ -39,46 +67,6 @@ const RutaBulkUpload = ({ open, onClose, onUpload }) => {
     reader.readAsText(file);
   };
 
-  const processCsvFile = (content) => {
-    const lines = content.split('\n');
-    if (lines.length < 2) {
-      setError('El archivo CSV está vacío o no tiene el formato correcto');
-      return;
-    }
-
-    const headers = lines[0].split(',').map(header => 
-      header.trim().replace(/["']/g, '')
-    );
-
-    const expectedHeaders = ['nombre', 'origen', 'destino', 'distancia', 'tiempo_estimado', 'activa'];
-    if (!expectedHeaders.every(header => headers.includes(header))) {
-      setError('El CSV debe tener las columnas: nombre, origen, destino, distancia, tiempo_estimado, activa');
-      return;
-    }
-
-    const rutas = lines
-      .slice(1)
-      .filter(line => line.trim())
-      .map(line => {
-        const values = line.split(',').map(value => value.trim().replace(/["']/g, ''));
-        return {
-          nombre: values[headers.indexOf('nombre')],
-          origen: values[headers.indexOf('origen')],
-          destino: values[headers.indexOf('destino')],
-          distancia: parseFloat(values[headers.indexOf('distancia')]) || null,
-          tiempo_estimado: parseInt(values[headers.indexOf('tiempo_estimado')]) || null,
-          activa: values[headers.indexOf('activa')] === 'false' ? false : true
-        };
-      });
-
-    if (!validateRutas(rutas)) {
-      return;
-    }
-
-    onUpload(rutas);
-    setError(null);
-  };
-
   const processJsonFile = (content) => {
     const rutas = JSON.parse(content);
     if (!Array.isArray(rutas)) {
@@ -90,8 +78,7 @@ const RutaBulkUpload = ({ open, onClose, onUpload }) => {
       return;
     }
 
-    onUpload(rutas);
-    setError(null);
+    enviar(rutas);
   };
 
   const validateRutas = (rutas) => {
@@ -186,16 +173,18 @@ const RutaBulkUpload = ({ open, onClose, onUpload }) => {
           </Typography>
           <Box sx={{ textAlign: 'center' }}>
             <input
-              accept=".csv,.json"
+              accept=".csv,.xlsx,.json"
               style={{ display: 'none' }}
               id="bulk-upload-file"
               type="file"
               onChange={handleFileUpload}
+              disabled={enCurso}
             />
             <label htmlFor="bulk-upload-file">
               <Button
                 variant="contained"
                 component="span"
+                disabled={enCurso}
                 startIcon={<CloudUpload />}
                 sx={{ mb: 2 }}
               >
@@ -203,13 +192,15 @@ const RutaBulkUpload = ({ open, onClose, onUpload }) => {
               </Button>
             </label>
             <Typography variant="body2" color="text.secondary">
-              Formatos aceptados: CSV y JSON
+              Formatos aceptados: CSV, XLSX y JSON
             </Typography>
             {error && (
               <Alert severity="error" sx={{ mt: 2 }}>
                 {error}
               </Alert>
             )}
+            <ResultadoImportacion resultado={resultado} filas={resultado?.filas} />
+            <ProgresoCarga carga={carga} error={errorCarga} />
           </Box>
         </Box>
       </DialogContent>
@@ -110,9 +110,11 @@ const RutasList = () => {
 
   const handleBulkUpload = async (rutas) => {
     try {
-      await api.createRutasBulk({ rutas });
-      setBulkUploadOpen(false);
+      const { data } = await api.createRutasBulk({ rutas });
       loadRutas();
+      // Con filas omitidas o con error el diálogo queda abierto mostrando el reporte
+      if (!data?.omitidos && !data?.errores) setBulkUploadOpen(false);
+      return data;
     } catch (error) {
       console.error('Error al cargar rutas masivamente:', error);
       alert('Error al cargar rutas: ' + (error.response?.data?.detail || 'Error desconocido'));
@@ -308,6 +310,7 @@ const RutasList = () => {
         open={bulkUploadOpen}
         onClose={() => setBulkUploadOpen(false)}
         onUpload={handleBulkUpload}
+        onCargaTerminada=loadRutas
       />
     </Box>
   );
@@ -1,28 +1,47 @@
-import React, { useState } from 'react';
+import React, { useEffect, useState } from 'react';
 import {
   Dialog, DialogTitle, DialogContent, DialogActions, Button, Typography, Box, Alert, Divider
 } from '@mui/material';
 import { CloudUpload, Download } from '@mui/icons-material';
-import Papa from 'papaparse';
 import { api } from '../../services/api';
+import ResultadoImportacion from '../Common/ResultadoImportacion';
+import ProgresoCarga, { esArchivoCarga, useCargaArchivo } from '../Common/CargaArchivo';
 
 const TrayectoBulkUpload = ({ open, onClose, onUploadSuccess }) => {
   const [error, setError] = useState(null);
   const [loading, setLoading] = useState(false);
+  const [resultado, setResultado] = useState(null);
+  const { carga, error: errorCarga, subir, reiniciar, enCurso } = useCargaArchivo('trayectos', onUploadSuccess);
+
+  useEffect(() => {
+    if (open) {
+      setError(null);
+      setResultado(null);
+      reiniciar();
+    }
+  }, [open, reiniciar]);
 
   const handleFileUpload = (event) => {
     const file = event.target.files[0];
     if (!file) return;
+    event.target.value = '';
+    setError(null);
+    setResultado(null);
+
+    // CSV y XLSX se procesan en el servidor en segundo plano; JSON se envía a /bulk
+    if (esArchivoCarga(file)) {
+      subir(file);
+      return;
+    }
+    reiniciar();
     const fileExtension = file.name.split('.').pop().toLowerCase();
     const reader = new FileReader();
     reader.onload = (e) => {
       try {
-        if (fileExtension === 'csv') {
-          processCsvFile(e.target.result);
-        } else if (fileExtension === 'json') {
+        if (fileExtension === 'json') {
           processJsonFile(e.target.result);
         } else {
-          setError('Formato de archivo no soportado. Use CSV o JSON');
+          setError('Formato de archivo no soportado. Use CSV, XLSX o JSON');
         }
       } catch (error) {
         setError('Error al procesar el archivo. Verifique el formato');
@@ -31,23 +50,6 @@ const TrayectoBulkUpload = ({ open, onClose, onUploadSuccess }) => {
     reader.readAsText(file);
   };
 
-  const processCsvFile = (content) => {
-    Papa.parse(content, {
-      header: true,
-      skipEmptyLines: true,
-      complete: (results) => {
-        const trayectos = results.data.map(row => ({
-          conductor_id: parseInt(row.conductor_id),
-          vehiculo_id: parseInt(row.vehiculo_id),
-          ruta_id: parseInt(row.ruta_id)
-        }));
-        if (!validateTrayectos(trayectos)) return;
-        uploadTrayectos(trayectos);
-      },
-      error: () => setError('Error al parsear el archivo CSV')
-    });
-  };
-
   const processJsonFile = (content) => {
     try {
       const trayectos = JSON.parse(content);
@@ -64,10 +66,10 @@ const TrayectoBulkUpload = ({ open, onClose, onUploadSuccess }) => {
 
   const validateTrayectos = (trayectos) => {
     const isValid = trayectos.every(t =>
-      t.conductor_id && t.vehiculo_id && t.ruta_id
+      t.conductor_id && t.vehiculo_id && t.ruta_id && t.inicio_programado
     );
     if (!isValid) {
-      setError('Todos los trayectos deben tener conductor_id, vehiculo_id y ruta_id (números válidos)');
+      setError('Todos los trayectos deben tener conductor_id, vehiculo_id, ruta_id (números válidos) e inicio_programado');
       return false;
     }
     return true;
@@ -77,8 +79,12 @@ const TrayectoBulkUpload = ({ open, onClose, onUploadSuccess }) => {
     setLoading(true);
     setError(null);
     try {
-      await api.createTrayectosBulk(trayectos);
+      const { data } = await api.createTrayectosBulk(trayectos);
       if (onUploadSuccess) onUploadSuccess();
+      if (data?.errores || data?.omitidos) {
+        setResultado(data);
+        return;
+      }
       onClose();
     } catch (e) {
       setError('Error al cargar los trayectos: ' + (e.response?.data?.detail || 'Error desconocido'));
@@ -90,13 +96,13 @@ const TrayectoBulkUpload = ({ open, onClose, onUploadSuccess }) => {
   const downloadTemplate = (format) => {
     let content, filename, type;
     if (format === 'csv') {
-      content = 'conductor_id,vehiculo_id,ruta_id\n1,2,3\n2,3,1';
+      content = 'conductor_id,vehiculo_id,ruta_id,inicio_programado,fin_programado\n1,2,3,2025-01-15T06:00,\n2,3,1,2025-01-15T07:30,2025-01-15T09:00';
       filename = 'plantilla_trayectos.csv';
       type = 'text/csv';
     } else {
       content = JSON.stringify([
-        { conductor_id: 1, vehiculo_id: 2, ruta_id: 3 },
-        { conductor_id: 2, vehiculo_id: 3, ruta_id: 1 }
+        { conductor_id: 1, vehiculo_id: 2, ruta_id: 3, inicio_programado: '2025-01-15T06:00' },
+        { conductor_id: 2, vehiculo_id: 3, ruta_id: 1, inicio_programado: '2025-01-15T07:30', fin_programado: '2025-01-15T09:00' }
       ], null, 2);
       filename = 'plantilla_trayectos.json';
       type = 'application/json';
@@ -142,12 +148,12 @@ const TrayectoBulkUpload = ({ open, onClose, onUploadSuccess }) => {
           </Typography>
           <Box sx={{ textAlign: 'center' }}>
             <input
-              accept=".csv,.json"
+              accept=".csv,.xlsx,.json"
               style={{ display: 'none' }}
               id="bulk-upload-trayecto-file"
               type="file"
               onChange={handleFileUpload}
-              disabled={loading}
+              disabled={loading || enCurso}
             />
             <label htmlFor="bulk-upload-trayecto-file">
               <Button
@@ -155,19 +161,21 @@ const TrayectoBulkUpload = ({ open, onClose, onUploadSuccess }) => {
                 component="span"
                 startIcon={<CloudUpload />}
                 sx={{ mb: 2 }}
-                disabled={loading}
+                disabled={loading || enCurso}
               >
                 Seleccionar Archivo
               </Button>
             </label>
             <Typography variant="body2" color="text.secondary">
-              Formatos aceptados: CSV y JSON
+              Formatos aceptados: CSV, XLSX y JSON
             </Typography>
             {error && (
               <Alert severity="error" sx={{ mt: 2 }}>
                 {error}
               </Alert>
             )}
+            <ResultadoImportacion resultado={resultado} filas={resultado?.filas} />
+            <ProgresoCarga carga={carga} error={errorCarga} />
           </Box>
         </Box>
       </DialogContent>
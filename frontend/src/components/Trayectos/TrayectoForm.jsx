@@ -12,6 +12,11 @@ import {
 } from '@mui/material';
 import { api } from '../../services/api';
 
+// Hora de la operación para <input type="datetime-local">; el backend interpreta la hora sin zona en America/Bogota
+const aHoraLocal = (iso) => (
+  iso ? new Date(iso).toLocaleString('sv-SE', { timeZone: 'America/Bogota' }).slice(0, 16).replace(' ', 'T') : ''
+);
+
 const TrayectoForm = ({ open, onClose, onSubmit, editMode = false, initialData = null }) => {
   const userRole = localStorage.getItem('role');
   const [loading, setLoading] = useState(true);
@@ -22,6 +27,7 @@ const TrayectoForm = ({ open, onClose, onSubmit, editMode = false, initialData =
     ruta_id: '',
     conductor_id: '',
     vehiculo_id: '',
+    inicio_programado: '',
   });
 
   useEffect(() => {
@@ -56,9 +62,10 @@ const TrayectoForm = ({ open, onClose, onSubmit, editMode = false, initialData =
         ruta_id: initialData.ruta_id,
         conductor_id: initialData.conductor_id,
         vehiculo_id: initialData.vehiculo_id,
+        inicio_programado: aHoraLocal(initialData.inicio_programado),
       });
     } else {
-      setFormData({ ruta_id: '', conductor_id: '', vehiculo_id: '' });
+      setFormData({ ruta_id: '', conductor_id: '', vehiculo_id: '', inicio_programado: '' });
     }
   }, [editMode, initialData, open]);
 
@@ -66,7 +73,12 @@ const TrayectoForm = ({ open, onClose, onSubmit, editMode = false, initialData =
 
   const handleSubmit = (e) => {
     e.preventDefault();
-    onSubmit(formData);
+    const datos = { ...formData };
+    // Reenviar el mismo inicio recalcularía el fin con la duración de la ruta
+    if (editMode && initialData && datos.inicio_programado === aHoraLocal(initialData.inicio_programado)) {
+      delete datos.inicio_programado;
+    }
+    onSubmit(datos);
   };
 
   if (loading) {
@@ -127,6 +139,18 @@ const TrayectoForm = ({ open, onClose, onSubmit, editMode = false, initialData =
                 ))}
               </TextField>
             </Grid>
+            <Grid item xs={12}>
+              <TextField
+                fullWidth
+                type="datetime-local"
+                label="Salida programada"
+                value={formData.inicio_programado}
+                onChange={(e) => setFormData({ ...formData, inicio_programado: e.target.value })}
+                InputLabelProps={{ shrink: true }}
+                helperText="Hora de Colombia; el fin se calcula con el tiempo estimado de la ruta"
+                required
+              />
+            </Grid>
           </Grid>
         </DialogContent>
         <DialogActions>
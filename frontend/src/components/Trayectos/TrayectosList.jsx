@@ -286,10 +286,15 @@ const TrayectosList = () => {
     try {
       const data = JSON.parse(bulkInput);
       if (!Array.isArray(data)) throw new Error('El formato debe ser un array de objetos');
-      await api.createTrayectosBulk(data);
+      const { data: resultado } = await api.createTrayectosBulk(data);
+      fetchTrayectos();
+      if (resultado?.errores) {
+        const detalle = resultado.filas.filter(f => f.estado === 'error').map(f => `fila ${f.fila}: ${f.detalle}`).join('; ');
+        setBulkError(`Se crearon ${resultado.creados} de ${resultado.total} trayectos. Omitidos: ${detalle}`);
+        return;
+      }
       setBulkDialogOpen(false);
       setBulkInput('');
-      fetchTrayectos();
     } catch (e) {
       setBulkError(e.message || 'Error al cargar los datos');
     } finally {
@@ -1,4 +1,4 @@
-import React, { useState } from 'react';
+import React, { useEffect, useState } from 'react';
 import {
   Dialog,
   DialogTitle,
@@ -11,25 +11,53 @@ import {
   Divider
 } from '@mui/material';
 import { CloudUpload, Download } from '@mui/icons-material';
+import ResultadoImportacion from '../Common/ResultadoImportacion';
+import ProgresoCarga, { esArchivoCarga, useCargaArchivo } from '../Common/CargaArchivo';
 
-const UsuarioBulkUpload = ({ open, onClose, onUpload }) => {
+const UsuarioBulkUpload = ({ open, onClose, onUpload, onCargaTerminada }) => {
   const [error, setError] = useState(null);
+  const [resultado, setResultado] = useState(null);
+  const { carga, error: errorCarga, subir, reiniciar, enCurso } = useCargaArchivo('usuarios', onCargaTerminada);
+
+  useEffect(() => {
+    if (open) {
+      setError(null);
+      setResultado(null);
+      reiniciar();
+    }
+  }, [open, reiniciar]);
+
+  // onUpload devuelve el ResultadoImportacion; el diálogo queda abierto si hubo filas omitidas o con error
+  const enviar = async (registros) => {
+    setError(null);
+    setResultado(null);
+    const respuesta = await onUpload(registros);
+    if (respuesta) setResultado(respuesta);
+  };
 
   const handleFileUpload = (event) => {
     const file = event.target.files[0];
     if (!file) return;
+    event.target.value = '';
+    setError(null);
+    setResultado(null);
+
+    // CSV y XLSX se procesan en el servidor en segundo plano; JSON se envía a /bulk
+    if (esArchivoCarga(file)) {
+      subir(file);
+      return;
+    }
+    reiniciar();
 
     const fileExtension = file.name.split('.').pop().toLowerCase();
     const reader = new FileReader();
 
     reader.onload = (e) => {
       try {
-        if (fileExtension === 'csv') {
-          processCsvFile(e.target.result);
-        } else if (fileExtension === 'json') {
+        if (fileExtension === 'json') {
           processJsonFile(e.target.result);
         } else {
-          setError('Formato de archivo no soportado. Use CSV o JSON');
+          setError('Formato de archivo no soportado. Use CSV, XLSX o JSON');
         }
       } catch (error) {
         setError('Error al procesar el archivo. Verifique el formato');
@@ -39,45 +67,6 @@ const UsuarioBulkUpload = ({ open, onClose, onUpload }) => {
     reader.readAsText(file);
   };
 
-  const processCsvFile = (content) => {
-    const lines = content.split('\n');
-    if (lines.length < 2) {
-      setError('El archivo CSV está vacío o no tiene el formato correcto');
-      return;
-    }
-
-    const headers = lines[0].split(',').map(header => 
-      header.trim().replace(/["']/g, '')
-    );
-
-    const expectedHeaders = ['username', 'email', 'nombre_completo', 'password', 'rol'];
-    if (!expectedHeaders.every(header => headers.includes(header))) {
-      setError('El CSV debe tener las columnas: username, email, nombre_completo, password, rol');
-      return;
-    }
-
-    const usuarios = lines
-      .slice(1)
-      .filter(line => line.trim())
-      .map(line => {
-        const values = line.split(',').map(value => value.trim().replace(/["']/g, ''));
-        return {
-          username: values[headers.indexOf('username')],
-          email: values[headers.indexOf('email')],
-          nombre_completo: values[headers.indexOf('nombre_completo')],
-          password: values[headers.indexOf('password')],
-          rol: values[headers.indexOf('rol')].toLowerCase()
-        };
-      });
-
-    if (!validateUsuarios(usuarios)) {
-      return;
-    }
-
-    onUpload(usuarios);
-    setError(null);
-  };
-
   const processJsonFile = (content) => {
     const usuarios = JSON.parse(content);
     if (!Array.isArray(usuarios)) {
@@ -89,8 +78,7 @@ const UsuarioBulkUpload = ({ open, onClose, onUpload }) => {
       return;
     }
 
-    onUpload(usuarios);
-    setError(null);
+    enviar(usuarios);
   };
 
   const validateUsuarios = (usuarios) => {
@@ -198,16 +186,18 @@ const UsuarioBulkUpload = ({ open, onClose, onUpload }) => {
           </Typography>
           <Box sx={{ textAlign: 'center' }}>
             <input
-              accept=".csv,.json"
+              accept=".csv,.xlsx,.json"
               style={{ display: 'none' }}
               id="bulk-upload-file"
               type="file"
               onChange={handleFileUpload}
+              disabled={enCurso}
             />
             <label htmlFor="bulk-upload-file">
               <Button
                 variant="contained"
                 component="span"
+                disabled={enCurso}
                 startIcon={<CloudUpload />}
                 sx={{ mb: 2 }}
               >
@@ -215,7 +205,7 @@ const UsuarioBulkUpload = ({ open, onClose, onUpload }) => {
               </Button>
             </label>
             <Typography variant="body2" color="text.secondary">
-              Formatos aceptados: CSV y JSON
+              Formatos aceptados: CSV, XLSX y JSON
             </Typography>
             <Typography variant="body2" color="text.secondary" sx={{ mt: 1 }}>
               Nota: Los usuarios existentes serán omitidos
@@ -225,6 +215,8 @@ const UsuarioBulkUpload = ({ open, onClose, onUpload }) => {
                 {error}
               </Alert>
             )}
+            <ResultadoImportacion resultado={resultado} filas={resultado?.filas} />
+            <ProgresoCarga carga={carga} error={errorCarga} />
           </Box>
         </Box>
       </DialogContent>
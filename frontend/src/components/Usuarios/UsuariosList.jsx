@@ -111,9 +111,11 @@ const UsuariosList = () => {
 
   const handleBulkUpload = async (usuarios) => {
     try {
-      await api.createUsuariosBulk({ usuarios });
-      setBulkUploadOpen(false);
+      const { data } = await api.createUsuariosBulk({ usuarios });
       loadUsuarios();
+      // Con filas omitidas o con error el diálogo queda abierto mostrando el reporte
+      if (!data?.omitidos && !data?.errores) setBulkUploadOpen(false);
+      return data;
     } catch (error) {
       console.error('Error al cargar usuarios masivamente:', error);
       alert('Error al cargar usuarios: ' + (error.response?.data?.detail || 'Error desconocido'));
@@ -251,6 +253,7 @@ const UsuariosList = () => {
         open={bulkUploadOpen}
         onClose={() => setBulkUploadOpen(false)}
         onUpload={handleBulkUpload}
+        onCargaTerminada=loadUsuarios
       />
     </Box>
   );
@@ -1,4 +1,4 @@
-import React, { useState } from 'react';
+import React, { useEffect, useState } from 'react';
 import {
   Dialog,
   DialogTitle,
@@ -11,25 +11,53 @@ import {
   Divider
 } from '@mui/material';
 import { CloudUpload, Download } from '@mui/icons-material';
+import ResultadoImportacion from '../Common/ResultadoImportacion';
+import ProgresoCarga, { esArchivoCarga, useCargaArchivo } from '../Common/CargaArchivo';
 
-const VehiculoBulkUpload = ({ open, onClose, onUpload }) => {
+const VehiculoBulkUpload = ({ open, onClose, onUpload, onCargaTerminada }) => {
   const [error, setError] = useState(null);
+  const [resultado, setResultado] = useState(null);
+  const { carga, error: errorCarga, subir, reiniciar, enCurso } = useCargaArchivo('vehiculos', onCargaTerminada);
+
+  useEffect(() => {
+    if (open) {
+      setError(null);
+      setResultado(null);
+      reiniciar();
+    }
+  }, [open, reiniciar]);
+
+  // onUpload devuelve el ResultadoImportacion; el diálogo queda abierto si hubo filas omitidas o con error
+  const enviar = async (registros) => {
+    setError(null);
+    setResultado(null);
+    const respuesta = await onUpload(registros);
+    if (respuesta) setResultado(respuesta);
+  };
 
   const handleFileUpload = (event) => {
     const file = event.target.files[0];
     if (!file) return;
+    event.target.value = '';
+    setError(null);
+    setResultado(null);
+
+    // CSV y XLSX se procesan en el servidor en segundo plano; JSON se envía a /bulk
+    if (esArchivoCarga(file)) {
+      subir(file);
+      return;
+    }
+    reiniciar();
 
     const fileExtension = file.name.split('.').pop().toLowerCase();
     const reader = new FileReader();
 
     reader.onload = (e) => {
       try {
-        if (fileExtension === 'csv') {
-          processCsvFile(e.target.result);
-        } else if (fileExtension === 'json') {
+        if (fileExtension === 'json') {
           processJsonFile(e.target.result);
         } else {
-          setError('Formato de archivo no soportado. Use CSV o JSON');
+          setError('Formato de archivo no soportado. Use CSV, XLSX o JSON');
         }
       } catch (error) {
         setError('Error al procesar el archivo. Verifique el formato');
@@ -39,43 +67,6 @@ const VehiculoBulkUpload = ({ open, onClose, onUpload }) => {
     reader.readAsText(file);
   };
 
-  const processCsvFile = (content) => {
-    const lines = content.split('\n');
-    if (lines.length < 2) {
-      setError('El archivo CSV está vacío o no tiene el formato correcto');
-      return;
-    }
-
-    const headers = lines[0].split(',').map(header => 
-      header.trim().replace(/["']/g, '')
-    );
-
-    const expectedHeaders = ['placa', 'modelo', 'capacidad'];
-    if (!expectedHeaders.every(header => headers.includes(header))) {
-      setError('El CSV debe tener las columnas: placa, modelo, capacidad');
-      return;
-    }
-
-    const vehiculos = lines
-      .slice(1)
-      .filter(line => line.trim())
-      .map(line => {
-        const values = line.split(',').map(value => value.trim().replace(/["']/g, ''));
-        return {
-          placa: values[headers.indexOf('placa')],
-          modelo: values[headers.indexOf('modelo')],
-          capacidad: parseInt(values[headers.indexOf('capacidad')])
-        };
-      });
-
-    if (!validateVehiculos(vehiculos)) {
-      return;
-    }
-
-    onUpload(vehiculos);
-    setError(null);
-  };
-
   const processJsonFile = (content) => {
     const vehiculos = JSON.parse(content);
     if (!Array.isArray(vehiculos)) {
@@ -87,8 +78,7 @@ const VehiculoBulkUpload = ({ open, onClose, onUpload }) => {
       return;
     }
 
-    onUpload(vehiculos);
-    setError(null);
+    enviar(vehiculos);
   };
 
   const validateVehiculos = (vehiculos) => {
@@ -176,16 +166,18 @@ const VehiculoBulkUpload = ({ open, onClose, onUpload }) => {
           </Typography>
           <Box sx={{ textAlign: 'center' }}>
             <input
-              accept=".csv,.json"
+              accept=".csv,.xlsx,.json"
               style={{ display: 'none' }}
               id="bulk-upload-file"
               type="file"
               onChange={handleFileUpload}
+              disabled={enCurso}
             />
             <label htmlFor="bulk-upload-file">
               <Button
                 variant="contained"
                 component="span"
+                disabled={enCurso}
                 startIcon={<CloudUpload />}
                 sx={{ mb: 2 }}
               >
@@ -193,13 +185,15 @@ const VehiculoBulkUpload = ({ open, onClose, onUpload }) => {
               </Button>
             </label>
             <Typography variant="body2" color="text.secondary">
-              Formatos aceptados: CSV y JSON
+              Formatos aceptados: CSV, XLSX y JSON
             </Typography>
             {error && (
               <Alert severity="error" sx={{ mt: 2 }}>
                 {error}
               </Alert>
             )}
+            <ResultadoImportacion resultado={resultado} filas={resultado?.filas} />
+            <ProgresoCarga carga={carga} error={errorCarga} />
           </Box>
         </Box>
       </DialogContent>
@@ -14,6 +14,15 @@ baseURL = baseURL.replace(/\/$/, '');
 
 // console.log('API Service - Using URL:', baseURL);
 
+// {n, columnas: {campo: [...]}} → [{campo: valor, ...}]; una respuesta JSON normal se deja igual
+const expandirColumnas = (data) => {
+  if (!data || !data.columnas) return data;
+  const campos = Object.keys(data.columnas);
+  return Array.from({ length: data.n }, (_, i) =>
+    Object.fromEntries(campos.map((campo) => [campo, data.columnas[campo][i]]))
+  );
+};
+
 const axiosInstance = axios.create({
   baseURL,
   headers: {
@@ -27,6 +36,10 @@ const axiosInstance = axios.create({
   }
 });
 
+// Marca de la última escritura (X-Escritura); mientras sea reciente el backend
+// lee de la base principal en vez de una réplica, para ver los cambios propios
+let ultimaEscritura = null;
+
 // Interceptor para agregar el token
 axiosInstance.interceptors.request.use(
   (config) => {
@@ -34,6 +47,9 @@ axiosInstance.interceptors.request.use(
     if (token) {
       config.headers.Authorization = `Bearer ${token}`;
     }
+    if (ultimaEscritura) {
+      config.headers['X-Ultima-Escritura'] = ultimaEscritura;
+    }
     // Se elimina la manipulación de la URL para evitar errores de Mixed Content.
     return config;
   },
@@ -42,7 +58,13 @@ axiosInstance.interceptors.request.use(
 
 // Interceptor para manejar errores
 axiosInstance.interceptors.response.use(
-  (response) => response,
+  (response) => {
+    const escritura = response.headers?.['x-escritura'];
+    if (escritura) {
+      ultimaEscritura = escritura;
+    }
+    return response;
+  },
   async (error) => {
     if (error.response?.status === 401) {
       localStorage.removeItem('token');
@@ -75,11 +97,15 @@ export const api = {
       cantidad_pasajeros: parseInt(cantidad_pasajeros) 
     });
   },
-  getUbicaciones: () => axiosInstance.get('/trayectos/ubicaciones'),
+  // Formato columnar (arreglos paralelos, fechas en ms): se expande a la lista de objetos de siempre
+  getUbicaciones: () => axiosInstance.get('/trayectos/ubicaciones', {
+    headers: { Accept: 'application/vnd.ludial.columnar+json, application/json;q=0.5' }
+  }).then((res) => ({ ...res, data: expandirColumnas(res.data) })),
   enviarUbicacion: (data) => axiosInstance.post('/trayectos/ubicacion', data),
   updateTrayecto: (id, data) => axiosInstance.put(`/trayectos/${id}`, data),
   deleteTrayecto: (id) => axiosInstance.delete(`/trayectos/${id}`),
   createTrayectosBulk: (data) => axiosInstance.post('/trayectos/bulk', data),
+  despacharTrayectos: (data) => axiosInstance.post('/trayectos/despacho', data),
 
   // Vehículos
   getVehiculos: () => axiosInstance.get('/vehiculos'),
@@ -88,6 +114,9 @@ export const api = {
   updateVehiculo: (id, data) => axiosInstance.put(`/vehiculos/${id}`, data),
   deleteVehiculo: (id) => axiosInstance.delete(`/vehiculos/${id}`),
   createVehiculosBulk: (data) => axiosInstance.post('/vehiculos/bulk', data),
+  getVencimientosVehiculos: (params = {}) => axiosInstance.get('/vehiculos/vencimientos', { params }),
+  getCumplimientoFlota: () => axiosInstance.get('/vehiculos/cumplimiento'),
+  getDisponibilidadFlota: (params = {}) => axiosInstance.get('/vehiculos/disponibilidad', { params }),
 
   // Rutas
   getRutas: () => axiosInstance.get('/rutas'),
@@ -96,6 +125,9 @@ export const api = {
   updateRuta: (id, data) => axiosInstance.put(`/rutas/${id}`, data),
   deleteRuta: (id) => axiosInstance.delete(`/rutas/${id}`),
   createRutasBulk: (data) => axiosInstance.post('/rutas/bulk', data),
+  // Trazado [[lat, lng], ...]; define las geocercas de origen y destino si la ruta no tiene centros propios
+  getGeometriaRuta: (id) => axiosInstance.get(`/rutas/${id}/geometria`),
+  updateGeometriaRuta: (id, puntos) => axiosInstance.put(`/rutas/${id}/geometria`, { puntos }),
 
   // Usuarios
   getUsuarios: () => axiosInstance.get('/usuarios'),
@@ -113,4 +145,16 @@ export const api = {
   // Pico y Placa Config
   getPicoYPlacaConfig: () => axiosInstance.get('/vehiculos/pico-y-placa-config'),
   updatePicoYPlacaConfig: (data) => axiosInstance.put('/vehiculos/pico-y-placa-config', data),
+  getRestringidosPicoYPlaca: (fecha) => axiosInstance.get('/vehiculos/pico-y-placa/restringidos', { params: { fecha } }),
+
+  // Cargas masivas desde CSV/XLSX (entidad: vehiculos, rutas, usuarios, trayectos)
+  subirCarga: (entidad, archivo, politica) => {
+    const formData = new FormData();
+    formData.append('archivo', archivo);
+    return axiosInstance.post(`/${entidad}/carga`, formData, {
+      params: politica ? { politica } : {},
+      headers: { 'Content-Type': 'multipart/form-data' }
+    });
+  },
+  getCarga: (id) => axiosInstance.get(`/cargas/${id}`),
 }; 
\ No newline at end of file